@@ -1,2 +1,3 @@
 #!/bin/bash
-celery -A task_manager worker -l info
\ No newline at end of file
+# Профиль воркера: sum_numbers, countdown или all (все очереди)
+exec python3 manage.py run_worker "${1:-all}"
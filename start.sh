@@ -14,5 +14,5 @@ echo "Database is now available"
 # python3 -m http.server --bind 0.0.0.0
 
 python3 manage.py migrate --noinput
-python3 manage.py runserver 0.0.0.0:8000
+uvicorn task_manager.asgi:application --host 0.0.0.0 --port 8000
 exec "$@"
\ No newline at end of file
@@ -1,6 +1,8 @@
 import sys
 from pathlib import Path
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -34,6 +36,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "task_manager_api.instrumentation.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,15 +81,20 @@ DATABASES = {
     }
 }
 
-if "test" in sys.argv:
+# Тесты и бенчмарки с --sqlite работают без Postgres и Redis
+STANDALONE = "test" in sys.argv or "--sqlite" in sys.argv
+
+if STANDALONE:
+    # В памяти: данные сценариям создаёт benchmark_database, а файл БД
+    # остался бы в корне репозитория
     DATABASES["default"] = {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": "mydatabase",
+        "NAME": ":memory:",
     }
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "task_manager_api.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework.authentication.BasicAuthentication",
     ),
@@ -135,3 +143,143 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CELERY_BROKER_URL = "redis://redis:6379/0"
 CELERY_RESULT_BACKEND = "redis://redis:6379/0"
+# Переходы статусов идемпотентны, поэтому повторная доставка безопасна
+CELERY_TASK_ACKS_LATE = True
+# Сообщение упавшего воркера возвращается в очередь через таймаут
+# видимости, поэтому он короткий; длинные обратные отсчёты планируются
+# шагами TASK_MANAGER_COUNTDOWN_HOP_SECONDS.
+# priority_steps - все 10 уровней приоритета вместо 4 по умолчанию
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "visibility_timeout": 900,
+    "priority_steps": list(range(10)),
+}
+CELERY_TASK_ROUTES = ("task_manager_api.registry.route_task",)
+CELERY_BEAT_SCHEDULE = {
+    "sum-numbers-batch": {
+        "task": "task_manager_api.tasks.sum_numbers_batch_task",
+        "schedule": 1.0,
+    },
+    "reap-expired-tasks": {
+        "task": "task_manager_api.tasks.reap_expired_tasks_task",
+        "schedule": 60.0,
+    },
+    "archive-tasks": {
+        "task": "task_manager_api.tasks.archive_tasks_task",
+        "schedule": crontab(hour=3, minute=0),
+    },
+}
+
+# Task manager
+TASK_MANAGER_ACTIVE_TASKS_LIMIT = 5
+TASK_MANAGER_BULK_CREATE_MAX_SIZE = 5000
+# Лимит активных задач проверяется для задач графа, готовых сразу; дети
+# учитываются без проверки, когда дождутся родителей
+TASK_MANAGER_GRAPH_MAX_SIZE = 1000
+# "eta" - завершение обратного отсчёта планируется через ETA и не занимает
+# воркер, "sleep" - воркер спит всё время отсчёта
+TASK_MANAGER_COUNTDOWN_MODE = "eta"
+TASK_MANAGER_COUNTDOWN_MAX_SECONDS = 7 * 24 * 3600
+# ETA-сообщение не подтверждается до срока, поэтому отсчёт в режиме "eta"
+# планируется шагами заметно короче таймаута видимости брокера
+TASK_MANAGER_COUNTDOWN_HOP_SECONDS = (
+    CELERY_BROKER_TRANSPORT_OPTIONS["visibility_timeout"] // 2
+)
+# Входные данные до этого размера (в байтах JSON) передаются воркеру в
+# сообщении, 0 - всегда передавать только id задачи
+TASK_MANAGER_INLINE_PAYLOAD_MAX_BYTES = 1024
+# Задачи этих типов выполняются пачками по расписанию beat вместо
+# отдельного сообщения на каждую задачу, например ["sum_numbers"]
+TASK_MANAGER_BATCHED_TASK_TYPES = []
+TASK_MANAGER_BATCH_SIZE = 500
+TASK_MANAGER_REDIS_URL = CELERY_BROKER_URL
+# "outbox" - задачи записываются в TaskOutbox в транзакции создания и
+# отправляются в брокер командой relay_outbox пачками по
+# TASK_MANAGER_OUTBOX_BATCH_SIZE; "direct" - отправка прямо из запроса
+TASK_MANAGER_DISPATCH_MODE = "outbox"
+TASK_MANAGER_OUTBOX_BATCH_SIZE = 500
+TASK_MANAGER_OUTBOX_POLL_SECONDS = 0.5
+# Поток всех задач пользователя закрывается через это время, клиент
+# переподключается сам
+TASK_MANAGER_STREAM_MAX_SECONDS = 300
+# Верхняя граница ?wait= при получении задачи
+TASK_MANAGER_LONG_POLL_MAX_SECONDS = 60
+# Задачи ставятся в очереди пользователей в Redis, и команда
+# schedule_tasks держит в брокере не больше TASK_MANAGER_FAIR_SHARE_WINDOW
+# неначатых задач, пополняя окно по deficit round robin. Веса - по id
+# пользователя, по умолчанию 1
+TASK_MANAGER_FAIR_SHARE_ENABLED = True
+TASK_MANAGER_FAIR_SHARE_WINDOW = 50
+TASK_MANAGER_FAIR_SHARE_QUANTUM = 1
+TASK_MANAGER_FAIR_SHARE_WEIGHTS = {}
+TASK_MANAGER_FAIR_SHARE_POLL_SECONDS = 0.1
+# Аренда выполняющейся задачи: воркер продлевает её каждую треть срока.
+# Задачи с истёкшей арендой reaper возвращает в очередь, а после
+# TASK_MANAGER_MAX_ATTEMPTS запусков завершает с ошибкой
+TASK_MANAGER_LEASE_SECONDS = 60
+TASK_MANAGER_MAX_ATTEMPTS = 3
+TASK_MANAGER_REAPER_CHUNK_SIZE = 1000
+# Завершённые задачи старше TASK_MANAGER_ARCHIVE_AFTER_DAYS переносятся
+# в TaskArchive пачками по TASK_MANAGER_ARCHIVE_CHUNK_SIZE
+TASK_MANAGER_ARCHIVE_AFTER_DAYS = 30
+TASK_MANAGER_ARCHIVE_CHUNK_SIZE = 1000
+# Гистограммы /metrics: наблюдения процесса сбрасываются в Redis не чаще
+# раза в TASK_MANAGER_METRICS_FLUSH_SECONDS
+TASK_MANAGER_METRICS_ENABLED = True
+TASK_MANAGER_METRICS_FLUSH_SECONDS = 5
+# Состояние пользователя для JWT (имя, is_active) кешируется в Redis и в
+# памяти процесса; отключение пользователя в других процессах вступает в
+# силу не позже чем через TASK_MANAGER_AUTH_LOCAL_CACHE_TTL
+TASK_MANAGER_AUTH_CACHE_TTL = 300
+TASK_MANAGER_AUTH_LOCAL_CACHE_TTL = 5
+TASK_MANAGER_AUTH_LOCAL_CACHE_SIZE = 10000
+# Кеш результатов детерминированных задач (cacheable в реестре типов):
+# Redis через кеш Django и LRU-кеш в памяти процесса
+TASK_MANAGER_RESULT_CACHE_ENABLED = True
+TASK_MANAGER_RESULT_CACHE_TTL = 3600
+TASK_MANAGER_RESULT_CACHE_LOCAL_SIZE = 1024
+# Профили воркеров для start-celery-worker.sh: короткие задачи не ждут
+# в одной очереди за длинными. Мгновенные sum_numbers выгодно забирать
+# большими порциями, длинные countdown - по одной.
+TASK_MANAGER_WORKER_PROFILES = {
+    "sum_numbers": {
+        "queues": ["sum_numbers", "celery"],
+        "concurrency": 8,
+        "prefetch_multiplier": 16,
+    },
+    "countdown": {
+        "queues": ["countdown"],
+        "concurrency": 4,
+        "prefetch_multiplier": 1,
+    },
+    "all": {
+        "queues": ["sum_numbers", "countdown", "celery"],
+        "concurrency": 4,
+        "prefetch_multiplier": 4,
+    },
+}
+
+# Redis запущен с maxmemory-policy volatile-lru: вытесняются только ключи
+# с TTL, поэтому очереди брокера не затрагиваются
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": "redis://redis:6379/1",
+    }
+}
+
+if STANDALONE:
+    # В тестах нет Redis: лимит активных задач проверяется запросом к БД,
+    # кеш Django хранится в памяти, кеш результатов выключен, задачи
+    # отправляются без outbox
+    TASK_MANAGER_REDIS_URL = None
+    TASK_MANAGER_RESULT_CACHE_ENABLED = False
+    TASK_MANAGER_DISPATCH_MODE = "direct"
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+if "--sqlite" in sys.argv:
+    # Бенчмарки без брокера: задачи Celery выполняются сразу
+    CELERY_TASK_ALWAYS_EAGER = True
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from task_manager_api.instrumentation import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("task_manager_api.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
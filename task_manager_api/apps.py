@@ -4,3 +4,37 @@ from django.apps import AppConfig
 class TaskManagerApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "task_manager_api"
+
+    def ready(self):
+        from celery import signals
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from . import instrumentation, task_types  # noqa: F401
+        from .authentication import invalidate
+
+        user_model = get_user_model()
+        post_save.connect(
+            invalidate,
+            sender=user_model,
+            dispatch_uid="task_manager_auth_invalidate_save",
+        )
+        post_delete.connect(
+            invalidate,
+            sender=user_model,
+            dispatch_uid="task_manager_auth_invalidate_delete",
+        )
+
+        connection_created.connect(
+            instrumentation.install_query_counter,
+            dispatch_uid="task_manager_query_counter",
+        )
+        signals.before_task_publish.connect(
+            instrumentation.add_enqueued_at, weak=False
+        )
+        signals.task_prerun.connect(instrumentation.task_started, weak=False)
+        signals.task_postrun.connect(instrumentation.task_finished, weak=False)
+        signals.worker_process_shutdown.connect(
+            instrumentation.flush_on_shutdown, weak=False
+        )
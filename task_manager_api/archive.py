@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone as django_timezone
+
+from . import versions
+from .models import TERMINAL_STATUSES, Task, TaskArchive
+
+ARCHIVE_FIELDS = [
+    "id",
+    "user_id",
+    "task_type",
+    "input_data",
+    "status",
+    "result",
+    "created_at",
+    "priority",
+    "started_at",
+    "finished_at",
+]
+
+# Секции, уже созданные этим процессом
+_partitions = set()
+
+
+def _month_start(value):
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def ensure_partition(month):
+    """Создаёт в Postgres месячную секцию архива, если её ещё нет."""
+    if connection.vendor != "postgresql" or month in _partitions:
+        return
+
+    table = TaskArchive._meta.db_table
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS "
+            f"{quote(f'{table}_y{month.year}m{month.month:02d}')} "
+            f"PARTITION OF {quote(table)} FOR VALUES FROM (%s) TO (%s)",
+            [month, next_month],
+        )
+    _partitions.add(month)
+
+
+def archive_chunk(cutoff, chunk_size):
+    """
+    Переносит в архив до chunk_size завершённых задач старше cutoff.
+
+    Каждая пачка - отдельная короткая транзакция, строки выбираются с
+    SKIP LOCKED, поэтому архивация не блокирует API и воркеры надолго.
+    Задачи, дети которых ещё ждут их результатов, остаются в Task.
+    Возвращает число перенесённых задач.
+    """
+    waiting_children = Task.parents.through.objects.filter(
+        to_task_id=OuterRef("id"), from_task__pending_parents__gt=0
+    )
+    with transaction.atomic():
+        rows = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status__in=TERMINAL_STATUSES, created_at__lt=cutoff)
+            .exclude(Exists(waiting_children))
+            .order_by("created_at")
+            .values(*ARCHIVE_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            return 0
+
+        for month in {_month_start(row["created_at"]) for row in rows}:
+            ensure_partition(month)
+        TaskArchive.objects.bulk_create(TaskArchive(**row) for row in rows)
+        Task.objects.filter(id__in=[row["id"] for row in rows]).delete()
+        versions.touch_many(row["user_id"] for row in rows)
+    return len(rows)
+
+
+def archive_tasks(days=None, chunk_size=None):
+    """Архивирует завершённые задачи старше days дней пачками."""
+    if days is None:
+        days = settings.TASK_MANAGER_ARCHIVE_AFTER_DAYS
+    chunk_size = chunk_size or settings.TASK_MANAGER_ARCHIVE_CHUNK_SIZE
+    cutoff = django_timezone.now() - timedelta(days=days)
+
+    total = 0
+    while True:
+        archived = archive_chunk(cutoff, chunk_size)
+        total += archived
+        if archived < chunk_size:
+            return total
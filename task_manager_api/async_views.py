@@ -0,0 +1,150 @@
+"""
+Асинхронная версия API задач (create, list, retrieve) для ASGI.
+
+DRF не поддерживает асинхронные вьюсеты, поэтому это функции Django:
+запросы к БД идут через асинхронный ORM и не занимают поток на время
+ожидания Postgres.
+"""
+
+import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import (
+    APIException,
+    MethodNotAllowed,
+    NotAuthenticated,
+    NotFound,
+    ParseError,
+)
+from rest_framework.request import Request
+
+from . import outbox, quota, result_cache, stats, versions
+from .dispatch import adispatch_task
+from .instrumentation import stage
+from .models import StatusChoices, Task, TaskArchive
+from .pagination import AsyncTaskPagination
+from .serializers import TaskListEncoder, TaskSerializer
+from .streaming import authenticate
+from .views import (
+    acquire_active_tasks,
+    filter_by_status,
+    is_archived_requested,
+)
+
+
+def async_api_view(view):
+    """
+    JWT-аутентификация и ответы на APIException в формате DRF для
+    асинхронной функции-представления.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await authenticate(request)
+            if user is None:
+                raise NotAuthenticated()
+            request.user = user
+            return await view(request, *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail
+            if not isinstance(data, (list, dict)):
+                data = {"detail": data}
+            return JsonResponse(data, status=exc.status_code, safe=False)
+
+    # Аутентификация по JWT, не по cookie
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+@async_api_view
+async def task_list(request):
+    if request.method == "GET":
+        return await list_tasks(request)
+    if request.method == "POST":
+        return await create_task(request)
+    raise MethodNotAllowed(request.method)
+
+
+@async_api_view
+async def task_detail(request, pk):
+    if request.method != "GET":
+        raise MethodNotAllowed(request.method)
+
+    encoder = TaskListEncoder(request.user.username, request.GET.get("fields"))
+    for model in (Task, TaskArchive):
+        row = await (
+            model.objects.filter(id=pk, user_id=request.user.id)
+            .values(*encoder.columns)
+            .afirst()
+        )
+        if row is not None:
+            break
+    else:
+        raise NotFound()
+    return JsonResponse(encoder.encode([row])[0])
+
+
+async def list_tasks(request):
+    encoder = TaskListEncoder(request.user.username, request.GET.get("fields"))
+    model = TaskArchive if is_archived_requested(request) else Task
+    rows = filter_by_status(
+        model.objects.filter(user_id=request.user.id),
+        request.GET.get("status"),
+    ).values(*encoder.columns)
+
+    paginator = AsyncTaskPagination()
+    page = await paginator.apaginate_queryset(rows, Request(request))
+    if page is not None:
+        return JsonResponse(paginator.get_paginated_data(encoder.encode(page)))
+    return JsonResponse(
+        encoder.encode([row async for row in rows]), safe=False
+    )
+
+
+def create_pending_task(user, data):
+    # Задача и запись outbox в одной транзакции; atomic() доступен только
+    # в синхронном коде
+    with outbox.atomic():
+        task = Task.objects.create(user=user, **data)
+        return task, outbox.store([task])
+
+
+async def create_task(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise ParseError()
+    serializer = TaskSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+
+    user = request.user
+    data = serializer.validated_data
+    with stage("result_cache"):
+        cached = await sync_to_async(result_cache.get)(
+            data["task_type"], data["input_data"]
+        )
+    if cached is not None:
+        task = await Task.objects.acreate(
+            user=user, status=StatusChoices.COMPLETED, result=cached, **data
+        )
+    else:
+        with stage("quota"):
+            await sync_to_async(acquire_active_tasks)(user.id)
+        try:
+            with stage("insert"):
+                task, unsent = await sync_to_async(create_pending_task)(
+                    user, data
+                )
+        except Exception:
+            await sync_to_async(quota.release)(user.id)
+            raise
+    await sync_to_async(stats.record_created)([task])
+    await sync_to_async(versions.touch)(user.id)
+    if cached is None and unsent:
+        with stage("dispatch"):
+            await adispatch_task(task)
+
+    return JsonResponse(TaskSerializer(task).data, status=201)
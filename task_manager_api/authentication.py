@@ -0,0 +1,120 @@
+import logging
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .result_cache import LocalLRUCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "task_manager:auth:user:"
+# Удалённый пользователь кешируется так же, как и существующий
+MISSING = "missing"
+
+local_cache = LocalLRUCache(settings.TASK_MANAGER_AUTH_LOCAL_CACHE_SIZE)
+
+
+def _key(user_id):
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def _load_user_state(user_id):
+    return (
+        get_user_model()
+        .objects.filter(id=user_id)
+        .values("username", "is_active")
+        .first()
+    )
+
+
+def get_user_state(user_id):
+    """
+    Имя и is_active пользователя: из кеша процесса, затем из кеша Django
+    и только потом из БД.
+    """
+    key = _key(user_id)
+    state = local_cache.get(key)
+    if state is None:
+        try:
+            state = cache.get(key)
+        except redis.RedisError:
+            # Без общего кеша пользователь читается из БД
+            logger.warning("Кеш пользователей недоступен", exc_info=True)
+            return _load_user_state(user_id)
+        if state is None:
+            state = _load_user_state(user_id) or MISSING
+            try:
+                cache.set(key, state, settings.TASK_MANAGER_AUTH_CACHE_TTL)
+            except redis.RedisError:
+                return None if state == MISSING else state
+        local_cache.set(key, state, settings.TASK_MANAGER_AUTH_LOCAL_CACHE_TTL)
+    return None if state == MISSING else state
+
+
+def invalidate(sender, instance, **kwargs):
+    """
+    Сбрасывает закешированное состояние пользователя после сохранения
+    или удаления. Кеши других процессов устаревают через
+    TASK_MANAGER_AUTH_LOCAL_CACHE_TTL.
+    """
+    key = _key(instance.pk)
+
+    def forget():
+        local_cache.delete(key)
+        try:
+            cache.delete(key)
+        except redis.RedisError:
+            logger.warning(
+                "Не удалось сбросить кеш пользователя", exc_info=True
+            )
+
+    # Сразу и ещё раз после коммита: до коммита параллельный запрос мог
+    # снова закешировать старое состояние
+    forget()
+    transaction.on_commit(forget)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT без запроса пользователя к БД на каждый запрос.
+
+    Пользователь собирается из user_id токена и закешированного
+    состояния с отложенными остальными полями; отключение и удаление пользователя
+    действуют не позже чем через TTL кеша.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken("Токен не содержит идентификатор пользователя")
+
+        state = get_user_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(
+                "Пользователь не найден", code="user_not_found"
+            )
+        if not state["is_active"]:
+            raise AuthenticationFailed(
+                "Пользователь отключён", code="user_inactive"
+            )
+
+        # Как строка из .only(): остальные поля отложены и при обращении
+        # читаются из БД, а save() обновляет только загруженные поля и не
+        # затирает пароль и прочие колонки
+        values = {"id": user_id, **state}
+        fields = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in values
+        ]
+        return self.user_model.from_db(
+            "default", fields, [values[field] for field in fields]
+        )
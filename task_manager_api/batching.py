@@ -0,0 +1,128 @@
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from . import dag, events, quota, result_cache, stats, versions
+from .models import StatusChoices, Task, TaskTypeChoices
+
+# Сумма двух int64 из этого диапазона не переполняется
+INT64_SAFE_LIMIT = 2**62
+
+
+def _is_int64(value):
+    return type(value) is int and -INT64_SAFE_LIMIT <= value < INT64_SAFE_LIMIT
+
+
+def _is_float_operand(value):
+    return type(value) is float or _is_int64(value)
+
+
+def sum_numbers(inputs):
+    """
+    Считает a + b для списка input_data.
+
+    Числовые пары складываются векторно, остальные - по одной, как в
+    sum_numbers_task, чтобы ошибки типов давали тот же результат.
+    Возвращает список пар (status, result).
+    """
+    outcomes = [None] * len(inputs)
+    int_rows, float_rows = [], []
+
+    for index, input_data in enumerate(inputs):
+        try:
+            a, b = input_data["a"], input_data["b"]
+        except Exception as e:
+            outcomes[index] = StatusChoices.FAILED, {"error": str(e)}
+            continue
+
+        if _is_int64(a) and _is_int64(b):
+            int_rows.append((index, a, b))
+        elif (
+            float in (type(a), type(b))
+            and _is_float_operand(a)
+            and _is_float_operand(b)
+        ):
+            float_rows.append((index, a, b))
+        else:
+            try:
+                outcomes[index] = StatusChoices.COMPLETED, {"result": a + b}
+            except Exception as e:
+                outcomes[index] = StatusChoices.FAILED, {"error": str(e)}
+
+    for rows, dtype in ((int_rows, np.int64), (float_rows, np.float64)):
+        if not rows:
+            continue
+        indexes, a, b = zip(*rows)
+        sums = np.add(np.array(a, dtype=dtype), np.array(b, dtype=dtype))
+        for index, result in zip(indexes, sums.tolist()):
+            outcomes[index] = StatusChoices.COMPLETED, {"result": result}
+
+    return outcomes
+
+
+def run_sum_numbers_batch(limit):
+    """
+    Выполняет до limit ожидающих задач sum_numbers за один проход.
+
+    Строки блокируются SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько
+    воркеров могут разбирать очередь параллельно. Задачи графа, ждущие
+    родителей, пропускаются. Возвращает число обработанных задач.
+    """
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(
+                task_type=TaskTypeChoices.SUM_NUMBERS,
+                status=StatusChoices.PENDING,
+                pending_parents=0,
+            )
+            .order_by("id")
+            .only("id", "user_id", "input_data", "has_children")[:limit]
+        )
+        if not tasks:
+            return 0
+
+        outcomes = sum_numbers([task.input_data for task in tasks])
+        now = timezone.now()
+        for task, (status, result) in zip(tasks, outcomes):
+            task.status, task.result = status, result
+            task.started_at = task.finished_at = now
+        Task.objects.bulk_update(
+            tasks, ["status", "result", "started_at", "finished_at"]
+        )
+        stats.record(
+            (
+                task.id,
+                task.user_id,
+                TaskTypeChoices.SUM_NUMBERS,
+                StatusChoices.PENDING,
+                task.status,
+            )
+            for task in tasks
+        )
+        dag.on_finished(
+            (task.id, task.status, task.result)
+            for task in tasks
+            if task.has_children
+        )
+
+    for user_id, count in Counter(task.user_id for task in tasks).items():
+        quota.release(user_id, count)
+    events.publish_many(
+        {
+            "id": task.id,
+            "user_id": task.user_id,
+            "status": task.status,
+            "result": task.result,
+        }
+        for task in tasks
+    )
+    versions.touch_many(task.user_id for task in tasks)
+    result_cache.store_many(
+        (TaskTypeChoices.SUM_NUMBERS, task.input_data, task.result)
+        for task in tasks
+        if task.status == StatusChoices.COMPLETED
+    )
+    return len(tasks)
@@ -0,0 +1,28 @@
+from . import (
+    auth_queries,
+    create_throughput,
+    end_to_end,
+    fair_share,
+    http_load,
+    list_latency,
+    queue_routing,
+    quota_cost,
+    replay,
+    serialization,
+)
+
+SCENARIOS = {
+    "create_throughput": create_throughput.run,
+    "list_latency": list_latency.run,
+    "quota_cost": quota_cost.run,
+    "end_to_end": end_to_end.run,
+    "replay": replay.run,
+    "queue_routing": queue_routing.run,
+    "fair_share": fair_share.run,
+    "serialization": serialization.run,
+    "auth_queries": auth_queries.run,
+    "http_load": http_load.run,
+}
+
+# Требуют запущенного сервера, поэтому запускаются только явно
+MANUAL_SCENARIOS = {"http_load"}
@@ -0,0 +1,78 @@
+"""
+SQL-запросы и задержка на запрос к API с JWT: штатная аутентификация
+simplejwt (пользователь из БД на каждый запрос) против
+CachedJWTAuthentication.
+"""
+
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from task_manager_api.authentication import CachedJWTAuthentication
+from task_manager_api.models import StatusChoices, Task
+from task_manager_api.views import TaskViewSet
+
+from .utils import (
+    benchmark_database,
+    benchmark_settings,
+    create_user,
+    latency_ms,
+    measure,
+    timings,
+)
+
+BACKENDS = {
+    "jwt": JWTAuthentication,
+    "cached": CachedJWTAuthentication,
+}
+
+
+def run(requests=200, history=100):
+    results = {}
+    with benchmark_database(), benchmark_settings:
+        user = create_user()
+        tasks = Task.objects.bulk_create(
+            Task(
+                user=user,
+                input_data={"a": index, "b": index},
+                status=StatusChoices.COMPLETED,
+                result=2 * index,
+            )
+            for index in range(history)
+        )
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+        urls = {
+            "list": reverse("tasks-list") + "?limit=20",
+            "detail": reverse("tasks-detail", args=[tasks[-1].id]),
+        }
+
+        for backend, authentication_class in BACKENDS.items():
+            with mock.patch.object(
+                TaskViewSet, "authentication_classes", [authentication_class]
+            ):
+                results[backend] = {}
+                for name, url in urls.items():
+                    # Первый запрос прогревает кеш и в замер не входит
+                    client.get(url)
+                    measured = measure(
+                        lambda url=url: [
+                            client.get(url) for _ in range(requests)
+                        ]
+                    )
+                    results[backend][name] = {
+                        "queries_per_request": measured["queries"] / requests,
+                        "latency_ms": latency_ms(
+                            timings(lambda url=url: client.get(url), requests)
+                        ),
+                    }
+
+    return {
+        "parameters": {"requests": requests, "history": history},
+        "results": results,
+    }
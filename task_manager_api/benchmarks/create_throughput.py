@@ -0,0 +1,76 @@
+"""
+Пропускная способность создания задач через API: по одной задаче на
+запрос и пакетами через /api/tasks/bulk/.
+"""
+
+import time
+
+from django.urls import reverse
+
+from task_manager_api import quota
+from task_manager_api.models import ACTIVE_STATUSES, Task
+
+from .utils import (
+    api_client,
+    benchmark_database,
+    benchmark_settings,
+    create_user,
+    latency_ms,
+)
+
+
+def task_data(index):
+    return {"task_type": "sum_numbers", "input_data": {"a": index, "b": 1}}
+
+
+def run(tasks=500, batch_size=100):
+    with benchmark_database(), benchmark_settings:
+        user = create_user()
+        client = api_client(user)
+        try:
+            url = reverse("tasks-list")
+            latencies, errors = [], 0
+            started = time.perf_counter()
+            for index in range(tasks):
+                request_started = time.perf_counter()
+                response = client.post(url, task_data(index), format="json")
+                latencies.append(time.perf_counter() - request_started)
+                errors += response.status_code != 201
+            single_seconds = time.perf_counter() - started
+
+            url = reverse("tasks-bulk")
+            batch_latencies, batch_errors = [], 0
+            started = time.perf_counter()
+            for offset in range(0, tasks, batch_size):
+                batch = [
+                    task_data(index)
+                    for index in range(offset, min(offset + batch_size, tasks))
+                ]
+                request_started = time.perf_counter()
+                response = client.post(url, batch, format="json")
+                batch_latencies.append(time.perf_counter() - request_started)
+                batch_errors += response.status_code != 201
+            bulk_seconds = time.perf_counter() - started
+        finally:
+            # Воркеры не видят строк временной БД и не вернут квоту сами
+            active = Task.objects.filter(
+                user=user, status__in=ACTIVE_STATUSES
+            ).count()
+            if active:
+                quota.release(user.id, active)
+
+    return {
+        "parameters": {"tasks": tasks, "batch_size": batch_size},
+        "results": {
+            "single": {
+                "tasks_per_second": round(tasks / single_seconds, 1),
+                "errors": errors,
+                "latency_ms": latency_ms(latencies),
+            },
+            "bulk": {
+                "tasks_per_second": round(tasks / bulk_seconds, 1),
+                "errors": batch_errors,
+                "latency_ms": latency_ms(batch_latencies),
+            },
+        },
+    }
@@ -0,0 +1,82 @@
+"""
+Задержка pending -> completed по типам задач: от запроса на создание
+до появления итогового статуса в БД.
+
+В режиме --sqlite задачи выполняются Celery в eager-режиме во временной
+БД. Иначе задачи разбирают запущенные воркеры, поэтому сценарий пишет в
+рабочую БД от имени временного пользователя и удаляет его в конце.
+"""
+
+import time
+from contextlib import nullcontext
+
+from django.urls import reverse
+
+from task_manager.celery import app
+from task_manager_api.models import ACTIVE_STATUSES, Task
+from task_manager_api.registry import task_type_names
+
+from .utils import (
+    api_client,
+    benchmark_database,
+    benchmark_settings,
+    create_user,
+    latency_ms,
+)
+
+SAMPLE_INPUTS = {
+    "sum_numbers": {"a": 1, "b": 2},
+    "countdown": {"seconds": 0},
+}
+
+
+def wait_for_completion(task_id, deadline, poll_interval):
+    while time.perf_counter() < deadline:
+        status = (
+            Task.objects.filter(id=task_id)
+            .values_list("status", flat=True)
+            .first()
+        )
+        if status not in ACTIVE_STATUSES:
+            return True
+        time.sleep(poll_interval)
+    return False
+
+
+def run(tasks=50, timeout=60, poll_interval=0.01):
+    eager = app.conf.task_always_eager
+    results = {}
+    with benchmark_database() if eager else nullcontext(), benchmark_settings:
+        user = create_user()
+        client = api_client(user)
+        url = reverse("tasks-list")
+        try:
+            for name in task_type_names():
+                if name not in SAMPLE_INPUTS:
+                    continue
+                latencies, timeouts = [], 0
+                for _ in range(tasks):
+                    started = time.perf_counter()
+                    response = client.post(
+                        url,
+                        {"task_type": name, "input_data": SAMPLE_INPUTS[name]},
+                        format="json",
+                    )
+                    if wait_for_completion(
+                        response.data["id"], started + timeout, poll_interval
+                    ):
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        timeouts += 1
+                results[name] = {
+                    "timeouts": timeouts,
+                    "latency_ms": latency_ms(latencies),
+                }
+        finally:
+            if not eager:
+                user.delete()
+
+    return {
+        "parameters": {"tasks": tasks, "timeout": timeout, "eager": eager},
+        "results": results,
+    }
@@ -0,0 +1,133 @@
+"""
+Симуляция задержки задач лёгких пользователей, пока тяжёлые заваливают
+очередь: общая FIFO-очередь против deficit round robin по очередям
+пользователей (fair_share).
+"""
+
+import heapq
+import random
+from collections import deque
+
+from task_manager_api.fair_share import DeficitRoundRobin
+
+from .queue_routing import simulate
+from .utils import percentiles
+
+HEAVY, LIGHT = "heavy", "light"
+
+
+def generate_jobs(
+    duration,
+    heavy_users,
+    heavy_tasks,
+    flood_seconds,
+    light_users,
+    light_rate,
+    service_seconds,
+    seed,
+):
+    """Задачи (arrival, kind, service, user) в порядке поступления."""
+    rng = random.Random(seed)
+    jobs = []
+    for user in range(heavy_users):
+        for _ in range(heavy_tasks):
+            jobs.append(
+                (
+                    rng.uniform(0, flood_seconds),
+                    HEAVY,
+                    rng.expovariate(1 / service_seconds),
+                    user,
+                )
+            )
+    for user in range(heavy_users, heavy_users + light_users):
+        now = rng.expovariate(light_rate)
+        while now < duration:
+            jobs.append(
+                (now, LIGHT, rng.expovariate(1 / service_seconds), user)
+            )
+            now += rng.expovariate(light_rate)
+    jobs.sort()
+    return jobs
+
+
+def simulate_fair(jobs, workers, quantum):
+    """
+    Задачи ждут в очередях пользователей; освободившиеся воркеры получают
+    задачи по плану DeficitRoundRobin. Возвращает задержки по видам.
+    """
+    scheduler = DeficitRoundRobin(quantum)
+    queues = {}
+    free_at = [0.0] * workers
+    latencies = {}
+    index, now = 0, 0.0
+    while True:
+        while index < len(jobs) and jobs[index][0] <= now:
+            arrival, kind, service, user = jobs[index]
+            queues.setdefault(user, deque()).append((arrival, kind, service))
+            index += 1
+
+        free = sum(1 for moment in free_at if moment <= now)
+        backlog = {user: len(queue) for user, queue in queues.items()}
+        for user, count in scheduler.plan(backlog, free).items():
+            for _ in range(count):
+                arrival, kind, service = queues[user].popleft()
+                heapq.heapreplace(free_at, now + service)
+                latencies.setdefault(kind, []).append(now + service - arrival)
+
+        moments = []
+        if index < len(jobs):
+            moments.append(jobs[index][0])
+        if any(queues.values()):
+            moments.append(free_at[0])
+        if not moments:
+            return latencies
+        now = max(now, min(moments))
+
+
+def run(
+    duration=60,
+    heavy_users=2,
+    heavy_tasks=5000,
+    flood_seconds=10,
+    light_users=20,
+    light_rate=0.5,
+    service_seconds=0.05,
+    workers=10,
+    quantum=1,
+    seed=0,
+):
+    jobs = generate_jobs(
+        duration,
+        heavy_users,
+        heavy_tasks,
+        flood_seconds,
+        light_users,
+        light_rate,
+        service_seconds,
+        seed,
+    )
+    setups = {
+        "fifo": simulate(
+            [job[:3] for job in jobs], [({HEAVY, LIGHT}, workers)]
+        ),
+        "fair_share": simulate_fair(jobs, workers, quantum),
+    }
+    return {
+        "parameters": {
+            "duration": duration,
+            "heavy_users": heavy_users,
+            "heavy_tasks": heavy_tasks,
+            "flood_seconds": flood_seconds,
+            "light_users": light_users,
+            "light_rate": light_rate,
+            "service_seconds": service_seconds,
+            "workers": workers,
+            "quantum": quantum,
+        },
+        "results": {
+            name: {
+                kind: percentiles(values) for kind, values in latencies.items()
+            }
+            for name, latencies in setups.items()
+        },
+    }
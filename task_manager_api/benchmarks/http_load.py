@@ -0,0 +1,170 @@
+"""
+Нагрузка на HTTP API: запросы в секунду и задержки синхронного API
+(/api/tasks/) под WSGI против асинхронного (/api/async/tasks/) под ASGI
+при большом числе одновременных клиентов. Серверы запускаются отдельно:
+uvicorn (start.sh, порт 8000) и gunicorn (сервис web_wsgi, порт 8001).
+Каждому клиенту нужен свой файловый дескриптор (ulimit -n).
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from .utils import percentiles
+
+
+class Connection:
+    """Минимальный HTTP/1.1-клиент с keep-alive на asyncio."""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}"]
+        lines += [
+            f"{name}: {value}" for name, value in (headers or {}).items()
+        ]
+        payload = b""
+        if body is not None:
+            payload = json.dumps(body).encode()
+            lines += [
+                "Content-Type: application/json",
+                f"Content-Length: {len(payload)}",
+            ]
+        self.writer.write("\r\n".join(lines).encode() + b"\r\n\r\n" + payload)
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while line := (await self.reader.readline()).strip():
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding") == "chunked":
+            content = b""
+            while size := int(await self.reader.readline(), 16):
+                content += await self.reader.readexactly(size)
+                await self.reader.readline()
+            await self.reader.readline()
+        else:
+            length = int(response_headers.get("content-length", 0))
+            content = await self.reader.readexactly(length)
+
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status, content
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def prepare(base_url, tasks):
+    """Регистрирует пользователя, получает JWT и создаёт его задачи."""
+    connection = Connection(base_url)
+    credentials = {"username": f"load-{uuid.uuid4().hex}", "password": "-"}
+    try:
+        await connection.request("POST", "/api/register/", body=credentials)
+        _, content = await connection.request(
+            "POST", "/api/token/", body=credentials
+        )
+        headers = {"Authorization": f"Bearer {json.loads(content)['access']}"}
+        _, content = await connection.request(
+            "POST",
+            "/api/tasks/bulk/",
+            headers=headers,
+            body=[
+                {"task_type": "sum_numbers", "input_data": {"a": i, "b": i}}
+                for i in range(tasks)
+            ],
+        )
+    finally:
+        await connection.close()
+    return headers, json.loads(content)["ids"][0]
+
+
+async def client(base_url, path, headers, deadline, latencies, errors):
+    connection = Connection(base_url)
+    try:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                status, _ = await connection.request("GET", path, headers)
+            except (OSError, asyncio.IncompleteReadError, ValueError):
+                errors.append(None)
+                await connection.close()
+                continue
+            if status != 200:
+                errors.append(status)
+            latencies.append((time.monotonic() - started) * 1000)
+    finally:
+        await connection.close()
+
+
+async def load(base_url, path, headers, clients, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(
+        *(
+            client(base_url, path, headers, deadline, latencies, errors)
+            for _ in range(clients)
+        )
+    )
+    return {
+        "requests_per_second": round(len(latencies) / duration, 1),
+        "errors": len(errors),
+        "latency_ms": {
+            name: round(value, 2)
+            for name, value in percentiles(latencies).items()
+        },
+    }
+
+
+async def main(base_url, sync_base_url, clients, duration, tasks):
+    headers, task_id = await prepare(base_url, tasks)
+    endpoints = {
+        "sync_list": (sync_base_url, "/api/tasks/?limit=20"),
+        "async_list": (base_url, "/api/async/tasks/?limit=20"),
+        "sync_retrieve": (sync_base_url, f"/api/tasks/{task_id}/"),
+        "async_retrieve": (base_url, f"/api/async/tasks/{task_id}/"),
+    }
+    results = {}
+    for name, (url, path) in endpoints.items():
+        results[name] = await load(url, path, headers, clients, duration)
+    return results
+
+
+def run(
+    base_url="http://localhost:8000",
+    sync_base_url="http://localhost:8001",
+    clients=1000,
+    duration=30,
+    tasks=5,
+):
+    """
+    base_url - сервер ASGI для асинхронного API, sync_base_url - сервер
+    WSGI для синхронного: под uvicorn синхронные представления работали бы
+    в пуле потоков ASGI, и сравнение было бы не с WSGI.
+    """
+    return {
+        "parameters": {
+            "base_url": base_url,
+            "sync_base_url": sync_base_url,
+            "clients": clients,
+            "duration": duration,
+            "tasks": tasks,
+        },
+        "results": asyncio.run(
+            main(base_url, sync_base_url, clients, duration, tasks)
+        ),
+    }
@@ -0,0 +1,60 @@
+"""
+Задержка списка задач в зависимости от размера истории пользователя:
+первая и последняя страница limit/offset и первая страница курсора.
+"""
+
+from django.urls import reverse
+
+from task_manager_api.models import StatusChoices, Task
+
+from .utils import (
+    api_client,
+    benchmark_database,
+    benchmark_settings,
+    create_user,
+    latency_ms,
+    timings,
+)
+
+
+def run(history_sizes=(100, 1000, 10000), requests=50, limit=20):
+    results = {}
+    with benchmark_database(), benchmark_settings:
+        user = create_user()
+        client = api_client(user)
+        url = reverse("tasks-list")
+        created = 0
+        for size in sorted(history_sizes):
+            Task.objects.bulk_create(
+                Task(
+                    user=user,
+                    input_data={"a": index, "b": index},
+                    status=StatusChoices.COMPLETED,
+                    result=2 * index,
+                )
+                for index in range(created, size)
+            )
+            created = max(created, size)
+
+            queries = {
+                "first_page": f"?limit={limit}",
+                "last_page": f"?limit={limit}&offset={max(size - limit, 0)}",
+                "cursor": f"?pagination=cursor&limit={limit}",
+            }
+            results[str(size)] = {
+                name: latency_ms(
+                    timings(
+                        lambda query=query: client.get(url + query), requests
+                    )
+                )
+                for name, query in queries.items()
+            }
+
+    return {
+        "parameters": {
+            "history_sizes": list(history_sizes),
+            "requests": requests,
+            "limit": limit,
+        },
+        "results": results,
+    }
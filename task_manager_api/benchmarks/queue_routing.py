@@ -0,0 +1,82 @@
+"""
+Симуляция задержки pending -> completed для коротких задач при смешанной
+нагрузке: одна общая очередь против отдельных очередей по типам задач.
+"""
+
+import heapq
+import random
+
+from .utils import percentiles
+
+SHORT, LONG = "sum_numbers", "countdown"
+
+
+def generate_jobs(duration, short_rate, long_rate, long_seconds, seed):
+    rng = random.Random(seed)
+    jobs = []
+    for kind, rate, service in (
+        (SHORT, short_rate, lambda: rng.expovariate(1 / 0.005)),
+        (LONG, long_rate, lambda: long_seconds),
+    ):
+        now = rng.expovariate(rate)
+        while now < duration:
+            jobs.append((now, kind, service()))
+            now += rng.expovariate(rate)
+    jobs.sort()
+    return jobs
+
+
+def simulate(jobs, pools):
+    """
+    Прогоняет задачи через пулы воркеров.
+
+    pools - список пар (типы задач, concurrency); каждый пул разбирает
+    свою очередь в порядке FIFO. Возвращает задержки по типам задач.
+    """
+    latencies = {}
+    for kinds, concurrency in pools:
+        free_at = [0.0] * concurrency
+        heapq.heapify(free_at)
+        for arrival, kind, service in jobs:
+            if kind not in kinds:
+                continue
+            start = max(arrival, heapq.heappop(free_at))
+            heapq.heappush(free_at, start + service)
+            latencies.setdefault(kind, []).append(start + service - arrival)
+    return latencies
+
+
+def run(
+    duration=300,
+    short_rate=200,
+    long_rate=0.3,
+    long_seconds=10,
+    workers=10,
+    long_workers=4,
+    seed=0,
+):
+    jobs = generate_jobs(duration, short_rate, long_rate, long_seconds, seed)
+    setups = {
+        "shared_queue": [({SHORT, LONG}, workers)],
+        "per_type_queues": [
+            ({SHORT}, workers - long_workers),
+            ({LONG}, long_workers),
+        ],
+    }
+    results = {}
+    for name, pools in setups.items():
+        latencies = simulate(jobs, pools)
+        results[name] = {
+            kind: percentiles(values) for kind, values in latencies.items()
+        }
+    return {
+        "parameters": {
+            "duration": duration,
+            "short_rate": short_rate,
+            "long_rate": long_rate,
+            "long_seconds": long_seconds,
+            "workers": workers,
+            "long_workers": long_workers,
+        },
+        "results": results,
+    }
@@ -0,0 +1,49 @@
+"""
+Стоимость проверки лимита активных задач (acquire + release) в
+зависимости от числа активных задач пользователя. Без Redis это COUNT
+по частичному индексу, с Redis - Lua-скрипты.
+"""
+
+from task_manager_api import quota
+from task_manager_api.models import StatusChoices, Task
+from task_manager_api.redis_client import get_redis
+
+from .utils import (
+    benchmark_database,
+    benchmark_settings,
+    create_user,
+    latency_ms,
+    timings,
+)
+
+
+def run(calls=1000, active_counts=(0, 100, 1000)):
+    results = {}
+    with benchmark_database(), benchmark_settings:
+        user = create_user()
+
+        def check():
+            quota.acquire(user.id)
+            quota.release(user.id)
+
+        created = 0
+        for active in sorted(active_counts):
+            Task.objects.bulk_create(
+                Task(
+                    user=user,
+                    input_data={"a": 1, "b": 1},
+                    status=StatusChoices.PENDING,
+                )
+                for _ in range(created, active)
+            )
+            created = max(created, active)
+            results[str(active)] = latency_ms(timings(check, calls))
+
+    return {
+        "parameters": {
+            "calls": calls,
+            "active_counts": list(active_counts),
+            "backend": "redis" if get_redis() is not None else "database",
+        },
+        "results": results,
+    }
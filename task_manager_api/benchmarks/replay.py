@@ -0,0 +1,94 @@
+"""
+Воспроизведение записанного трафика API.
+
+Файл - JSONL со строками {"method": "POST", "path": "/api/tasks/",
+"body": {...}}. В path можно указать {last_id} - id задачи из последнего
+ответа на создание. Запросы выполняются тестовым клиентом от имени
+временного пользователя, строки без method и path пропускаются.
+"""
+
+import json
+import re
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from .utils import (
+    api_client,
+    benchmark_database,
+    benchmark_settings,
+    create_user,
+    latency_ms,
+)
+
+DEFAULT_TRAFFIC = Path(__file__).with_name("traffic.jsonl")
+
+
+def load_traffic(path):
+    """Возвращает запросы из файла и число пропущенных строк."""
+    requests, skipped = [], 0
+    with open(path) as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(item, dict) or not (
+                "method" in item and "path" in item
+            ):
+                skipped += 1
+                continue
+            requests.append(item)
+    return requests, skipped
+
+
+def endpoint(method, path):
+    # Запросы к разным задачам и страницам группируются вместе
+    path = re.sub(r"/\d+/", "/{id}/", path.split("?")[0])
+    return f"{method} {path}"
+
+
+def run(file=str(DEFAULT_TRAFFIC), repeat=1):
+    traffic, skipped = load_traffic(file)
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    with benchmark_database(), benchmark_settings:
+        client = api_client(create_user())
+        last_id = None
+        for _ in range(repeat):
+            for item in traffic:
+                method = item["method"].upper()
+                path = item["path"].replace("{last_id}", str(last_id))
+                started = time.perf_counter()
+                response = client.generic(
+                    method,
+                    path,
+                    json.dumps(item.get("body")) if "body" in item else "",
+                    content_type="application/json",
+                )
+                elapsed = time.perf_counter() - started
+
+                name = endpoint(method, path)
+                latencies[name].append(elapsed)
+                statuses[name][str(response.status_code)] += 1
+                if response.status_code == 201 and "id" in response.data:
+                    last_id = response.data["id"]
+
+    return {
+        "parameters": {
+            "file": file,
+            "repeat": repeat,
+            "requests": len(traffic),
+            "skipped": skipped,
+        },
+        "results": {
+            name: {
+                "statuses": dict(statuses[name]),
+                "latency_ms": latency_ms(values),
+            }
+            for name, values in latencies.items()
+        },
+    }
@@ -0,0 +1,50 @@
+"""
+Стоимость сериализации списка задач: TaskSerializer (с N+1 по
+пользователю и с select_related) против TaskListEncoder на values().
+"""
+
+from django.contrib.auth.models import User
+from rest_framework.renderers import JSONRenderer
+
+from task_manager_api.models import StatusChoices, Task
+from task_manager_api.serializers import TaskListEncoder, TaskSerializer
+
+from .utils import benchmark_database, measure
+
+
+def create_tasks(rows):
+    user = User.objects.create_user(username="benchmark", password="-")
+    Task.objects.bulk_create(
+        Task(
+            user=user,
+            input_data={"a": index, "b": index},
+            status=StatusChoices.COMPLETED,
+            result=2 * index,
+        )
+        for index in range(rows)
+    )
+    return user
+
+
+def run(rows=10000):
+    renderer = JSONRenderer()
+    with benchmark_database():
+        user = create_tasks(rows)
+        queryset = Task.objects.filter(user=user)
+        encoder = TaskListEncoder(user.username)
+        paths = {
+            "serializer": lambda: TaskSerializer(
+                queryset.all(), many=True
+            ).data,
+            "serializer_select_related": lambda: TaskSerializer(
+                queryset.select_related("user"), many=True
+            ).data,
+            "encoder": lambda: encoder.encode(
+                queryset.values(*encoder.columns)
+            ),
+        }
+        results = {
+            name: measure(lambda: renderer.render(build()))
+            for name, build in paths.items()
+        }
+    return {"parameters": {"rows": rows}, "results": results}
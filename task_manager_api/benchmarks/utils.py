@@ -0,0 +1,90 @@
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+# Настройки на время сценариев с API: тестовый клиент разрешён в
+# ALLOWED_HOSTS, лимит активных задач и кеш результатов не мешают замерам
+benchmark_settings = override_settings(
+    ALLOWED_HOSTS=["testserver"],
+    TASK_MANAGER_ACTIVE_TASKS_LIMIT=10**9,
+    TASK_MANAGER_RESULT_CACHE_ENABLED=False,
+)
+
+
+def percentiles(values, points=(50, 95, 99)):
+    values = sorted(values)
+    if not values:
+        return {}
+    result = {
+        f"p{point}": values[min(len(values) - 1, len(values) * point // 100)]
+        for point in points
+    }
+    result["count"] = len(values)
+    return result
+
+
+def latency_ms(values):
+    """Перцентили задержек в миллисекундах по значениям в секундах."""
+    return {
+        name: value if name == "count" else round(value * 1000, 3)
+        for name, value in percentiles(values).items()
+    }
+
+
+def timings(func, repeat):
+    """Длительности repeat вызовов func в секундах."""
+    values = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        values.append(time.perf_counter() - started)
+    return values
+
+
+def create_user():
+    return User.objects.create_user(
+        username=f"benchmark-{uuid.uuid4().hex[:12]}", password=None
+    )
+
+
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Временная тестовая БД на время сценария, чтобы сценарии с записью
+    не трогали рабочие данные.
+    """
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func):
+    """Время выполнения func в секундах и число SQL-запросов."""
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    # execute_wrapper вместо CaptureQueriesContext: тот хранит не больше
+    # 9000 запросов и на N+1 занижает счёт
+    with connection.execute_wrapper(count):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 4), "queries": queries}
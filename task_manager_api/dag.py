@@ -0,0 +1,379 @@
+"""
+Графы зависимостей задач.
+
+Задача графа ждёт в pending, пока pending_parents > 0, и не
+отправляется в брокер. Воркер, завершивший задачу с has_children,
+уменьшает счётчики её детей; готовые дети получают результаты родителей
+в input_data и отправляются одной группой. Ошибка родителя завершает с
+ошибкой всех его ожидающих потомков, как и не прошедшие проверку после
+подстановки результатов входные данные.
+"""
+
+from collections import Counter, deque
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import events, outbox, quota, stats, versions
+from .dispatch import dispatch_tasks
+from .models import StatusChoices, Task
+from .registry import get_task_type
+
+# Значение поля input_data {"$parent": ключ узла или id задачи}
+# заменяется результатом родителя
+PARENT_REF = "$parent"
+PARENT_FAILED_ERROR = "Родительская задача завершилась с ошибкой"
+INVALID_INPUT_ERROR = "Некорректные входные данные"
+
+Link = Task.parents.through
+
+CHILD_FIELDS = (
+    "id",
+    "user_id",
+    "task_type",
+    "input_data",
+    "priority",
+    "pending_parents",
+    "has_children",
+)
+
+
+def parent_ref(value):
+    """Ключ или id родителя, если value - ссылка на его результат."""
+    if isinstance(value, dict) and list(value) == [PARENT_REF]:
+        return value[PARENT_REF]
+    return None
+
+
+def references(input_data):
+    """Ссылки на родителей в input_data: {поле: ключ или id родителя}."""
+    if not isinstance(input_data, dict):
+        return {}
+    refs = {name: parent_ref(value) for name, value in input_data.items()}
+    return {name: ref for name, ref in refs.items() if ref is not None}
+
+
+def replace_references(input_data, values):
+    """Заменяет ссылки на родителей значениями values по ключу или id."""
+    refs = references(input_data)
+    if not refs:
+        return input_data
+    return {**input_data, **{name: values[ref] for name, ref in refs.items()}}
+
+
+def result_value(result):
+    # Ссылка получает поле "result" итога родителя, например сумму
+    # sum_numbers, а если его нет - итог целиком
+    if isinstance(result, dict) and "result" in result:
+        return result["result"]
+    return result
+
+
+def resolve(input_data, results):
+    """Подставляет в input_data результаты родителей по их id."""
+    return replace_references(
+        input_data,
+        {task_id: result_value(result) for task_id, result in results.items()},
+    )
+
+
+def input_errors(task_type, input_data):
+    """
+    Итог ошибки для задачи, если input_data с подставленными результатами
+    родителей не проходит проверку типа задачи, иначе None.
+    """
+    serializer = get_task_type(task_type).input_serializer(data=input_data)
+    if serializer.is_valid():
+        return None
+    return {"error": INVALID_INPUT_ERROR, "input_data": serializer.errors}
+
+
+def topological_order(nodes):
+    """
+    Узлы графа в порядке, где родители идут раньше детей, или None,
+    если в графе есть цикл.
+    """
+    by_key = {node["key"]: node for node in nodes}
+    waits_for = {
+        key: {parent for parent in node["parents"] if isinstance(parent, str)}
+        for key, node in by_key.items()
+    }
+    children = {key: [] for key in by_key}
+    for key, parents in waits_for.items():
+        for parent in parents:
+            children[parent].append(key)
+
+    ready = deque(key for key in by_key if not waits_for[key])
+    ordered = []
+    while ready:
+        key = ready.popleft()
+        ordered.append(by_key[key])
+        for child in children[key]:
+            waits_for[child].discard(key)
+            if not waits_for[child]:
+                ready.append(child)
+    return ordered if len(ordered) == len(nodes) else None
+
+
+def create(user, nodes, parent_results):
+    """
+    Создаёт задачи графа и связи между ними; вызывается в транзакции.
+
+    nodes - узлы в топологическом порядке, их parents - ключи узлов или
+    id уже выполненных задач, parent_results - итоги таких задач по id.
+    Готовый узел с некорректными после подстановки входными данными и
+    все его потомки создаются завершёнными с ошибкой. Возвращает задачи
+    по ключам узлов.
+    """
+    has_children = {
+        parent
+        for node in nodes
+        for parent in node["parents"]
+        if isinstance(parent, str)
+    }
+    now = timezone.now()
+    tasks = {}
+    for node in nodes:
+        graph_parents = [
+            parent for parent in node["parents"] if isinstance(parent, str)
+        ]
+        input_data = node["input_data"]
+        result = None
+        if any(
+            tasks[parent].status == StatusChoices.FAILED
+            for parent in graph_parents
+        ):
+            result = {"error": PARENT_FAILED_ERROR}
+        elif not graph_parents and references(input_data):
+            # Все родители уже выполнены: задача готова сразу
+            input_data = resolve(input_data, parent_results)
+            result = input_errors(node["task_type"], input_data)
+        failed = result is not None
+        tasks[node["key"]] = Task(
+            user=user,
+            task_type=node["task_type"],
+            input_data=input_data,
+            priority=node.get("priority"),
+            status=StatusChoices.FAILED if failed else StatusChoices.PENDING,
+            result=result,
+            finished_at=now if failed else None,
+            pending_parents=0 if failed else len(graph_parents),
+            has_children=node["key"] in has_children,
+        )
+    Task.objects.bulk_create(tasks.values())
+
+    ids = {key: task.id for key, task in tasks.items()}
+    linked = []
+    for node in nodes:
+        task = tasks[node["key"]]
+        if any(
+            isinstance(parent, str) for parent in node["parents"]
+        ) and references(task.input_data):
+            # Ссылки на узлы графа хранятся по id созданных задач
+            task.input_data = replace_references(
+                task.input_data,
+                {
+                    ref: {PARENT_REF: ids.get(ref, ref)}
+                    for ref in references(task.input_data).values()
+                },
+            )
+            linked.append(task)
+    if linked:
+        Task.objects.bulk_update(linked, ["input_data"])
+    Link.objects.bulk_create(
+        Link(from_task_id=tasks[node["key"]].id, to_task_id=ids.get(ref, ref))
+        for node in nodes
+        for ref in node["parents"]
+    )
+    return tasks
+
+
+def _waiting_children(parent_ids):
+    return Task.objects.filter(
+        id__in=Link.objects.filter(to_task_id__in=parent_ids).values(
+            "from_task_id"
+        ),
+        status=StatusChoices.PENDING,
+        pending_parents__gt=0,
+    )
+
+
+def release_children(results):
+    """
+    Учитывает завершение родителей: results - их итоги по id.
+
+    Строки детей блокируются, поэтому готовым ребёнка видит ровно один
+    из одновременно завершившихся родителей. Готовые дети получают
+    результаты родителей и отправляются в брокер после коммита, их
+    входные данные воркерам не нужно читать из БД. Дети, чьи входные
+    данные не прошли проверку, завершаются с ошибкой вместе с потомками.
+    Возвращает отправленных детей.
+    """
+    with transaction.atomic():
+        children = list(
+            _waiting_children(results)
+            .select_for_update()
+            .order_by("id")
+            .only(*CHILD_FIELDS)
+        )
+        if not children:
+            return []
+
+        finished_parents = Counter(
+            Link.objects.filter(
+                to_task_id__in=results,
+                from_task_id__in=[child.id for child in children],
+            ).values_list("from_task_id", flat=True)
+        )
+        by_amount = {}
+        for child in children:
+            amount = finished_parents[child.id]
+            child.pending_parents -= amount
+            by_amount.setdefault(amount, []).append(child.id)
+        for amount, child_ids in by_amount.items():
+            Task.objects.filter(id__in=child_ids).update(
+                pending_parents=F("pending_parents") - amount
+            )
+
+        ready = [child for child in children if child.pending_parents <= 0]
+        if not ready:
+            return []
+
+        # Итоги завершившихся родителей уже в памяти, из БД читаются
+        # одним запросом только итоги остальных
+        missing = {
+            ref
+            for child in ready
+            for ref in references(child.input_data).values()
+        } - set(results)
+        results = {
+            **results,
+            **dict(
+                Task.objects.filter(id__in=missing).values_list("id", "result")
+            ),
+        }
+        resolved, invalid = [], []
+        for child in ready:
+            if references(child.input_data):
+                child.input_data = resolve(child.input_data, results)
+                resolved.append(child)
+                child.result = input_errors(child.task_type, child.input_data)
+                if child.result is not None:
+                    invalid.append(child)
+        if resolved:
+            Task.objects.bulk_update(resolved, ["input_data"])
+        if invalid:
+            now = timezone.now()
+            for child in invalid:
+                child.status = StatusChoices.FAILED
+                child.finished_at = now
+            Task.objects.bulk_update(
+                invalid, ["status", "result", "finished_at"]
+            )
+            _record_failed(invalid)
+            fail_descendants(
+                [child.id for child in invalid if child.has_children]
+            )
+            failed_ids = {child.id for child in invalid}
+            ready = [child for child in ready if child.id not in failed_ids]
+            if not ready:
+                return []
+
+        # Счётчик лимита увеличивается после коммита, иначе откат
+        # оставил бы места занятыми до reconcile_task_quota
+        for user_id, count in Counter(
+            child.user_id for child in ready
+        ).items():
+            transaction.on_commit(partial(quota.add, user_id, count))
+        unsent = outbox.store(ready)
+        if unsent:
+            transaction.on_commit(partial(dispatch_tasks, unsent))
+        transaction.on_commit(
+            partial(versions.touch_many, [child.user_id for child in ready])
+        )
+    return ready
+
+
+def fail_descendants(parent_ids):
+    """
+    Завершает с ошибкой ожидающих потомков задач parent_ids.
+
+    Они ещё не учтены в лимите активных задач, поэтому лимит не
+    освобождается. Возвращает завершённые задачи.
+    """
+    now = timezone.now()
+    result = {"error": PARENT_FAILED_ERROR}
+    failed = []
+    with transaction.atomic():
+        while parent_ids:
+            children = list(
+                _waiting_children(parent_ids)
+                .select_for_update()
+                .order_by("id")
+                .only("id", "user_id", "task_type", "has_children")
+            )
+            Task.objects.filter(
+                id__in=[child.id for child in children]
+            ).update(
+                status=StatusChoices.FAILED,
+                result=result,
+                pending_parents=0,
+                finished_at=now,
+            )
+            for child in children:
+                child.result = result
+            failed.extend(children)
+            parent_ids = [child.id for child in children if child.has_children]
+        if failed:
+            _record_failed(failed)
+    return failed
+
+
+def _record_failed(failed):
+    """Учитывает переход ожидающих задач failed в failed с их result."""
+    stats.record(
+        (
+            child.id,
+            child.user_id,
+            child.task_type,
+            StatusChoices.PENDING,
+            StatusChoices.FAILED,
+        )
+        for child in failed
+    )
+    transaction.on_commit(
+        partial(
+            events.publish_many,
+            [
+                {
+                    "id": child.id,
+                    "user_id": child.user_id,
+                    "status": StatusChoices.FAILED,
+                    "result": child.result,
+                }
+                for child in failed
+            ],
+        )
+    )
+    transaction.on_commit(
+        partial(versions.touch_many, [child.user_id for child in failed])
+    )
+
+
+def on_finished(finished):
+    """
+    Обрабатывает детей завершённых задач; finished - тройки (task_id,
+    status, result) задач с has_children.
+    """
+    completed, failed = {}, []
+    for task_id, status, result in finished:
+        if status == StatusChoices.COMPLETED:
+            completed[task_id] = result
+        else:
+            failed.append(task_id)
+    if completed:
+        release_children(completed)
+    if failed:
+        fail_descendants(failed)
@@ -0,0 +1,94 @@
+import json
+
+from asgiref.sync import sync_to_async
+from celery import group
+from django.conf import settings
+
+from . import fair_share
+from .models import MAX_PRIORITY
+from .registry import get_task_type
+
+
+def task_kwargs(task):
+    # Небольшие входные данные передаются в сообщении, и воркеру не нужно
+    # читать строку задачи. Крупные воркер читает из БД по id, как и
+    # задачи с детьми: has_children воркер узнаёт из строки.
+    limit = settings.TASK_MANAGER_INLINE_PAYLOAD_MAX_BYTES
+    if (
+        limit
+        and not task.has_children
+        and len(json.dumps(task.input_data)) <= limit
+    ):
+        return {"user_id": task.user_id, "input_data": task.input_data}
+    return {}
+
+
+def message_options(task):
+    # Брокер Redis выдаёт первыми сообщения с меньшим priority, а в API
+    # больший приоритет важнее. Без приоритета задачи действует приоритет
+    # её типа из роутера.
+    if task.priority is None:
+        return {}
+    return {"priority": MAX_PRIORITY - task.priority}
+
+
+def is_batched(task_type):
+    # Такие задачи забирает batch_handler по расписанию
+    return (
+        task_type.batch_handler is not None
+        and task_type.name in settings.TASK_MANAGER_BATCHED_TASK_TYPES
+    )
+
+
+def dispatch_task(task):
+    task_type = get_task_type(task.task_type)
+    if is_batched(task_type):
+        return
+    if fair_share.is_enabled():
+        fair_share.enqueue([task])
+        return
+
+    options = message_options(task)
+    if options:
+        task_type.handler.apply_async((task.id,), task_kwargs(task), **options)
+    else:
+        task_type.handler.delay(task.id, **task_kwargs(task))
+
+
+async def adispatch_task(task):
+    # У Celery нет асинхронной публикации: сообщение отправляется в пуле
+    # потоков, не блокируя цикл событий и общий поток sync_to_async
+    await sync_to_async(dispatch_task, thread_sensitive=False)(task)
+
+
+def task_signature(task):
+    task_type = get_task_type(task.task_type)
+    return task_type.handler.s(task.id, **task_kwargs(task)).set(
+        **message_options(task)
+    )
+
+
+def publish_tasks(tasks, **options):
+    """Отправляет задачи в брокер одной группой, минуя fair_share."""
+    if tasks:
+        group([task_signature(task) for task in tasks]).apply_async(**options)
+
+
+def dispatch_tasks(tasks, **options):
+    immediate = []
+    batch_handlers = set()
+    for task in tasks:
+        task_type = get_task_type(task.task_type)
+        if is_batched(task_type):
+            batch_handlers.add(task_type.batch_handler)
+        else:
+            immediate.append(task)
+    if immediate and fair_share.is_enabled():
+        fair_share.enqueue(immediate)
+        immediate = []
+
+    signatures = [task_signature(task) for task in immediate]
+    signatures.extend(handler.s() for handler in batch_handlers)
+    if signatures:
+        # Группа публикуется через одно соединение с брокером
+        group(signatures).apply_async(**options)
@@ -0,0 +1,48 @@
+import json
+import logging
+
+import redis
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "task_manager:events:user:"
+
+
+def channel(user_id):
+    return f"{CHANNEL_PREFIX}{user_id}"
+
+
+def publish_many(events):
+    """
+    Публикует изменения статусов в канал пользователя Redis pub/sub.
+
+    events - словари с ключами id, user_id, status и result. Ошибка
+    Redis не должна прерывать выполнение задачи, поэтому только пишется в
+    лог.
+    """
+    client = get_redis()
+    if client is None:
+        return
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for event in events:
+            pipe.publish(channel(event["user_id"]), json.dumps(event))
+        pipe.execute()
+    except redis.RedisError:
+        logger.warning("Не удалось опубликовать события задач", exc_info=True)
+
+
+def publish(task_id, user_id, status, result=None):
+    publish_many(
+        [
+            {
+                "id": task_id,
+                "user_id": user_id,
+                "status": status,
+                "result": result,
+            }
+        ]
+    )
@@ -0,0 +1,193 @@
+"""
+Справедливое распределение задач между пользователями.
+
+Созданные задачи попадают не в брокер, а в очереди пользователей в
+Redis. Команда schedule_tasks держит в брокере не больше
+TASK_MANAGER_FAIR_SHARE_WINDOW неначатых задач и пополняет окно по
+взвешенному deficit round robin, поэтому пользователь с тысячами задач
+не задерживает задачи остальных.
+"""
+
+import bisect
+from functools import lru_cache
+from itertools import chain, zip_longest
+
+from django.conf import settings
+
+from .models import StatusChoices, Task
+from .redis_client import get_redis
+
+KEY_PREFIX = "task_manager:fair_share:"
+# Пользователи с непустыми очередями
+USERS_KEY = f"{KEY_PREFIX}users"
+# Отправленные в брокер, но, возможно, ещё не начатые задачи
+INFLIGHT_KEY = f"{KEY_PREFIX}inflight"
+
+# Пользователь удаляется из USERS_KEY вместе с последней задачей, а
+# выбранные задачи сразу попадают в INFLIGHT_KEY: если планировщик
+# упадёт до отправки, он отправит их после перезапуска.
+POP_SCRIPT = """
+local ids = redis.call("LPOP", KEYS[1], ARGV[1]) or {}
+if redis.call("LLEN", KEYS[1]) == 0 then
+    redis.call("SREM", KEYS[2], ARGV[2])
+end
+if #ids > 0 then
+    redis.call("SADD", KEYS[3], unpack(ids))
+end
+return ids
+"""
+
+TASK_FIELDS = (
+    "id",
+    "user_id",
+    "task_type",
+    "input_data",
+    "priority",
+    "has_children",
+)
+
+
+class DeficitRoundRobin:
+    """
+    Взвешенный deficit round robin по очередям пользователей.
+
+    За каждый обход пользователь получает quantum * вес задач кредита.
+    Кредит, не израсходованный из-за нехватки места, переносится на
+    следующий вызов, а у пользователя с опустевшей очередью сгорает.
+    """
+
+    def __init__(self, quantum=1, weights=None):
+        # С нулевым кредитом очередь пользователя никогда не пустеет, и
+        # plan() не завершился бы
+        if quantum <= 0:
+            raise ValueError("quantum должен быть больше 0")
+        for user, weight in (weights or {}).items():
+            if weight <= 0:
+                raise ValueError(
+                    f"Вес пользователя {user} должен быть больше 0"
+                )
+        self.quantum = quantum
+        self.weights = weights or {}
+        self.deficits = {}
+        self.last = None
+
+    def plan(self, backlog, capacity):
+        """
+        Сколько задач взять из очереди каждого пользователя, всего не
+        больше capacity. backlog - длины очередей по user_id.
+        """
+        users = sorted(user for user, size in backlog.items() if size > 0)
+        self.deficits = {user: self.deficits.get(user, 0) for user in users}
+        remaining = {user: backlog[user] for user in users}
+        # Обход продолжается с пользователя после последнего обслуженного
+        if self.last is not None:
+            start = bisect.bisect_right(users, self.last)
+            users = users[start:] + users[:start]
+
+        taken = {}
+        while capacity > 0 and users:
+            for user in users:
+                if capacity == 0:
+                    break
+                self.deficits[user] += self.quantum * self.weights.get(user, 1)
+                count = min(
+                    int(self.deficits[user]), remaining[user], capacity
+                )
+                if count:
+                    taken[user] = taken.get(user, 0) + count
+                    self.deficits[user] -= count
+                    remaining[user] -= count
+                    capacity -= count
+                    self.last = user
+                if not remaining[user]:
+                    self.deficits[user] = 0
+            users = [user for user in users if remaining[user]]
+        return taken
+
+
+@lru_cache(maxsize=None)
+def _pop_script():
+    return get_redis().register_script(POP_SCRIPT)
+
+
+def is_enabled():
+    return settings.TASK_MANAGER_FAIR_SHARE_ENABLED and get_redis() is not None
+
+
+def _queue_key(user_id):
+    return f"{KEY_PREFIX}user:{user_id}"
+
+
+def enqueue(tasks):
+    """Ставит задачи в очереди их пользователей."""
+    by_user = {}
+    for task in tasks:
+        by_user.setdefault(task.user_id, []).append(task.id)
+    if not by_user:
+        return
+
+    pipe = get_redis().pipeline(transaction=True)
+    for user_id, task_ids in by_user.items():
+        pipe.rpush(_queue_key(user_id), *task_ids)
+    pipe.sadd(USERS_KEY, *by_user)
+    pipe.execute()
+
+
+def backlog():
+    """Длины непустых очередей по user_id."""
+    client = get_redis()
+    users = [int(user_id) for user_id in client.smembers(USERS_KEY)]
+    pipe = client.pipeline(transaction=False)
+    for user_id in users:
+        pipe.llen(_queue_key(user_id))
+    return dict(zip(users, pipe.execute()))
+
+
+def _pending_tasks(task_ids):
+    # Задачи, которые за это время завершили или удалили, пропускаются
+    return list(
+        Task.objects.filter(id__in=task_ids, status=StatusChoices.PENDING)
+        .only(*TASK_FIELDS)
+        .order_by()
+    )
+
+
+def inflight_tasks():
+    """
+    Отправленные в брокер задачи, которые воркеры ещё не начали.
+
+    Начатые и завершённые задачи удаляются из INFLIGHT_KEY.
+    """
+    client = get_redis()
+    task_ids = {int(task_id) for task_id in client.smembers(INFLIGHT_KEY)}
+    tasks = _pending_tasks(task_ids)
+    started = task_ids - {task.id for task in tasks}
+    if started:
+        client.srem(INFLIGHT_KEY, *started)
+    return tasks
+
+
+def take(scheduler, capacity):
+    """
+    Забирает из очередей пользователей до capacity задач по плану
+    scheduler. Задачи чередуются по пользователям, чтобы и в брокере
+    очередь не шла подряд от одного пользователя.
+    """
+    plan = scheduler.plan(backlog(), capacity)
+    if not plan:
+        return []
+
+    pipe = get_redis().pipeline(transaction=False)
+    for user_id, count in plan.items():
+        _pop_script()(
+            keys=[_queue_key(user_id), USERS_KEY, INFLIGHT_KEY],
+            args=[count, user_id],
+            client=pipe,
+        )
+    task_ids = [
+        int(task_id)
+        for task_id in chain.from_iterable(zip_longest(*pipe.execute()))
+        if task_id is not None
+    ]
+    order = {task_id: index for index, task_id in enumerate(task_ids)}
+    return sorted(_pending_tasks(task_ids), key=lambda task: order[task.id])
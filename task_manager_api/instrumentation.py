@@ -0,0 +1,382 @@
+"""
+Метрики горячих путей: длительности HTTP-запросов, задач Celery и их
+этапов, число SQL-запросов и время ожидания задачи в очереди.
+
+Наблюдения копятся в памяти процесса и раз в
+TASK_MANAGER_METRICS_FLUSH_SECONDS одним pipeline сбрасываются в Redis,
+где их видят все процессы; /metrics отдаёт гистограммы в текстовом
+формате Prometheus. Без Redis метрики остаются в памяти процесса.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from threading import Lock
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from .redis_client import get_redis
+from .registry import task_type_for
+
+METRICS_KEY = "task_manager:metrics"
+
+SECONDS_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Имя -> (описание, метки, границы корзин)
+METRICS = {
+    "task_manager_http_request_seconds": (
+        "Длительность HTTP-запросов",
+        ("endpoint", "method", "status"),
+        SECONDS_BUCKETS,
+    ),
+    "task_manager_http_db_queries": (
+        "Число SQL-запросов на HTTP-запрос",
+        ("endpoint", "method"),
+        QUERIES_BUCKETS,
+    ),
+    "task_manager_task_seconds": (
+        "Длительность выполнения задач Celery",
+        ("task_type", "task"),
+        SECONDS_BUCKETS,
+    ),
+    "task_manager_task_queue_wait_seconds": (
+        "Ожидание задачи в очереди от отправки (или ETA) до начала",
+        ("task_type", "task"),
+        SECONDS_BUCKETS,
+    ),
+    "task_manager_task_db_queries": (
+        "Число SQL-запросов на задачу Celery",
+        ("task_type", "task"),
+        QUERIES_BUCKETS,
+    ),
+    "task_manager_stage_seconds": (
+        "Длительность этапов запроса или задачи",
+        ("scope", "stage"),
+        SECONDS_BUCKETS,
+    ),
+}
+
+# Эндпоинт или тип задачи, внутри которого выполняются этапы
+_scope = ContextVar("task_manager_metrics_scope", default="unknown")
+# Счётчик SQL-запросов текущего запроса или задачи. Это изменяемый
+# список, поэтому счёт виден и из потоков sync_to_async.
+_queries = ContextVar("task_manager_metrics_queries", default=None)
+
+
+class Histograms:
+    """
+    Несброшенные наблюдения процесса. Для каждой гистограммы и набора
+    меток хранятся счётчики корзин (не накопительные, последняя - +Inf),
+    сумма и число наблюдений.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+
+    def observe(self, name, value, labels):
+        buckets = METRICS[name][2]
+        index = next(
+            (i for i, bound in enumerate(buckets) if value <= bound),
+            len(buckets),
+        )
+        key = (name, labels)
+        with self._lock:
+            values = self._pending.get(key)
+            if values is None:
+                values = self._pending[key] = [0] * (len(buckets) + 3)
+            values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {key: list(values) for key, values in self._pending.items()}
+
+    def take(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        return pending
+
+    def due(self):
+        return (
+            time.monotonic() - self._flushed_at
+            >= settings.TASK_MANAGER_METRICS_FLUSH_SECONDS
+        )
+
+    def flush(self, client):
+        pending = self.take()
+        if not pending:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for (name, labels), values in pending.items():
+                for index, value in enumerate(values):
+                    if value:
+                        pipe.hincrbyfloat(
+                            METRICS_KEY, _field(name, labels, index), value
+                        )
+            pipe.execute()
+        except redis.RedisError:
+            # Метрики не должны ломать запросы и задачи; наблюдения
+            # за этот период теряются
+            pass
+
+
+histograms = Histograms()
+
+
+def _field(name, labels, index):
+    return json.dumps([name, labels, index])
+
+
+def observe(name, value, **labels):
+    if not settings.TASK_MANAGER_METRICS_ENABLED:
+        return
+    histograms.observe(name, value, tuple(labels[n] for n in METRICS[name][1]))
+
+
+def maybe_flush():
+    client = get_redis()
+    if client is not None and histograms.due():
+        histograms.flush(client)
+
+
+@contextmanager
+def stage(name):
+    """Замер этапа внутри текущего запроса или задачи."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(
+            "task_manager_stage_seconds",
+            time.perf_counter() - started,
+            scope=_scope.get(),
+            stage=name,
+        )
+
+
+def count_query(execute, sql, params, many, context):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # Обработчик connection_created: счётчик стоит на каждом соединении
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class MetricsMiddleware:
+    """Длительность и число SQL-запросов для каждого HTTP-запроса."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, tokens = self.start()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self.finish(request, response, started, tokens)
+
+    async def __acall__(self, request):
+        started, tokens = self.start()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self.finish(request, response, started, tokens)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _scope.set(request.resolver_match.view_name or "unknown")
+
+    def start(self):
+        tokens = (_scope.set("unknown"), _queries.set([0]))
+        return time.perf_counter(), tokens
+
+    def finish(self, request, response, started, tokens):
+        elapsed = time.perf_counter() - started
+        endpoint = _scope.get()
+        queries = _queries.get()[0]
+        _scope.reset(tokens[0])
+        _queries.reset(tokens[1])
+
+        status = response.status_code if response is not None else 500
+        observe(
+            "task_manager_http_request_seconds",
+            elapsed,
+            endpoint=endpoint,
+            method=request.method,
+            status=str(status),
+        )
+        observe(
+            "task_manager_http_db_queries",
+            queries,
+            endpoint=endpoint,
+            method=request.method,
+        )
+        maybe_flush()
+
+
+# Задачи, которые сейчас выполняются в процессе: id -> (начало, токены)
+_running = {}
+
+
+def _task_labels(task):
+    short_name = task.name.rsplit(".", 1)[-1]
+    return {
+        "task_type": task_type_for(task.name) or "unknown",
+        "task": short_name,
+    }
+
+
+def add_enqueued_at(sender=None, headers=None, **kwargs):
+    """before_task_publish: время отправки для расчёта ожидания в очереди."""
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+def task_started(sender=None, task_id=None, task=None, **kwargs):
+    """task_prerun: ожидание в очереди и начало замеров задачи."""
+    labels = _task_labels(task)
+    enqueued_at = getattr(task.request, "enqueued_at", None)
+    if enqueued_at is not None:
+        # Для отложенных задач ожидание считается от ETA
+        eta = task.request.eta
+        if eta:
+            enqueued_at = max(
+                enqueued_at, datetime.fromisoformat(eta).timestamp()
+            )
+        observe(
+            "task_manager_task_queue_wait_seconds",
+            max(time.time() - enqueued_at, 0),
+            **labels,
+        )
+    tokens = (_scope.set(labels["task_type"]), _queries.set([0]))
+    _running[task_id] = (time.perf_counter(), tokens)
+
+
+def task_finished(sender=None, task_id=None, task=None, **kwargs):
+    """task_postrun: длительность и число SQL-запросов задачи."""
+    started, tokens = _running.pop(task_id, (None, None))
+    if started is None:
+        return
+    labels = _task_labels(task)
+    queries = _queries.get()[0]
+    _scope.reset(tokens[0])
+    _queries.reset(tokens[1])
+
+    observe(
+        "task_manager_task_seconds", time.perf_counter() - started, **labels
+    )
+    observe("task_manager_task_db_queries", queries, **labels)
+    maybe_flush()
+
+
+def flush_on_shutdown(**kwargs):
+    client = get_redis()
+    if client is not None:
+        histograms.flush(client)
+
+
+def collect():
+    """Итоговые значения гистограмм: из Redis и несброшенные этого процесса."""
+    totals = {}
+
+    def add(name, labels, index, value):
+        key = (name, tuple(labels))
+        if key not in totals:
+            totals[key] = [0] * (len(METRICS[name][2]) + 3)
+        totals[key][index] += value
+
+    client = get_redis()
+    if client is not None:
+        histograms.flush(client)
+        for field, value in client.hgetall(METRICS_KEY).items():
+            name, labels, index = json.loads(field)
+            if name in METRICS:
+                add(name, labels, index, float(value))
+    else:
+        for (name, labels), values in histograms.snapshot().items():
+            for index, value in enumerate(values):
+                add(name, labels, index, value)
+    return totals
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(names, values, **extra):
+    pairs = [*zip(names, values), *extra.items()]
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def render():
+    """Гистограммы в текстовом формате Prometheus."""
+    totals = collect()
+    lines = []
+    for name, (description, label_names, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), values in sorted(totals.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, value in zip((*buckets, "+Inf"), values):
+                cumulative += value
+                label_text = _format_labels(label_names, labels, le=bound)
+                lines.append(f"{name}_bucket{{{label_text}}} {cumulative:g}")
+            label_text = _format_labels(label_names, labels)
+            lines.append(f"{name}_sum{{{label_text}}} {values[-2]:g}")
+            lines.append(f"{name}_count{{{label_text}}} {values[-1]:g}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(
+        render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
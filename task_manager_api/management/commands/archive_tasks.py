@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from task_manager_api.archive import archive_tasks
+
+
+class Command(BaseCommand):
+    help = "Переносит старые завершённые задачи в архив"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Возраст задач в днях, по умолчанию "
+            "TASK_MANAGER_ARCHIVE_AFTER_DAYS",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Задач в одной транзакции, по умолчанию "
+            "TASK_MANAGER_ARCHIVE_CHUNK_SIZE",
+        )
+
+    def handle(self, *args, **options):
+        archived = archive_tasks(options["days"], options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Перенесено в архив задач: {archived}")
+        )
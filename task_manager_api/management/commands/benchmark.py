@@ -0,0 +1,103 @@
+import inspect
+import json
+import platform
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from task_manager.celery import app
+from task_manager_api.benchmarks import MANUAL_SCENARIOS, SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Запускает сценарии нагрузочного тестирования"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=(
+                f"Сценарии: {', '.join(SCENARIOS)}. По умолчанию все, "
+                f"кроме {', '.join(sorted(MANUAL_SCENARIOS))}."
+            ),
+        )
+        parser.add_argument(
+            "--output", help="Файл для результатов в формате JSON"
+        )
+        parser.add_argument(
+            "--param",
+            action="append",
+            default=[],
+            metavar="KEY=VALUE",
+            help=(
+                "Параметр сценария, значение разбирается как JSON. "
+                "Передаётся сценариям, у которых он есть"
+            ),
+        )
+        # Сам флаг читают настройки: SQLite, без Redis, Celery в eager-режиме
+        parser.add_argument(
+            "--sqlite",
+            action="store_true",
+            help="Запуск без Postgres, Redis и воркеров",
+        )
+
+    def handle(self, *args, **options):
+        names = options["scenarios"] or [
+            name for name in SCENARIOS if name not in MANUAL_SCENARIOS
+        ]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f"Неизвестные сценарии: {', '.join(sorted(unknown))}"
+            )
+        params = self.parse_params(options["param"])
+        arguments = {
+            name: {
+                key: value
+                for key, value in params.items()
+                if key in inspect.signature(SCENARIOS[name]).parameters
+            }
+            for name in names
+        }
+        unused = set(params).difference(*map(set, arguments.values()))
+        if unused:
+            raise CommandError(
+                f"Параметры не подходят сценариям: {', '.join(sorted(unused))}"
+            )
+
+        report = {
+            "environment": self.environment(),
+            "results": {
+                name: SCENARIOS[name](**arguments[name]) for name in names
+            },
+        }
+
+        report = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                file.write(report)
+        self.stdout.write(report)
+
+    def parse_params(self, items):
+        params = {}
+        for item in items:
+            key, sep, value = item.partition("=")
+            if not sep:
+                raise CommandError(f"Параметр без значения: {item}")
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    def environment(self):
+        # Сохраняется вместе с результатами для сравнения запусков
+        return {
+            "started_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "redis": bool(settings.TASK_MANAGER_REDIS_URL),
+            "celery_eager": app.conf.task_always_eager,
+        }
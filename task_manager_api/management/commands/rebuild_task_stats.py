@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from task_manager_api import stats
+from task_manager_api.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает статистику задач в Redis по Task и TaskArchive. "
+        "Запускать при остановленных воркерах и API: переходы статусов "
+        "во время пересчёта будут потеряны"
+    )
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            raise CommandError("TASK_MANAGER_REDIS_URL не настроен")
+
+        users = stats.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Статистика пересчитана для пользователей: {users}"
+            )
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from task_manager_api import quota
+from task_manager_api.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счётчики активных задач в Redis по таблице Task. "
+        "Запускать при остановленных воркерах и API: созданные и "
+        "завершённые во время пересчёта задачи будут потеряны счётчиками"
+    )
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            raise CommandError("TASK_MANAGER_REDIS_URL не настроен")
+
+        counts = quota.reconcile()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Счётчики пересчитаны для пользователей: {len(counts)}"
+            )
+        )
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from task_manager.celery import app
+from task_manager_api.outbox import relay_batch
+
+
+class Command(BaseCommand):
+    help = "Отправляет задачи из outbox в брокер"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.TASK_MANAGER_OUTBOX_BATCH_SIZE,
+            help="Задач в одной пачке",
+        )
+        parser.add_argument(
+            "--poll-seconds",
+            type=float,
+            default=settings.TASK_MANAGER_OUTBOX_POLL_SECONDS,
+            help="Пауза, когда outbox пуст",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выйти, когда outbox опустеет",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total = 0
+        # Одно соединение с брокером на всё время работы; пока outbox не
+        # пуст, пачки отправляются без пауз
+        with app.producer_or_acquire() as producer:
+            while True:
+                sent = relay_batch(batch_size, producer)
+                total += sent
+                if sent == batch_size:
+                    continue
+                if options["once"]:
+                    break
+                close_old_connections()
+                time.sleep(options["poll_seconds"])
+
+        self.stdout.write(self.style.SUCCESS(f"Отправлено задач: {total}"))
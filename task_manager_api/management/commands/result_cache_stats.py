@@ -0,0 +1,12 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from task_manager_api import result_cache
+
+
+class Command(BaseCommand):
+    help = "Показывает попадания и промахи кеша результатов по типам задач"
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(result_cache.stats(), indent=2))
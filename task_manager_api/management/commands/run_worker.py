@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from task_manager.celery import app
+
+
+class Command(BaseCommand):
+    help = "Запускает Celery-воркер с профилем из TASK_MANAGER_WORKER_PROFILES"
+
+    def add_arguments(self, parser):
+        parser.add_argument("profile", nargs="?", default="all")
+        parser.add_argument("--loglevel", default="info")
+
+    def handle(self, *args, **options):
+        profile = settings.TASK_MANAGER_WORKER_PROFILES.get(options["profile"])
+        if profile is None:
+            raise CommandError(
+                f"Неизвестный профиль. Доступны: "
+                f"{', '.join(settings.TASK_MANAGER_WORKER_PROFILES)}"
+            )
+
+        app.worker_main(
+            [
+                "worker",
+                f"--loglevel={options['loglevel']}",
+                f"--hostname={options['profile']}@%h",
+                f"--queues={','.join(profile['queues'])}",
+                f"--concurrency={profile['concurrency']}",
+                f"--prefetch-multiplier={profile['prefetch_multiplier']}",
+            ]
+        )
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from task_manager.celery import app
+from task_manager_api import fair_share
+from task_manager_api.dispatch import publish_tasks
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправляет задачи из очередей пользователей в брокер по "
+        "deficit round robin"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window",
+            type=int,
+            default=settings.TASK_MANAGER_FAIR_SHARE_WINDOW,
+            help="Сколько неначатых задач держать в брокере",
+        )
+        parser.add_argument(
+            "--poll-seconds",
+            type=float,
+            default=settings.TASK_MANAGER_FAIR_SHARE_POLL_SECONDS,
+            help="Пауза, когда окно заполнено или очереди пусты",
+        )
+
+    def handle(self, *args, **options):
+        if not fair_share.is_enabled():
+            raise CommandError(
+                "Нужны TASK_MANAGER_FAIR_SHARE_ENABLED и Redis "
+                "(TASK_MANAGER_REDIS_URL)"
+            )
+
+        try:
+            scheduler = fair_share.DeficitRoundRobin(
+                settings.TASK_MANAGER_FAIR_SHARE_QUANTUM,
+                settings.TASK_MANAGER_FAIR_SHARE_WEIGHTS,
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        with app.producer_or_acquire() as producer:
+            # Задачи, выбранные до перезапуска, могли не дойти до брокера;
+            # дубли безопасны, переходы статусов идемпотентны
+            publish_tasks(fair_share.inflight_tasks(), producer=producer)
+            while True:
+                capacity = options["window"] - len(fair_share.inflight_tasks())
+                tasks = fair_share.take(scheduler, capacity)
+                publish_tasks(tasks, producer=producer)
+                if not tasks:
+                    close_old_connections()
+                    time.sleep(options["poll_seconds"])
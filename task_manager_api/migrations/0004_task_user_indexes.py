@@ -0,0 +1,33 @@
+# Generated by Django 4.2.18 on 2026-10-18 04:36
+
+from django.db import migrations, models
+from task_manager_api.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Индексы Task строятся CONCURRENTLY, вне транзакции
+    atomic = False
+
+    dependencies = [
+        (
+            "task_manager_api",
+            "0003_alter_task_options_alter_task_created_at_and_more",
+        ),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "running"])),
+                fields=["user", "status"],
+                name="task_user_active_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                fields=["user", "-created_at"], name="task_user_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.18 on 2026-10-18 04:37
+
+from django.db import migrations, models
+from task_manager_api.migration_operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+
+
+class Migration(migrations.Migration):
+    # Индексы Task строятся CONCURRENTLY, вне транзакции
+    atomic = False
+
+    dependencies = [
+        ("task_manager_api", "0004_task_user_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="task",
+            options={
+                "ordering": ["-created_at", "-id"],
+                "verbose_name": "Задача",
+                "verbose_name_plural": "Задачи",
+            },
+        ),
+        RemoveIndexConcurrently(
+            model_name="task",
+            name="task_user_created_idx",
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="task_user_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.18 on 2026-10-18 04:43
+
+from django.db import migrations, models
+from task_manager_api.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Индексы Task строятся CONCURRENTLY, вне транзакции
+    atomic = False
+
+    dependencies = [
+        ("task_manager_api", "0005_task_keyset_ordering"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["task_type", "id"],
+                name="task_pending_type_idx",
+            ),
+        ),
+    ]
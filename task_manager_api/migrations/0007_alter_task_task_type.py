@@ -0,0 +1,20 @@
+# Generated by Django 4.2.18 on 2026-10-18 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager_api", "0006_task_pending_type_idx"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="task",
+            name="task_type",
+            field=models.CharField(
+                default="sum_numbers", max_length=50, verbose_name="Тип задачи"
+            ),
+        ),
+    ]
@@ -0,0 +1,134 @@
+# Generated by Django 4.2.18 on 2026-10-18 05:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from task_manager_api.migration_operations import AddIndexConcurrently
+
+
+def create_archive_table(apps, schema_editor):
+    """
+    В Postgres архив - таблица, секционированная по created_at. Первичный
+    ключ секционированной таблицы обязан включать ключ секционирования,
+    поэтому DDL пишется вручную; секции по месяцам создаёт archive_tasks.
+    """
+    model = apps.get_model("task_manager_api", "TaskArchive")
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        schema_editor.create_model(model)
+        return
+
+    quote = schema_editor.quote_name
+    columns = ", ".join(
+        f"{quote(field.column)} {field.db_type(connection)} "
+        f"{'NULL' if field.null else 'NOT NULL'}"
+        for field in model._meta.local_fields
+    )
+    schema_editor.execute(
+        f"CREATE TABLE {quote(model._meta.db_table)} ({columns}, "
+        f"PRIMARY KEY ({quote('id')}, {quote('created_at')})) "
+        f"PARTITION BY RANGE ({quote('created_at')})"
+    )
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+
+
+def drop_archive_table(apps, schema_editor):
+    schema_editor.delete_model(
+        apps.get_model("task_manager_api", "TaskArchive")
+    )
+
+
+class Migration(migrations.Migration):
+    # Индексы Task строятся CONCURRENTLY, вне транзакции
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("task_manager_api", "0007_alter_task_task_type"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="TaskArchive",
+                    fields=[
+                        (
+                            "id",
+                            models.BigIntegerField(
+                                primary_key=True, serialize=False
+                            ),
+                        ),
+                        (
+                            "task_type",
+                            models.CharField(
+                                max_length=50, verbose_name="Тип задачи"
+                            ),
+                        ),
+                        (
+                            "input_data",
+                            models.JSONField(verbose_name="Входные данные"),
+                        ),
+                        (
+                            "status",
+                            models.CharField(
+                                choices=[
+                                    ("pending", "Запланировано"),
+                                    ("running", "Выполняется"),
+                                    ("completed", "Выполнено"),
+                                    ("failed", "Ошибка"),
+                                ],
+                                max_length=20,
+                                verbose_name="Статус",
+                            ),
+                        ),
+                        (
+                            "result",
+                            models.JSONField(
+                                blank=True,
+                                null=True,
+                                verbose_name="Результат",
+                            ),
+                        ),
+                        (
+                            "created_at",
+                            models.DateTimeField(
+                                verbose_name="Дата создания"
+                            ),
+                        ),
+                        (
+                            "user",
+                            models.ForeignKey(
+                                db_constraint=False,
+                                db_index=False,
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to=settings.AUTH_USER_MODEL,
+                                verbose_name="Пользователь",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "verbose_name": "Архивная задача",
+                        "verbose_name_plural": "Архивные задачи",
+                        "ordering": ["-created_at", "-id"],
+                        "indexes": [
+                            models.Index(
+                                fields=["user", "-created_at", "-id"],
+                                name="taskarchive_user_created_idx",
+                            )
+                        ],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_archive_table, drop_archive_table),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("status__in", ["completed", "failed"])),
+                fields=["created_at"],
+                name="task_terminal_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.18 on 2026-10-18 05:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager_api", "0008_task_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата создания"
+                    ),
+                ),
+                (
+                    "task",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="outbox_entry",
+                        to="task_manager_api.task",
+                        verbose_name="Задача",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Задача к отправке",
+                "verbose_name_plural": "Задачи к отправке",
+            },
+        ),
+    ]
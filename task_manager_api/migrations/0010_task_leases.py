@@ -0,0 +1,38 @@
+# Generated by Django 4.2.18 on 2026-10-18 05:25
+
+from django.db import migrations, models
+from task_manager_api.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Индексы Task строятся CONCURRENTLY, вне транзакции
+    atomic = False
+
+    dependencies = [
+        ("task_manager_api", "0009_task_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="attempts",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Попытки выполнения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="lease_expires_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Аренда истекает"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("status", "running")),
+                fields=["lease_expires_at"],
+                name="task_running_lease_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.18 on 2026-10-18 05:31
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager_api", "0010_task_leases"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                null=True,
+                validators=[django.core.validators.MaxValueValidator(9)],
+                verbose_name="Приоритет",
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskarchive",
+            name="priority",
+            field=models.PositiveSmallIntegerField(
+                blank=True, null=True, verbose_name="Приоритет"
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.18 on 2026-10-18 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager_api", "0011_task_priority"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="finished_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Завершение"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="started_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Начало выполнения"
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskarchive",
+            name="finished_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Завершение"
+            ),
+        ),
+        migrations.AddField(
+            model_name="taskarchive",
+            name="started_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Начало выполнения"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.18 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_manager_api", "0012_task_runtime"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="has_children",
+            field=models.BooleanField(
+                default=False, verbose_name="Есть дочерние задачи"
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="parents",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="children",
+                to="task_manager_api.task",
+                verbose_name="Родительские задачи",
+            ),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="pending_parents",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Незавершённые родители"
+            ),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
 
@@ -10,6 +12,11 @@ class StatusChoices(models.TextChoices):
     FAILED = "failed", _("Ошибка")
 
 
+ACTIVE_STATUSES = [StatusChoices.PENDING, StatusChoices.RUNNING]
+TERMINAL_STATUSES = [StatusChoices.COMPLETED, StatusChoices.FAILED]
+MAX_PRIORITY = 9
+
+
 class TaskTypeChoices(models.TextChoices):
     SUM_NUMBERS = "sum_numbers", _("сумма чисел")
     COUNTDOWN = "countdown", _("обратный отсчет")
@@ -19,9 +26,9 @@ class Task(models.Model):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, verbose_name=_("Пользователь")
     )
+    # Допустимые типы задаются реестром task_manager_api.registry
     task_type = models.CharField(
-        max_length=15,
-        choices=TaskTypeChoices.choices,
+        max_length=50,
         default=TaskTypeChoices.SUM_NUMBERS,
         verbose_name=_("Тип задачи"),
     )
@@ -38,11 +45,171 @@ class Task(models.Model):
     created_at = models.DateTimeField(
         auto_now_add=True, verbose_name=_("Дата создания")
     )
+    # Для средней длительности в статистике задач
+    started_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Начало выполнения")
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Завершение")
+    )
+    # Воркер продлевает аренду, пока выполняет задачу; задачу с истёкшей
+    # арендой reaper возвращает в очередь или завершает с ошибкой
+    lease_expires_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Аренда истекает")
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name=_("Попытки выполнения")
+    )
+    # 0-9, больше - важнее; без приоритета действует приоритет типа задачи
+    priority = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        validators=[MaxValueValidator(MAX_PRIORITY)],
+        verbose_name=_("Приоритет"),
+    )
+
+    # Задача графа ждёт в pending, пока pending_parents родителей не
+    # завершатся, и до этого не отправляется в брокер
+    parents = models.ManyToManyField(
+        "self",
+        symmetrical=False,
+        related_name="children",
+        blank=True,
+        verbose_name=_("Родительские задачи"),
+    )
+    pending_parents = models.PositiveIntegerField(
+        default=0, verbose_name=_("Незавершённые родители")
+    )
+    # Воркер, завершивший такую задачу, разблокирует её детей
+    has_children = models.BooleanField(
+        default=False, verbose_name=_("Есть дочерние задачи")
+    )
 
     def __str__(self):
         return f"Task {self.id} {self.task_type} {self.status}"
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["user", "status"],
+                name="task_user_active_idx",
+                condition=Q(status__in=ACTIVE_STATUSES),
+            ),
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="task_user_created_idx",
+            ),
+            models.Index(
+                fields=["task_type", "id"],
+                name="task_pending_type_idx",
+                condition=Q(status=StatusChoices.PENDING),
+            ),
+            # Поиск завершённых задач для архивации
+            models.Index(
+                fields=["created_at"],
+                name="task_terminal_created_idx",
+                condition=Q(status__in=TERMINAL_STATUSES),
+            ),
+            # Поиск истёкших аренд: в индексе только выполняющиеся задачи
+            models.Index(
+                fields=["lease_expires_at"],
+                name="task_running_lease_idx",
+                condition=Q(status=StatusChoices.RUNNING),
+            ),
+        ]
         verbose_name = _("Задача")
         verbose_name_plural = _("Задачи")
+
+
+class TaskArchive(models.Model):
+    """
+    Завершённые задачи, перенесённые из Task командой archive_tasks.
+
+    В Postgres таблица секционирована по месяцам created_at с первичным
+    ключом (id, created_at); для Django первичный ключ - id задачи.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    # Без внешнего ключа в БД: секционированная таблица создаётся вручную,
+    # удаление пользователя каскадно обрабатывает Django
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,
+        verbose_name=_("Пользователь"),
+    )
+    task_type = models.CharField(max_length=50, verbose_name=_("Тип задачи"))
+    input_data = models.JSONField(verbose_name=_("Входные данные"))
+    status = models.CharField(
+        max_length=20,
+        choices=StatusChoices.choices,
+        verbose_name=_("Статус"),
+    )
+    result = models.JSONField(
+        null=True, blank=True, verbose_name=_("Результат")
+    )
+    created_at = models.DateTimeField(verbose_name=_("Дата создания"))
+    priority = models.PositiveSmallIntegerField(
+        null=True, blank=True, verbose_name=_("Приоритет")
+    )
+    started_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Начало выполнения")
+    )
+    finished_at = models.DateTimeField(
+        null=True, blank=True, verbose_name=_("Завершение")
+    )
+
+    def __str__(self):
+        return f"Archived task {self.id} {self.task_type} {self.status}"
+
+    def as_task(self):
+        """Несохраняемый Task с теми же полями для сериализации."""
+        return Task(
+            id=self.id,
+            user_id=self.user_id,
+            task_type=self.task_type,
+            input_data=self.input_data,
+            status=self.status,
+            result=self.result,
+            created_at=self.created_at,
+            priority=self.priority,
+        )
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="taskarchive_user_created_idx",
+            ),
+        ]
+        verbose_name = _("Архивная задача")
+        verbose_name_plural = _("Архивные задачи")
+
+
+class TaskOutbox(models.Model):
+    """
+    Задачи, ожидающие отправки в брокер.
+
+    Запись создаётся в одной транзакции с задачей, отправляет её
+    relay_outbox; после сбоя брокера задача будет отправлена повторно.
+    """
+
+    task = models.OneToOneField(
+        Task,
+        on_delete=models.CASCADE,
+        related_name="outbox_entry",
+        verbose_name=_("Задача"),
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True, verbose_name=_("Дата создания")
+    )
+
+    def __str__(self):
+        return f"Outbox entry {self.id} for task {self.task_id}"
+
+    class Meta:
+        verbose_name = _("Задача к отправке")
+        verbose_name_plural = _("Задачи к отправке")
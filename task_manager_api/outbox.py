@@ -0,0 +1,62 @@
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import transaction
+
+from .dispatch import dispatch_tasks
+from .models import TaskOutbox
+
+
+def is_enabled():
+    return settings.TASK_MANAGER_DISPATCH_MODE == "outbox"
+
+
+def atomic():
+    """
+    Транзакция создания задач: в режиме "outbox" задачи и записи outbox
+    сохраняются вместе, в режиме "direct" транзакция не нужна.
+    """
+    return transaction.atomic() if is_enabled() else nullcontext()
+
+
+def store(tasks):
+    """
+    Записывает созданные задачи в outbox; вызывается в той же транзакции,
+    что и их создание.
+
+    Возвращает задачи, которые нужно отправить в брокер сразу: все в
+    режиме "direct", ни одной в режиме "outbox".
+    """
+    if not is_enabled():
+        return list(tasks)
+    TaskOutbox.objects.bulk_create(TaskOutbox(task=task) for task in tasks)
+    return []
+
+
+def relay_batch(batch_size=None, producer=None):
+    """
+    Отправляет в брокер до batch_size самых старых записей outbox и
+    удаляет их. Возвращает число отправленных задач.
+
+    Записи блокируются с SKIP LOCKED, поэтому relay можно запускать в
+    нескольких экземплярах. Если транзакция не зафиксируется после
+    отправки, задачи уйдут ещё раз: воркеры не перезапускают уже
+    завершённые задачи.
+    """
+    batch_size = batch_size or settings.TASK_MANAGER_OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        entries = list(
+            TaskOutbox.objects.select_for_update(
+                skip_locked=True, of=("self",)
+            )
+            .select_related("task")
+            .order_by("id")[:batch_size]
+        )
+        if not entries:
+            return 0
+
+        dispatch_tasks([entry.task for entry in entries], producer=producer)
+        TaskOutbox.objects.filter(
+            id__in=[entry.id for entry in entries]
+        ).delete()
+    return len(entries)
@@ -0,0 +1,160 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    LimitOffsetPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TaskCursorPagination(BasePagination):
+    """
+    Keyset-пагинация по (created_at, id) в порядке убывания.
+
+    Страница выбирается условием по индексу, а не OFFSET, поэтому её
+    стоимость не зависит от глубины, и общий COUNT не выполняется.
+    """
+
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    default_limit = 100
+    max_limit = 1000
+    invalid_cursor_message = "Некорректный курсор"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            # Первое условие даёт границу диапазона для индекса,
+            # второе разрешает совпадения по created_at.
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+
+        page = list(queryset.order_by("-created_at", "-id")[: self.limit + 1])
+        has_next = len(page) > self.limit
+        page = page[: self.limit]
+        self.next_position = self.get_position(page[-1]) if has_next else None
+        return page
+
+    def get_position(self, item):
+        # Строки могут быть и объектами Task, и словарями из values()
+        if isinstance(item, dict):
+            return item["created_at"], item["id"]
+        return item.created_at, item.id
+
+    def get_limit(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.limit_query_param],
+                strict=True,
+                cutoff=self.max_limit,
+            )
+        except (KeyError, ValueError):
+            return self.default_limit
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            decoded = urlsafe_b64decode(encoded.encode("ascii")).decode(
+                "ascii"
+            )
+            created_at, pk = decoded.split("|")
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def encode_cursor(self, position):
+        created_at, pk = position
+        value = f"{created_at.isoformat()}|{pk}"
+        return urlsafe_b64encode(value.encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+
+class TaskPagination(LimitOffsetPagination):
+    """
+    Limit/offset по умолчанию, keyset-пагинация по ?pagination=cursor
+    или при наличии ?cursor=.
+    """
+
+    mode_query_param = "pagination"
+    cursor_pagination_class = TaskCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if self.use_cursor(request):
+            self.cursor_pagination = self.cursor_pagination_class()
+            return self.cursor_pagination.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination is not None:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class AsyncTaskPagination(LimitOffsetPagination):
+    """
+    Limit/offset для асинхронного API: acount() и асинхронная итерация
+    вместо синхронного paginate_queryset. Без ?limit= пагинации нет.
+    """
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.count = await queryset.acount()
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return [
+            row
+            async for row in queryset[self.offset : self.offset + self.limit]
+        ]
+
+    def get_paginated_data(self, data):
+        return {
+            "count": self.count,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
@@ -0,0 +1,124 @@
+import logging
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.db.models import Count
+
+from .models import ACTIVE_STATUSES, Task
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "task_manager:active_tasks:"
+
+# Проверка лимита и увеличение счётчика выполняются атомарно,
+# поэтому параллельные запросы не могут вместе превысить лимит.
+ACQUIRE_SCRIPT = """
+local current = tonumber(redis.call("GET", KEYS[1]) or "0")
+local amount = tonumber(ARGV[1])
+if current + amount > tonumber(ARGV[2]) then
+    return -1
+end
+return redis.call("INCRBY", KEYS[1], amount)
+"""
+
+RELEASE_SCRIPT = """
+local current = tonumber(redis.call("GET", KEYS[1]) or "0")
+local value = math.max(current - tonumber(ARGV[1]), 0)
+if value == 0 then
+    redis.call("DEL", KEYS[1])
+else
+    redis.call("SET", KEYS[1], value)
+end
+return value
+"""
+
+
+def _key(user_id):
+    return f"{KEY_PREFIX}{user_id}"
+
+
+@lru_cache(maxsize=None)
+def _script(source):
+    return get_redis().register_script(source)
+
+
+def _database_acquire(user_id, amount, limit):
+    active_tasks = Task.objects.filter(
+        user_id=user_id, status__in=ACTIVE_STATUSES, pending_parents=0
+    ).count()
+    return active_tasks + amount <= limit
+
+
+def acquire(user_id, amount=1):
+    limit = settings.TASK_MANAGER_ACTIVE_TASKS_LIMIT
+    if get_redis() is None:
+        return _database_acquire(user_id, amount, limit)
+
+    try:
+        return (
+            _script(ACQUIRE_SCRIPT)(keys=[_key(user_id)], args=[amount, limit])
+            >= 0
+        )
+    except redis.RedisError:
+        # Недоступный Redis не должен останавливать создание задач: лимит
+        # проверяется по БД, счётчик исправит reconcile_task_quota
+        logger.warning(
+            "Счётчик активных задач недоступен, проверка по БД", exc_info=True
+        )
+        return _database_acquire(user_id, amount, limit)
+
+
+def add(user_id, amount=1):
+    """
+    Учитывает задачи без проверки лимита: задачи графа, дождавшиеся
+    родителей, не откладываются, раз граф уже принят.
+    """
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.incrby(_key(user_id), amount)
+    except redis.RedisError:
+        logger.warning(
+            "Не удалось увеличить счётчик активных задач", exc_info=True
+        )
+
+
+def release(user_id, amount=1):
+    if get_redis() is None:
+        return
+    try:
+        _script(RELEASE_SCRIPT)(keys=[_key(user_id)], args=[amount])
+    except redis.RedisError:
+        logger.warning(
+            "Не удалось уменьшить счётчик активных задач", exc_info=True
+        )
+
+
+def reconcile():
+    """
+    Перезаписывает счётчики активных задач числами из БД.
+
+    Изменения счётчиков между подсчётом и перезаписью теряются, поэтому
+    запускать при остановленных воркерах и API.
+    """
+    client = get_redis()
+    if client is None:
+        return {}
+
+    counts = dict(
+        Task.objects.filter(status__in=ACTIVE_STATUSES, pending_parents=0)
+        .order_by()
+        .values("user_id")
+        .annotate(active=Count("id"))
+        .values_list("user_id", "active")
+    )
+    pipe = client.pipeline(transaction=True)
+    for key in client.scan_iter(match=f"{KEY_PREFIX}*"):
+        pipe.delete(key)
+    for user_id, active in counts.items():
+        pipe.set(_key(user_id), active)
+    pipe.execute()
+    return counts
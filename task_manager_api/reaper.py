@@ -0,0 +1,105 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import dag, events, outbox, quota, stats, versions
+from .dispatch import dispatch_tasks
+from .models import StatusChoices, Task
+
+LEASE_EXPIRED_ERROR = "Воркер не продлил аренду задачи"
+
+
+def reap_chunk(now, chunk_size):
+    """
+    Обрабатывает до chunk_size задач с истёкшей арендой: возвращает их в
+    pending и отправляет заново или, после TASK_MANAGER_MAX_ATTEMPTS
+    запусков, завершает с ошибкой вместе с ожидающими потомками.
+    Возвращает число задач.
+
+    Задачи ищутся по частичному индексу выполняющихся задач, поэтому
+    запрос не зависит от размера таблицы.
+    """
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status=StatusChoices.RUNNING, lease_expires_at__lt=now)
+            .order_by("lease_expires_at")
+            .only(
+                "id",
+                "user_id",
+                "task_type",
+                "input_data",
+                "priority",
+                "attempts",
+                "has_children",
+            )[:chunk_size]
+        )
+        if not tasks:
+            return 0
+
+        max_attempts = settings.TASK_MANAGER_MAX_ATTEMPTS
+        requeued = [task for task in tasks if task.attempts < max_attempts]
+        failed = [task for task in tasks if task.attempts >= max_attempts]
+        for group, status, result in (
+            (requeued, StatusChoices.PENDING, None),
+            (failed, StatusChoices.FAILED, {"error": LEASE_EXPIRED_ERROR}),
+        ):
+            if not group:
+                continue
+            for task in group:
+                task.status, task.result = status, result
+            Task.objects.filter(
+                id__in=[task.id for task in group],
+                status=StatusChoices.RUNNING,
+            ).update(
+                status=status,
+                result=result,
+                lease_expires_at=None,
+                finished_at=now if status == StatusChoices.FAILED else None,
+            )
+        stats.record(
+            (
+                task.id,
+                task.user_id,
+                task.task_type,
+                StatusChoices.RUNNING,
+                task.status,
+            )
+            for task in tasks
+        )
+        dag.on_finished(
+            (task.id, task.status, task.result)
+            for task in failed
+            if task.has_children
+        )
+        unsent = outbox.store(requeued)
+
+    if unsent:
+        dispatch_tasks(unsent)
+    for user_id, count in Counter(task.user_id for task in failed).items():
+        quota.release(user_id, count)
+    events.publish_many(
+        {
+            "id": task.id,
+            "user_id": task.user_id,
+            "status": task.status,
+            "result": task.result,
+        }
+        for task in tasks
+    )
+    versions.touch_many(task.user_id for task in tasks)
+    return len(tasks)
+
+
+def reap_expired_tasks(chunk_size=None):
+    """Обрабатывает все задачи с истёкшей арендой. Возвращает их число."""
+    chunk_size = chunk_size or settings.TASK_MANAGER_REAPER_CHUNK_SIZE
+    now = timezone.now()
+    total = 0
+    while True:
+        reaped = reap_chunk(now, chunk_size)
+        total += reaped
+        if reaped < chunk_size:
+            return total
@@ -0,0 +1,11 @@
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+
+@lru_cache(maxsize=None)
+def get_redis():
+    if not settings.TASK_MANAGER_REDIS_URL:
+        return None
+    return redis.Redis.from_url(settings.TASK_MANAGER_REDIS_URL)
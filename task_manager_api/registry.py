@@ -0,0 +1,70 @@
+from dataclasses import dataclass
+from typing import Any, Optional
+
+DEFAULT_QUEUE = "celery"
+
+
+@dataclass(frozen=True)
+class TaskType:
+    """
+    Описание типа задачи.
+
+    handler - Celery-задача, принимающая (task_id, user_id=None,
+    input_data=None); input_serializer проверяет input_data при создании
+    задачи через API. batch_handler, если задан, умеет выполнять ожидающие
+    задачи этого типа пачкой, helpers - прочие Celery-задачи типа, которые
+    отправляются в ту же очередь. cacheable означает, что результат
+    зависит только от input_data и может браться из кеша результатов,
+    cache_ttl переопределяет TASK_MANAGER_RESULT_CACHE_TTL для этого типа.
+    """
+
+    name: str
+    handler: Any
+    input_serializer: Any
+    queue: str = DEFAULT_QUEUE
+    routing_key: Optional[str] = None
+    priority: Optional[int] = None
+    batch_handler: Any = None
+    helpers: tuple = ()
+    cacheable: bool = False
+    cache_ttl: Optional[int] = None
+
+
+_task_types = {}
+_routes = {}
+# Имя Celery-задачи -> имя типа задачи
+_handler_types = {}
+
+
+def register(task_type):
+    _task_types[task_type.name] = task_type
+
+    route = {"queue": task_type.queue}
+    if task_type.routing_key is not None:
+        route["routing_key"] = task_type.routing_key
+    if task_type.priority is not None:
+        route["priority"] = task_type.priority
+    handlers = (task_type.handler, task_type.batch_handler, *task_type.helpers)
+    for handler in handlers:
+        if handler is not None:
+            _routes[handler.name] = route
+            _handler_types[handler.name] = task_type.name
+    return task_type
+
+
+def get_task_type(name):
+    return _task_types.get(name)
+
+
+def task_type_names():
+    return list(_task_types)
+
+
+def task_type_for(task_name):
+    """Имя типа задачи по имени её Celery-задачи."""
+    return _handler_types.get(task_name)
+
+
+def route_task(name, args, kwargs, options, task=None, **kw):
+    """Celery-роутер: очередь и приоритет берутся из описания типа."""
+    return _routes.get(name)
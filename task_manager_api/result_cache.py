@@ -0,0 +1,170 @@
+import hashlib
+import json
+import logging
+import time
+from collections import Counter, OrderedDict
+from threading import Lock
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+
+from .registry import get_task_type, task_type_names
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "task_manager:result:"
+STATS_PREFIX = "task_manager:result_cache_stats:"
+
+
+class LocalLRUCache:
+    """Небольшой LRU-кеш процесса перед Redis."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LocalLRUCache(settings.TASK_MANAGER_RESULT_CACHE_LOCAL_SIZE)
+
+
+def _ttl(task_type_name):
+    if not settings.TASK_MANAGER_RESULT_CACHE_ENABLED:
+        return None
+    task_type = get_task_type(task_type_name)
+    if task_type is None or not task_type.cacheable:
+        return None
+    if task_type.cache_ttl is not None:
+        return task_type.cache_ttl
+    return settings.TASK_MANAGER_RESULT_CACHE_TTL
+
+
+def cache_key(task_type, input_data):
+    canonical = json.dumps(
+        input_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    digest = hashlib.sha256(canonical.encode()).hexdigest()
+    return f"{KEY_PREFIX}{task_type}:{digest}"
+
+
+def _count(task_type, event, amount):
+    key = f"{STATS_PREFIX}{task_type}:{event}"
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+
+
+def get_many(items):
+    """
+    Ищет закешированные результаты для пар (task_type, input_data).
+
+    Возвращает список той же длины с результатом или None. Промахи
+    локального кеша запрашиваются у Redis одним запросом.
+    """
+    results = [None] * len(items)
+    missing = {}
+    counters = Counter()
+    for index, (task_type, input_data) in enumerate(items):
+        ttl = _ttl(task_type)
+        if not ttl:
+            continue
+        key = cache_key(task_type, input_data)
+        results[index] = local_cache.get(key)
+        if results[index] is None:
+            missing.setdefault(key, []).append((index, ttl))
+        else:
+            counters[task_type, "hits"] += 1
+
+    if missing:
+        try:
+            found = cache.get_many(list(missing))
+        except redis.RedisError:
+            # Недоступный кеш - промах, задача просто выполнится
+            logger.warning("Кеш результатов недоступен", exc_info=True)
+            found = {}
+        for key, entries in missing.items():
+            value = found.get(key)
+            for index, ttl in entries:
+                results[index] = value
+                task_type = items[index][0]
+                counters[task_type, "misses" if value is None else "hits"] += 1
+            if value is not None:
+                local_cache.set(key, value, entries[0][1])
+
+    try:
+        for (task_type, event), amount in counters.items():
+            _count(task_type, event, amount)
+    except redis.RedisError:
+        pass
+    return results
+
+
+def get(task_type, input_data):
+    return get_many([(task_type, input_data)])[0]
+
+
+def store(task_type, input_data, result):
+    store_many([(task_type, input_data, result)])
+
+
+def store_many(items):
+    """Кеширует результаты для троек (task_type, input_data, result)."""
+    by_ttl = {}
+    for task_type, input_data, result in items:
+        ttl = _ttl(task_type)
+        if ttl:
+            key = cache_key(task_type, input_data)
+            by_ttl.setdefault(ttl, {})[key] = result
+            local_cache.set(key, result, ttl)
+    try:
+        for ttl, values in by_ttl.items():
+            cache.set_many(values, ttl)
+    except redis.RedisError:
+        logger.warning("Не удалось сохранить результаты в кеш", exc_info=True)
+
+
+def stats():
+    cacheable = [name for name in task_type_names() if _ttl(name)]
+    keys = {
+        (task_type, event): f"{STATS_PREFIX}{task_type}:{event}"
+        for task_type in cacheable
+        for event in ("hits", "misses")
+    }
+    values = cache.get_many(list(keys.values()))
+    return {
+        task_type: {
+            event: values.get(keys[task_type, event], 0)
+            for event in ("hits", "misses")
+        }
+        for task_type in cacheable
+    }
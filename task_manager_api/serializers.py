@@ -1,7 +1,13 @@
+from operator import itemgetter
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator
 from rest_framework import serializers
 
-from .models import Task
+from . import dag
+from .models import StatusChoices, Task, TaskTypeChoices
+from .registry import get_task_type, task_type_names
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -21,10 +27,259 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class NumberField(serializers.Field):
+    default_error_messages = {"invalid": "Ожидается число."}
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, float)):
+            self.fail("invalid")
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+class SumNumbersInputSerializer(serializers.Serializer):
+    a = NumberField()
+    b = NumberField()
+
+
+def countdown_max_seconds():
+    if settings.TASK_MANAGER_COUNTDOWN_MODE == "eta":
+        return settings.TASK_MANAGER_COUNTDOWN_MAX_SECONDS
+    # Спящий воркер не подтверждает сообщение весь отсчёт, и дольше
+    # таймаута видимости оно было бы доставлено повторно
+    return settings.CELERY_BROKER_TRANSPORT_OPTIONS["visibility_timeout"]
+
+
+class CountdownInputSerializer(serializers.Serializer):
+    seconds = NumberField(
+        validators=[
+            MinValueValidator(0),
+            MaxValueValidator(countdown_max_seconds),
+        ]
+    )
+
+
 class TaskSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
+    task_type = serializers.CharField(
+        max_length=50, default=TaskTypeChoices.SUM_NUMBERS
+    )
 
     class Meta:
         model = Task
-        fields = "__all__"
+        # Служебные поля воркеров, reaper, статистики и графов задач
+        exclude = [
+            "started_at",
+            "finished_at",
+            "lease_expires_at",
+            "attempts",
+            "parents",
+            "pending_parents",
+            "has_children",
+        ]
         read_only_fields = ["status", "result", "created_at"]
+
+    def validate_task_type(self, value):
+        if get_task_type(value) is None:
+            raise serializers.ValidationError(
+                f"Неизвестный тип задачи. Доступны: "
+                f"{', '.join(task_type_names())}"
+            )
+        return value
+
+    def validate(self, attrs):
+        attrs["input_data"] = self.validate_input(
+            attrs["task_type"], attrs.get("input_data")
+        )
+        return attrs
+
+    def validate_input(self, task_type, input_data, optional=()):
+        input_serializer = get_task_type(task_type).input_serializer(
+            data=input_data
+        )
+        for name in optional:
+            if name in input_serializer.fields:
+                input_serializer.fields[name].required = False
+        if not input_serializer.is_valid():
+            raise serializers.ValidationError(
+                {"input_data": input_serializer.errors}
+            )
+        return input_serializer.validated_data
+
+
+class ParentField(serializers.Field):
+    """Ключ узла графа или id уже выполненной задачи пользователя."""
+
+    default_error_messages = {"invalid": "Ожидается ключ узла или id задачи."}
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (str, int)):
+            self.fail("invalid")
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+class TaskGraphNodeSerializer(TaskSerializer):
+    key = serializers.CharField(max_length=100)
+    parents = serializers.ListField(child=ParentField(), default=list)
+
+    class Meta(TaskSerializer.Meta):
+        exclude = [
+            name for name in TaskSerializer.Meta.exclude if name != "parents"
+        ]
+
+    def validate(self, attrs):
+        # Повторно указанный родитель - та же зависимость
+        attrs["parents"] = list(dict.fromkeys(attrs["parents"]))
+        input_data = attrs.get("input_data")
+        refs = dag.references(input_data)
+        if not refs:
+            return super().validate(attrs)
+
+        parent_field = ParentField()
+        for name, ref in refs.items():
+            try:
+                parent_field.run_validation(ref)
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError(
+                    {"input_data": {name: e.detail}}
+                )
+        # Поля-ссылки проверяются, когда известны результаты родителей,
+        # остальные поля и их обязательность - сейчас
+        literal = {
+            name: value
+            for name, value in input_data.items()
+            if name not in refs
+        }
+        attrs["input_data"] = {
+            **self.validate_input(attrs["task_type"], literal, optional=refs),
+            **{name: input_data[name] for name in refs},
+        }
+        # Ссылка на результат означает и зависимость от родителя
+        attrs["parents"] = list(
+            dict.fromkeys([*attrs["parents"], *refs.values()])
+        )
+        return attrs
+
+
+class TaskGraphSerializer(serializers.Serializer):
+    """
+    Граф задач: родители узла - ключи других узлов или id уже
+    выполненных задач пользователя.
+    """
+
+    nodes = TaskGraphNodeSerializer(many=True, allow_empty=False)
+
+    def validate_nodes(self, nodes):
+        limit = settings.TASK_MANAGER_GRAPH_MAX_SIZE
+        if len(nodes) > limit:
+            raise serializers.ValidationError(
+                f"Слишком много задач в графе ({limit})"
+            )
+
+        keys = {node["key"] for node in nodes}
+        if len(keys) != len(nodes):
+            raise serializers.ValidationError(
+                "Ключи узлов графа должны быть уникальными"
+            )
+        for node in nodes:
+            for parent in node["parents"]:
+                if isinstance(parent, str) and parent not in keys:
+                    raise serializers.ValidationError(
+                        f"Узел {node['key']}: неизвестный родитель {parent}"
+                    )
+
+        ordered = dag.topological_order(nodes)
+        if ordered is None:
+            raise serializers.ValidationError("Граф задач содержит цикл")
+        return ordered
+
+    def validate(self, attrs):
+        task_ids = {
+            parent
+            for node in attrs["nodes"]
+            for parent in node["parents"]
+            if isinstance(parent, int)
+        }
+        tasks = {
+            task["id"]: task
+            for task in Task.objects.filter(
+                user_id=self.context["request"].user.id, id__in=task_ids
+            ).values("id", "status", "result")
+        }
+        for task_id in sorted(task_ids):
+            if task_id not in tasks:
+                raise serializers.ValidationError(
+                    f"Задача {task_id} не найдена"
+                )
+            if tasks[task_id]["status"] != StatusChoices.COMPLETED:
+                raise serializers.ValidationError(
+                    f"Задача {task_id} не выполнена"
+                )
+        attrs["parent_results"] = {
+            task_id: task["result"] for task_id, task in tasks.items()
+        }
+        return attrs
+
+
+class TaskListEncoder:
+    """
+    Быстрая сериализация списка задач без ModelSerializer.
+
+    Строки читаются через values(), а каждое поле кодируется заранее
+    выбранной функцией. Все задачи списка принадлежат пользователю
+    запроса, поэтому поле user - его username без JOIN на auth_user.
+    fields - разреженный набор полей из ?fields=; неизвестные поля
+    игнорируются, пустой набор означает все поля TaskSerializer.
+    """
+
+    # Имя поля -> (колонка для values() или None, кодировщик или None)
+    FIELDS = {
+        "id": ("id", None),
+        "user": (None, None),
+        "task_type": ("task_type", None),
+        "input_data": ("input_data", None),
+        "status": ("status", None),
+        "result": ("result", None),
+        "created_at": (
+            "created_at",
+            serializers.DateTimeField().to_representation,
+        ),
+        "priority": ("priority", None),
+    }
+    # Нужны keyset-пагинации, даже если не запрошены
+    REQUIRED_COLUMNS = ("id", "created_at")
+
+    def __init__(self, username, fields=None):
+        names = [
+            name for name in (fields or "").split(",") if name in self.FIELDS
+        ] or list(self.FIELDS)
+        self.getters = [
+            (name, self._getter(username, *self.FIELDS[name]))
+            for name in names
+        ]
+        self.columns = list(
+            dict.fromkeys(
+                [
+                    self.FIELDS[name][0]
+                    for name in names
+                    if self.FIELDS[name][0]
+                ]
+                + list(self.REQUIRED_COLUMNS)
+            )
+        )
+
+    @staticmethod
+    def _getter(username, column, encoder):
+        if column is None:
+            return lambda row: username
+        if encoder is None:
+            return itemgetter(column)
+        return lambda row: encoder(row[column])
+
+    def encode(self, rows):
+        return [{name: get(row) for name, get in self.getters} for row in rows]
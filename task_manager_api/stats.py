@@ -0,0 +1,241 @@
+"""
+Счётчики задач пользователя по типу и статусу и время выполнения.
+
+Хранятся в хеше Redis на пользователя и обновляются переходами статусов,
+поэтому /api/tasks/stats/ не читает таблицу задач. Без Redis статистика
+считается запросом к БД. rebuild_task_stats пересчитывает счётчики по
+Task и TaskArchive.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+import redis
+from django.db import connection, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Sum
+
+from .models import StatusChoices, Task, TaskArchive
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "task_manager:stats:user:"
+# Время начала выполняющихся задач для подсчёта длительности
+STARTED_KEY = "task_manager:stats:started"
+
+# Задача, сразу перешедшая из pending в completed (входные данные в
+# сообщении, пакетный обработчик), выполнялась мгновенно. Задачи,
+# созданные сразу выполненными из кеша результатов, в длительность не
+# входят.
+TRANSITION_SCRIPT = """
+local prefix = "count:" .. ARGV[2] .. ":"
+if ARGV[3] ~= "" then
+    redis.call("HINCRBY", KEYS[1], prefix .. ARGV[3], -1)
+end
+redis.call("HINCRBY", KEYS[1], prefix .. ARGV[4], 1)
+if ARGV[4] == "running" then
+    redis.call("HSET", KEYS[2], ARGV[1], ARGV[5])
+    return 0
+end
+local started = redis.call("HGET", KEYS[2], ARGV[1])
+redis.call("HDEL", KEYS[2], ARGV[1])
+if ARGV[4] == "completed" and ARGV[3] ~= "" then
+    local runtime = 0
+    if started then
+        runtime = math.max(tonumber(ARGV[5]) - tonumber(started), 0)
+    end
+    redis.call("HINCRBYFLOAT", KEYS[1], "runtime_sum:" .. ARGV[2], runtime)
+    redis.call("HINCRBY", KEYS[1], "runtime_count:" .. ARGV[2], 1)
+end
+return 0
+"""
+
+
+def _key(user_id):
+    return f"{KEY_PREFIX}{user_id}"
+
+
+@lru_cache(maxsize=None)
+def _script():
+    return get_redis().register_script(TRANSITION_SCRIPT)
+
+
+def record(transitions):
+    """
+    Учитывает переходы (task_id, user_id, task_type, status до или None
+    для новой задачи, status после) после коммита транзакции.
+    """
+    client = get_redis()
+    transitions = list(transitions)
+    if client is None or not transitions:
+        return
+
+    def apply():
+        now = time.time()
+        try:
+            pipe = client.pipeline(transaction=False)
+            for task_id, user_id, task_type, previous, status in transitions:
+                _script()(
+                    keys=[_key(user_id), STARTED_KEY],
+                    args=[task_id, task_type, previous or "", status, now],
+                    client=pipe,
+                )
+            pipe.execute()
+        except redis.RedisError:
+            # Как и события, статистика не должна прерывать задачу;
+            # расхождение исправит rebuild_task_stats
+            logger.warning("Не удалось обновить статистику", exc_info=True)
+
+    transaction.on_commit(apply)
+
+
+def record_created(tasks):
+    record(
+        (task.id, task.user_id, task.task_type, None, task.status)
+        for task in tasks
+    )
+
+
+def _aggregate(queryset):
+    """
+    Счётчики по (user_id, task_type, status) и суммарная длительность
+    выполненных задач по (user_id, task_type).
+    """
+    counts = {
+        (row["user_id"], row["task_type"], row["status"]): row["count"]
+        for row in queryset.order_by()
+        .values("user_id", "task_type", "status")
+        .annotate(count=Count("id"))
+    }
+    runtime = {
+        (row["user_id"], row["task_type"]): (row["total"], row["count"])
+        for row in queryset.filter(
+            status=StatusChoices.COMPLETED,
+            started_at__isnull=False,
+            finished_at__isnull=False,
+        )
+        .order_by()
+        .values("user_id", "task_type")
+        .annotate(
+            total=Sum(
+                ExpressionWrapper(
+                    F("finished_at") - F("started_at"),
+                    output_field=DurationField(),
+                )
+            ),
+            count=Count("id"),
+        )
+    }
+    return counts, runtime
+
+
+def _database_fields(querysets):
+    """Поля хешей Redis по пользователям, посчитанные по БД."""
+    fields = defaultdict(dict)
+    for queryset in querysets:
+        counts, runtime = _aggregate(queryset)
+        for (user_id, task_type, status), count in counts.items():
+            field = f"count:{task_type}:{status}"
+            fields[user_id][field] = fields[user_id].get(field, 0) + count
+        for (user_id, task_type), (total, count) in runtime.items():
+            user_fields = fields[user_id]
+            for field, value in (
+                (f"runtime_sum:{task_type}", total.total_seconds()),
+                (f"runtime_count:{task_type}", count),
+            ):
+                user_fields[field] = user_fields.get(field, 0) + value
+    return fields
+
+
+def _format(fields):
+    by_type = {}
+    for field, value in fields.items():
+        kind, _, rest = field.partition(":")
+        if kind == "count":
+            task_type, _, status = rest.partition(":")
+            entry = by_type.setdefault(task_type, {"by_status": {}})
+            entry["by_status"][status] = int(value)
+        else:
+            entry = by_type.setdefault(rest, {"by_status": {}})
+            entry[kind] = float(value)
+
+    by_status = dict.fromkeys(StatusChoices.values, 0)
+    by_task_type = {}
+    for task_type, entry in sorted(by_type.items()):
+        statuses = dict.fromkeys(StatusChoices.values, 0)
+        statuses.update(entry["by_status"])
+        for status, count in statuses.items():
+            by_status[status] = by_status.get(status, 0) + count
+        runtime_count = entry.get("runtime_count", 0)
+        by_task_type[task_type] = {
+            "total": sum(statuses.values()),
+            "by_status": statuses,
+            "avg_runtime_seconds": (
+                round(entry["runtime_sum"] / runtime_count, 6)
+                if runtime_count
+                else None
+            ),
+        }
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_task_type": by_task_type,
+    }
+
+
+def get(user_id):
+    """Статистика задач пользователя, включая архивные."""
+    client = get_redis()
+    if client is None:
+        fields = _database_fields(
+            [
+                Task.objects.filter(user_id=user_id),
+                TaskArchive.objects.filter(user_id=user_id),
+            ]
+        )
+        return _format(fields[user_id])
+    return _format(
+        {
+            field.decode(): value.decode()
+            for field, value in client.hgetall(_key(user_id)).items()
+        }
+    )
+
+
+def rebuild():
+    """
+    Пересчитывает счётчики всех пользователей по Task и TaskArchive.
+    Возвращает число пользователей с задачами.
+
+    Счётчики перезаписываются целиком, поэтому переходы, случившиеся
+    между чтением БД и записью в Redis, будут потеряны: запускать при
+    остановленных воркерах и API.
+    """
+    client = get_redis()
+    if client is None:
+        return 0
+
+    # Обе таблицы читаются из одного снимка: задача, перенесённая в архив
+    # между запросами, иначе учлась бы дважды или ни разу. Уровень
+    # изоляции задаётся только в начале собственной транзакции.
+    repeatable_read = (
+        connection.vendor == "postgresql" and not connection.in_atomic_block
+    )
+    with transaction.atomic():
+        if repeatable_read:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+                )
+        fields = _database_fields(
+            [Task.objects.all(), TaskArchive.objects.all()]
+        )
+    pipe = client.pipeline(transaction=True)
+    for key in client.scan_iter(match=f"{KEY_PREFIX}*"):
+        pipe.delete(key)
+    for user_id, user_fields in fields.items():
+        pipe.hset(_key(user_id), mapping=user_fields)
+    pipe.execute()
+    return len(fields)
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import time
+
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .authentication import CachedJWTAuthentication
+from .events import channel
+from .models import StatusChoices, Task
+from .views import TaskViewSet
+
+TERMINAL_STATUSES = {StatusChoices.COMPLETED, StatusChoices.FAILED}
+KEEPALIVE_SECONDS = 15
+
+task_retrieve = TaskViewSet.as_view({"get": "retrieve"})
+
+
+async def authenticate(request):
+    """
+    JWT из заголовка Authorization или параметра ?token=: EventSource в
+    браузере не умеет передавать заголовки.
+    """
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is not None:
+        raw_token = authentication.get_raw_token(header)
+    else:
+        raw_token = request.GET.get("token")
+    if raw_token is None:
+        return None
+
+    validated_token = authentication.get_validated_token(raw_token)
+    return await sync_to_async(authentication.get_user)(validated_token)
+
+
+def format_event(event):
+    return f"event: task\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def event_stream(client, pubsub, task_id=None, snapshot=None):
+    """
+    Отдаёт события задач пользователя в формате Server-Sent Events.
+
+    Поток одной задачи закрывается, когда она завершается, поток всех
+    задач - через TASK_MANAGER_STREAM_MAX_SECONDS, после чего EventSource
+    переподключается сам.
+    """
+    deadline = time.monotonic() + settings.TASK_MANAGER_STREAM_MAX_SECONDS
+    try:
+        if snapshot is not None:
+            yield format_event(snapshot)
+            if snapshot["status"] in TERMINAL_STATUSES:
+                return
+
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=KEEPALIVE_SECONDS
+            )
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+
+            event = json.loads(message["data"])
+            if task_id is not None and event["id"] != task_id:
+                continue
+            yield format_event(event)
+            if task_id is not None and event["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def wait_for_task(user_id, task_id, timeout):
+    """
+    Ждёт, пока задача покинет pending/running, но не дольше timeout секунд.
+
+    Ожидание идёт по уведомлениям Redis pub/sub, без опроса БД, и не
+    занимает поток.
+    """
+    client = redis.asyncio.Redis.from_url(settings.TASK_MANAGER_REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(channel(user_id))
+        task_status = await (
+            Task.objects.filter(id=task_id, user_id=user_id)
+            .values_list("status", flat=True)
+            .afirst()
+        )
+        if task_status is None or task_status in TERMINAL_STATUSES:
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=remaining
+            )
+            if message is None:
+                continue
+            event = json.loads(message["data"])
+            if event["id"] == task_id and event["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+def parse_wait(request):
+    try:
+        wait = float(request.GET.get("wait", 0))
+    except ValueError:
+        return 0
+    return min(max(wait, 0), settings.TASK_MANAGER_LONG_POLL_MAX_SECONDS)
+
+
+async def task_detail(request, pk):
+    """
+    GET /api/tasks/{id}/ с необязательным ?wait=<секунды>.
+
+    Без wait это обычный retrieve из TaskViewSet. С wait, если задача ещё
+    активна, запрос асинхронно ждёт её завершения и отдаёт итоговую
+    строку.
+    """
+    response = await sync_to_async(task_retrieve)(request, pk=pk)
+    wait = parse_wait(request)
+    if (
+        not wait
+        or not settings.TASK_MANAGER_REDIS_URL
+        or response.status_code not in (200, 304)
+        # 304 по If-None-Match: статус неизвестен, его проверит ожидание
+        or (
+            response.status_code == 200
+            and response.data["status"] in TERMINAL_STATUSES
+        )
+    ):
+        return response
+
+    await wait_for_task(request.user.id, pk, wait)
+    return await sync_to_async(task_retrieve)(request, pk=pk)
+
+
+async def task_events(request, pk=None):
+    try:
+        user = await authenticate(request)
+    except (AuthenticationFailed, InvalidToken) as e:
+        return JsonResponse({"detail": e.detail}, status=401)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Учетные данные не были предоставлены."}, status=401
+        )
+    if not settings.TASK_MANAGER_REDIS_URL:
+        return JsonResponse(
+            {"detail": "Поток событий недоступен без Redis."}, status=503
+        )
+
+    client = redis.asyncio.Redis.from_url(settings.TASK_MANAGER_REDIS_URL)
+    pubsub = client.pubsub()
+    # Подписка до чтения статуса, чтобы не пропустить завершение между ними
+    await pubsub.subscribe(channel(user.id))
+
+    snapshot = None
+    if pk is not None:
+        snapshot = await (
+            Task.objects.filter(id=pk, user_id=user.id)
+            .values("id", "user_id", "status", "result")
+            .afirst()
+        )
+        if snapshot is None:
+            await asyncio.gather(pubsub.aclose(), client.aclose())
+            return JsonResponse({"detail": "Не найдено."}, status=404)
+
+    return StreamingHttpResponse(
+        event_stream(client, pubsub, pk, snapshot),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,29 @@
+from .models import TaskTypeChoices
+from .registry import TaskType, register
+from .serializers import CountdownInputSerializer, SumNumbersInputSerializer
+from .tasks import (
+    countdown_task,
+    finish_countdown_task,
+    sum_numbers_batch_task,
+    sum_numbers_task,
+)
+
+register(
+    TaskType(
+        name=TaskTypeChoices.SUM_NUMBERS,
+        handler=sum_numbers_task,
+        input_serializer=SumNumbersInputSerializer,
+        queue="sum_numbers",
+        batch_handler=sum_numbers_batch_task,
+        cacheable=True,
+    )
+)
+register(
+    TaskType(
+        name=TaskTypeChoices.COUNTDOWN,
+        handler=countdown_task,
+        input_serializer=CountdownInputSerializer,
+        queue="countdown",
+        helpers=(finish_countdown_task,),
+    )
+)
@@ -1,39 +1,180 @@
 import time
 
 from celery import shared_task
+from django.conf import settings
 
-from .models import Task
+from . import archive, reaper, result_cache
+from .batching import run_sum_numbers_batch
+from .instrumentation import stage
+from .models import StatusChoices, TaskTypeChoices
+from .transitions import finish_task, mark_running, renew_lease, start_task
 
 
 @shared_task
-def sum_numbers_task(task_id):
-    task = Task.objects.get(id=task_id)
-    task.status = "running"
-    task.save()
+def sum_numbers_task(task_id, user_id=None, input_data=None):
+    # Входные данные из сообщения: сразу считаем и пишем один раз
+    expected_status, has_children = StatusChoices.PENDING, False
+    if input_data is None:
+        with stage("start"):
+            task = start_task(task_id)
+        if task is None:
+            return
+        user_id, input_data = task["user_id"], task["input_data"]
+        expected_status = StatusChoices.RUNNING
+        has_children = task["has_children"]
 
     try:
-        result = task.input_data["a"] + task.input_data["b"]
-        task.result = {"result": result}
-        task.status = "completed"
+        result = input_data["a"] + input_data["b"]
+        status, result = StatusChoices.COMPLETED, {"result": result}
     except Exception as e:
-        task.result = {"error": str(e)}
-        task.status = "failed"
-    finally:
-        task.save()
+        status, result = StatusChoices.FAILED, {"error": str(e)}
+
+    with stage("finish"):
+        finish_task(
+            task_id,
+            user_id,
+            status,
+            result,
+            TaskTypeChoices.SUM_NUMBERS,
+            expected_status,
+            has_children,
+        )
+    if status == StatusChoices.COMPLETED:
+        with stage("result_cache"):
+            result_cache.store(TaskTypeChoices.SUM_NUMBERS, input_data, result)
+
+
+@shared_task
+def sum_numbers_batch_task():
+    if TaskTypeChoices.SUM_NUMBERS not in (
+        settings.TASK_MANAGER_BATCHED_TASK_TYPES
+    ):
+        return 0
+
+    total = 0
+    while True:
+        processed = run_sum_numbers_batch(settings.TASK_MANAGER_BATCH_SIZE)
+        total += processed
+        if processed < settings.TASK_MANAGER_BATCH_SIZE:
+            return total
+
+
+def _countdown_seconds(input_data):
+    seconds = input_data["seconds"]
+    # Те же ошибки, что выдал бы time.sleep
+    if isinstance(seconds, bool) or not isinstance(seconds, (int, float)):
+        raise TypeError(
+            f"'{type(seconds).__name__}' object cannot be interpreted "
+            "as an integer"
+        )
+    if seconds < 0:
+        raise ValueError("sleep length must be non-negative")
+    return seconds
+
+
+def sleep_with_heartbeat(task_id, seconds):
+    """Ждёт seconds секунд, продлевая аренду задачи каждую треть срока."""
+    interval = settings.TASK_MANAGER_LEASE_SECONDS / 3
+    while seconds > 0:
+        step = min(interval, seconds)
+        time.sleep(step)
+        seconds -= step
+        if seconds > 0:
+            renew_lease(task_id)
+
+
+def schedule_countdown_finish(task_id, user_id, seconds, has_children):
+    """
+    Планирует finish_countdown_task через seconds секунд шагами не длиннее
+    TASK_MANAGER_COUNTDOWN_HOP_SECONDS: неподтверждённое ETA-сообщение
+    дольше таймаута видимости брокер доставил бы повторно.
+    """
+    hop = min(seconds, settings.TASK_MANAGER_COUNTDOWN_HOP_SECONDS)
+    kwargs = {}
+    if has_children:
+        kwargs["has_children"] = True
+    if seconds > hop:
+        kwargs["remaining"] = seconds - hop
+    options = {"countdown": hop}
+    if kwargs:
+        options["kwargs"] = kwargs
+    finish_countdown_task.apply_async((task_id, user_id), **options)
 
 
 @shared_task
-def countdown_task(task_id):
-    task = Task.objects.get(id=task_id)
-    task.status = "running"
-    task.save()
+def countdown_task(task_id, user_id=None, input_data=None):
+    has_children = False
+    with stage("start"):
+        if input_data is None:
+            task = start_task(task_id)
+            if task is None:
+                return
+            user_id, input_data = task["user_id"], task["input_data"]
+            has_children = task["has_children"]
+        elif not mark_running(task_id, user_id, TaskTypeChoices.COUNTDOWN):
+            return
 
     try:
-        time.sleep(task.input_data["seconds"])
-        task.result = {"message": "Обратный отсчёт завершён"}
-        task.status = "completed"
+        if settings.TASK_MANAGER_COUNTDOWN_MODE == "eta":
+            # Воркер не ждёт: завершение запланировано брокером через ETA
+            with stage("schedule"):
+                seconds = _countdown_seconds(input_data)
+                schedule_countdown_finish(
+                    task_id, user_id, seconds, has_children
+                )
+                # Аренда до ожидаемого завершения и ещё один обычный срок
+                renew_lease(
+                    task_id, seconds + settings.TASK_MANAGER_LEASE_SECONDS
+                )
+            return
+
+        with stage("sleep"):
+            sleep_with_heartbeat(task_id, _countdown_seconds(input_data))
+        status = StatusChoices.COMPLETED
+        result = {"message": "Обратный отсчёт завершён"}
     except Exception as e:
-        task.result = {"error": str(e)}
-        task.status = "failed"
-    finally:
-        task.save()
+        status, result = StatusChoices.FAILED, {"error": str(e)}
+
+    with stage("finish"):
+        finish_task(
+            task_id,
+            user_id,
+            status,
+            result,
+            TaskTypeChoices.COUNTDOWN,
+            has_children=has_children,
+        )
+
+
+@shared_task
+def finish_countdown_task(task_id, user_id, has_children=False, remaining=0):
+    if remaining > 0:
+        with stage("schedule"):
+            # Задачу уже завершил reaper или другое сообщение - не ждём
+            if renew_lease(
+                task_id, remaining + settings.TASK_MANAGER_LEASE_SECONDS
+            ):
+                schedule_countdown_finish(
+                    task_id, user_id, remaining, has_children
+                )
+        return
+
+    with stage("finish"):
+        finish_task(
+            task_id,
+            user_id,
+            StatusChoices.COMPLETED,
+            {"message": "Обратный отсчёт завершён"},
+            TaskTypeChoices.COUNTDOWN,
+            has_children=has_children,
+        )
+
+
+@shared_task
+def archive_tasks_task():
+    return archive.archive_tasks()
+
+
+@shared_task
+def reap_expired_tasks_task():
+    return reaper.reap_expired_tasks()
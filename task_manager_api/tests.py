@@ -1,14 +1,65 @@
+import json
+import tempfile
 import time
-from unittest.mock import patch
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import AsyncMock, MagicMock, patch
 
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations import AddIndex, RemoveIndex
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
 
-from .models import StatusChoices, Task, TaskTypeChoices
-from .tasks import countdown_task, sum_numbers_task
+from . import (
+    archive,
+    dag,
+    fair_share,
+    instrumentation,
+    outbox,
+    quota,
+    reaper,
+    result_cache,
+    stats,
+)
+from .authentication import CachedJWTAuthentication
+from .batching import run_sum_numbers_batch, sum_numbers
+from .benchmarks import fair_share as fair_share_benchmark
+from .benchmarks import queue_routing, replay
+from .dispatch import dispatch_task, dispatch_tasks, task_kwargs
+from .events import channel
+from .migration_operations import AddIndexConcurrently, RemoveIndexConcurrently
+from .models import (
+    ACTIVE_STATUSES,
+    TERMINAL_STATUSES,
+    StatusChoices,
+    Task,
+    TaskArchive,
+    TaskOutbox,
+    TaskTypeChoices,
+)
+from .redis_client import get_redis
+from .registry import get_task_type, route_task
+from .serializers import CountdownInputSerializer, TaskSerializer
+from .streaming import event_stream, wait_for_task
+from .tasks import (
+    countdown_task,
+    finish_countdown_task,
+    sleep_with_heartbeat,
+    sum_numbers_batch_task,
+    sum_numbers_task,
+)
+from .transitions import finish_task, start_task
 
 User = get_user_model()
 
@@ -50,6 +101,61 @@ class AuthenticationTests(APITestCase):
         response = self.client.post(self.token_url, data)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def authenticate_with_token(self):
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_task_requests_do_not_load_user(self):
+        task = Task.objects.create(user=self.user, input_data={"a": 1, "b": 2})
+        self.authenticate_with_token()
+        url = reverse("tasks-detail", args=[task.id])
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["user"], "testuser")
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("auth_user", queries[0]["sql"])
+
+    def test_cached_user_save_keeps_other_fields(self):
+        self.user.email = "user@example.com"
+        self.user.save()
+        user = CachedJWTAuthentication().get_user(
+            AccessToken.for_user(self.user)
+        )
+
+        update_last_login(None, user)
+        user.save()
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("testpass123"))
+        self.assertIsNotNone(self.user.last_login)
+        # Отложенное поле читается из БД, а не остаётся пустым
+        self.assertEqual(user.email, "user@example.com")
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate_with_token()
+        url = reverse("tasks-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate_with_token()
+        url = reverse("tasks-list")
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        self.user.delete()
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
 
 class TaskAPITests(APITestCase):
     def setUp(self):
@@ -80,15 +186,54 @@ class TaskAPITests(APITestCase):
         url = reverse("tasks-list")
         data = {
             "task_type": TaskTypeChoices.SUM_NUMBERS,
-            "input_data": {"numbers": [4, 5, 6]},
+            "input_data": {"a": 4, "b": 5},
         }
         response = self.client.post(url, data, format="json")
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Task.objects.count(), 3)
 
+        mock_sum.assert_called_once_with(
+            response.data["id"],
+            user_id=self.user.id,
+            input_data={"a": 4, "b": 5},
+        )
+
+    @override_settings(TASK_MANAGER_INLINE_PAYLOAD_MAX_BYTES=10)
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create_task_large_payload_by_reference(self, mock_sum):
+        url = reverse("tasks-list")
+        data = {
+            "task_type": TaskTypeChoices.SUM_NUMBERS,
+            "input_data": {"a": 4, "b": 5},
+        }
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         mock_sum.assert_called_once_with(response.data["id"])
 
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create_task_invalid_input(self, mock_sum):
+        url = reverse("tasks-list")
+        data = {
+            "task_type": TaskTypeChoices.SUM_NUMBERS,
+            "input_data": {"numbers": [4, 5, 6]},
+        }
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("a", response.data["input_data"])
+        self.assertEqual(Task.objects.count(), 2)
+        mock_sum.assert_not_called()
+
+    def test_create_task_unknown_type(self):
+        url = reverse("tasks-list")
+        data = {"task_type": "unknown", "input_data": {}}
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("task_type", response.data)
+
     def test_active_tasks_limit(self):
         for _ in range(5):
             Task.objects.create(
@@ -101,7 +246,7 @@ class TaskAPITests(APITestCase):
         url = reverse("tasks-list")
         data = {
             "task_type": TaskTypeChoices.SUM_NUMBERS,
-            "input_data": {"numbers": [4, 5, 6]},
+            "input_data": {"a": 4, "b": 5},
         }
         response = self.client.post(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -149,6 +294,506 @@ class TaskAPITests(APITestCase):
         self.assertEqual(len(response.data["results"]), 10)
         self.assertIn("next", response.data)
 
+    def test_task_list_matches_task_serializer(self):
+        url = reverse("tasks-list")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # username берётся из пользователя запроса, без JOIN
+        self.assertNotIn("auth_user", queries[-1]["sql"])
+        expected = TaskSerializer(
+            Task.objects.filter(user=self.user), many=True
+        ).data
+        self.assertEqual(
+            json.loads(response.content), json.loads(json.dumps(expected))
+        )
+
+    def test_task_list_sparse_fields(self):
+        url = reverse("tasks-list") + "?fields=id,status,unknown"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            [
+                {"id": self.task2.id, "status": StatusChoices.PENDING},
+                {"id": self.task1.id, "status": StatusChoices.COMPLETED},
+            ],
+        )
+        self.assertNotIn("auth_user", queries[-1]["sql"])
+
+
+@override_settings(TASK_MANAGER_ACTIVE_TASKS_LIMIT=100)
+class TaskBulkCreateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("tasks-bulk")
+
+    @patch("task_manager_api.dispatch.group")
+    def test_bulk_create_success(self, mock_group):
+        data = [
+            {
+                "task_type": TaskTypeChoices.SUM_NUMBERS,
+                "input_data": {"a": i, "b": i},
+            }
+            for i in range(10)
+        ]
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["ids"]), 10)
+        self.assertEqual(
+            set(Task.objects.values_list("id", flat=True)),
+            set(response.data["ids"]),
+        )
+        mock_group.assert_called_once()
+        self.assertEqual(len(mock_group.call_args.args[0]), 10)
+        mock_group.return_value.apply_async.assert_called_once_with()
+
+    @patch("task_manager_api.dispatch.group")
+    def test_bulk_create_invalid_item(self, mock_group):
+        data = [
+            {"task_type": TaskTypeChoices.SUM_NUMBERS, "input_data": {}},
+            {"task_type": "unknown", "input_data": {}},
+        ]
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Task.objects.exists())
+        mock_group.assert_not_called()
+
+    @override_settings(TASK_MANAGER_ACTIVE_TASKS_LIMIT=5)
+    @patch("task_manager_api.dispatch.group")
+    def test_bulk_create_active_tasks_limit(self, mock_group):
+        data = [
+            {
+                "task_type": TaskTypeChoices.SUM_NUMBERS,
+                "input_data": {"a": 1, "b": 2},
+            }
+        ] * 6
+        response = self.client.post(self.url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(
+            "Достигнут лимит активных задач (5)", str(response.data["detail"])
+        )
+        self.assertFalse(Task.objects.exists())
+        mock_group.assert_not_called()
+
+
+class TaskCursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        # Одинаковый created_at проверяет разрешение совпадений по id
+        self.tasks = Task.objects.bulk_create(
+            Task(
+                user=self.user,
+                task_type=TaskTypeChoices.SUM_NUMBERS,
+                input_data={"a": i, "b": i},
+                status=StatusChoices.COMPLETED,
+            )
+            for i in range(7)
+        )
+        Task.objects.filter(id__in=[t.id for t in self.tasks[:4]]).update(
+            created_at=self.tasks[0].created_at
+        )
+
+    def test_cursor_pagination_walks_all_pages(self):
+        url = reverse("tasks-list") + "?pagination=cursor&limit=3"
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            self.assertFalse(any("COUNT" in query["sql"] for query in queries))
+            # Пользователь приходит JOIN-ом, без запроса на строку
+            self.assertEqual(len(queries), 1)
+            self.assertLessEqual(len(response.data["results"]), 3)
+            seen.extend(task["id"] for task in response.data["results"])
+            url = response.data["next"]
+
+        expected = list(
+            Task.objects.order_by("-created_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        url = reverse("tasks-list") + "?cursor=invalid"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_limit_offset_still_available(self):
+        url = reverse("tasks-list") + "?limit=3&offset=3"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 7)
+        self.assertEqual(len(response.data["results"]), 3)
+
+
+class RedisQuotaTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        self.redis = MagicMock()
+        self.scripts = {}
+        self.redis.register_script.side_effect = (
+            lambda source: self.scripts.setdefault(source, MagicMock())
+        )
+        patcher = patch(
+            "task_manager_api.quota.get_redis", return_value=self.redis
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        quota._script.cache_clear()
+        self.addCleanup(quota._script.cache_clear)
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create_without_count_query(self, mock_sum):
+        self.scripts[quota.ACQUIRE_SCRIPT] = MagicMock(return_value=1)
+        url = reverse("tasks-list")
+        data = {
+            "task_type": TaskTypeChoices.SUM_NUMBERS,
+            "input_data": {"a": 1, "b": 2},
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(any("COUNT" in query["sql"] for query in queries))
+        self.scripts[quota.ACQUIRE_SCRIPT].assert_called_once_with(
+            keys=[f"{quota.KEY_PREFIX}{self.user.id}"], args=[1, 5]
+        )
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create_over_limit(self, mock_sum):
+        self.scripts[quota.ACQUIRE_SCRIPT] = MagicMock(return_value=-1)
+        url = reverse("tasks-list")
+        data = {
+            "task_type": TaskTypeChoices.SUM_NUMBERS,
+            "input_data": {"a": 1, "b": 2},
+        }
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Task.objects.exists())
+        mock_sum.assert_not_called()
+
+    def test_task_completion_releases_slot(self):
+        task = Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data={"a": 1, "b": 2},
+        )
+        sum_numbers_task(task.id)
+
+        self.scripts[quota.RELEASE_SCRIPT].assert_called_once_with(
+            keys=[f"{quota.KEY_PREFIX}{self.user.id}"], args=[1]
+        )
+
+    def test_reconcile(self):
+        pipe = self.redis.pipeline.return_value
+        self.redis.scan_iter.return_value = [f"{quota.KEY_PREFIX}999"]
+        Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data={"a": 1, "b": 2},
+            status=StatusChoices.RUNNING,
+        )
+        Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data={"a": 1, "b": 2},
+            status=StatusChoices.COMPLETED,
+        )
+
+        counts = quota.reconcile()
+
+        self.assertEqual(counts, {self.user.id: 1})
+        pipe.delete.assert_called_once_with(f"{quota.KEY_PREFIX}999")
+        pipe.set.assert_called_once_with(
+            f"{quota.KEY_PREFIX}{self.user.id}", 1
+        )
+        pipe.execute.assert_called_once_with()
+
+
+@override_settings(TASK_MANAGER_RESULT_CACHE_ENABLED=True)
+class ResultCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        result_cache.local_cache.clear()
+        self.addCleanup(result_cache.local_cache.clear)
+
+    def test_cache_key_is_canonical(self):
+        self.assertEqual(
+            result_cache.cache_key("sum_numbers", {"a": 1, "b": 2}),
+            result_cache.cache_key("sum_numbers", {"b": 2, "a": 1}),
+        )
+        self.assertNotEqual(
+            result_cache.cache_key("sum_numbers", {"a": 1, "b": 2}),
+            result_cache.cache_key("countdown", {"a": 1, "b": 2}),
+        )
+
+    def test_worker_result_is_reused(self):
+        task = Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data={"a": 2, "b": 3},
+        )
+        sum_numbers_task(task.id)
+        result_cache.local_cache.clear()
+
+        url = reverse("tasks-list")
+        data = {
+            "task_type": TaskTypeChoices.SUM_NUMBERS,
+            "input_data": {"b": 3, "a": 2},
+        }
+        with patch("task_manager_api.tasks.sum_numbers_task.delay") as mock:
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], StatusChoices.COMPLETED)
+        self.assertEqual(response.data["result"], {"result": 5})
+        mock.assert_not_called()
+        self.assertEqual(
+            result_cache.stats()[TaskTypeChoices.SUM_NUMBERS],
+            {"hits": 1, "misses": 0},
+        )
+
+    def test_not_cacheable_task_type(self):
+        result_cache.store(TaskTypeChoices.COUNTDOWN, {"seconds": 1}, {})
+        self.assertIsNone(
+            result_cache.get(TaskTypeChoices.COUNTDOWN, {"seconds": 1})
+        )
+        self.assertNotIn(TaskTypeChoices.COUNTDOWN, result_cache.stats())
+
+    @patch("task_manager_api.dispatch.group")
+    def test_bulk_create_uses_cache(self, mock_group):
+        result_cache.store(
+            TaskTypeChoices.SUM_NUMBERS, {"a": 1, "b": 1}, {"result": 2}
+        )
+        data = [
+            {
+                "task_type": TaskTypeChoices.SUM_NUMBERS,
+                "input_data": {"a": 1, "b": 1},
+            },
+            {
+                "task_type": TaskTypeChoices.SUM_NUMBERS,
+                "input_data": {"a": 1, "b": 2},
+            },
+        ]
+        response = self.client.post(reverse("tasks-bulk"), data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        cached_task, pending_task = Task.objects.order_by("id")
+        self.assertEqual(cached_task.status, StatusChoices.COMPLETED)
+        self.assertEqual(cached_task.result, {"result": 2})
+        self.assertEqual(pending_task.status, StatusChoices.PENDING)
+        self.assertEqual(len(mock_group.call_args.args[0]), 1)
+
+    def test_local_lru_eviction(self):
+        local = result_cache.LocalLRUCache(maxsize=2)
+        local.set("a", 1, 60)
+        local.set("b", 2, 60)
+        local.get("a")
+        local.set("c", 3, 60)
+
+        self.assertEqual(local.get("a"), 1)
+        self.assertIsNone(local.get("b"))
+        local.set("d", 4, -1)
+        self.assertIsNone(local.get("d"))
+
+
+class TaskIndexesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        Task.objects.bulk_create(
+            Task(
+                user=self.user,
+                task_type=TaskTypeChoices.SUM_NUMBERS,
+                input_data={"a": i, "b": i},
+                status=StatusChoices.COMPLETED,
+            )
+            for i in range(50)
+        )
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def explain(self, queryset):
+        if connection.vendor != "sqlite":
+            return queryset.explain()
+        # psycopg2 подставляет параметры на стороне клиента, и Postgres видит
+        # литералы. SQLite с параметрами не может доказать условие частичного
+        # индекса, поэтому воспроизводим план с подставленными значениями.
+        sql, params = queryset.query.sql_with_params()
+        literals = tuple(
+            (
+                "'%s'" % value.replace("'", "''")
+                if isinstance(value, str)
+                else str(value)
+            )
+            for value in params
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql % literals)
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_active_tasks_count_uses_partial_index(self):
+        # count() сбрасывает сортировку, поэтому и здесь она не нужна
+        plan = self.explain(
+            Task.objects.filter(
+                user=self.user, status__in=ACTIVE_STATUSES
+            ).order_by()
+        )
+        self.assertIn("task_user_active_idx", plan)
+
+    def test_task_list_uses_created_at_index(self):
+        plan = self.explain(Task.objects.filter(user=self.user))
+        self.assertIn("task_user_created_idx", plan)
+
+    def test_archive_candidates_use_terminal_index(self):
+        plan = self.explain(
+            Task.objects.filter(
+                status__in=TERMINAL_STATUSES, created_at__lt=timezone.now()
+            ).order_by("created_at")
+        )
+        self.assertIn("task_terminal_created_idx", plan)
+
+    def test_expired_leases_use_running_index(self):
+        plan = self.explain(
+            Task.objects.filter(
+                status=StatusChoices.RUNNING,
+                lease_expires_at__lt=timezone.now(),
+            ).order_by("lease_expires_at")
+        )
+        self.assertIn("task_running_lease_idx", plan)
+
+    def test_task_indexes_built_concurrently(self):
+        # Обычный CREATE INDEX блокировал бы запись в Task на всё построение
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        for key, migration in loader.disk_migrations.items():
+            if key[0] != "task_manager_api":
+                continue
+            for operation in migration.operations:
+                if not isinstance(operation, (AddIndex, RemoveIndex)):
+                    continue
+                with self.subTest(migration=key[1]):
+                    self.assertEqual(operation.model_name, "task")
+                    self.assertIsInstance(
+                        operation,
+                        (AddIndexConcurrently, RemoveIndexConcurrently),
+                    )
+                    self.assertFalse(migration.atomic)
+
+
+class SumNumbersBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+
+    def create_task(self, input_data):
+        return Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data=input_data,
+        )
+
+    def test_sum_numbers_matches_python_semantics(self):
+        inputs = [
+            {"a": 10, "b": 20},
+            {"a": 1.5, "b": 2},
+            {"a": 2**70, "b": 1},
+            {"a": "x", "b": "y"},
+            {"a": "x", "b": 1},
+            {"wrong_key": 5},
+        ]
+        outcomes = sum_numbers(inputs)
+
+        self.assertEqual(
+            outcomes[:4],
+            [
+                (StatusChoices.COMPLETED, {"result": 30}),
+                (StatusChoices.COMPLETED, {"result": 3.5}),
+                (StatusChoices.COMPLETED, {"result": 2**70 + 1}),
+                (StatusChoices.COMPLETED, {"result": "xy"}),
+            ],
+        )
+        self.assertIs(type(outcomes[0][1]["result"]), int)
+        self.assertEqual(outcomes[4][0], StatusChoices.FAILED)
+        self.assertIn("str", outcomes[4][1]["error"])
+        self.assertEqual(outcomes[5][0], StatusChoices.FAILED)
+        self.assertIn("a", outcomes[5][1]["error"])
+
+    def test_run_batch(self):
+        tasks = [self.create_task({"a": i, "b": i}) for i in range(5)]
+        invalid = self.create_task({"a": [1], "b": 2})
+        done = self.create_task({"a": 1, "b": 1})
+        Task.objects.filter(id=done.id).update(
+            status=StatusChoices.COMPLETED, result={"result": 0}
+        )
+
+        processed = run_sum_numbers_batch(limit=100)
+
+        self.assertEqual(processed, 6)
+        for i, task in enumerate(tasks):
+            task.refresh_from_db()
+            self.assertEqual(task.status, StatusChoices.COMPLETED)
+            self.assertEqual(task.result, {"result": 2 * i})
+        invalid.refresh_from_db()
+        self.assertEqual(invalid.status, StatusChoices.FAILED)
+        done.refresh_from_db()
+        self.assertEqual(done.result, {"result": 0})
+
+    def test_run_batch_respects_limit(self):
+        for i in range(5):
+            self.create_task({"a": i, "b": i})
+
+        self.assertEqual(run_sum_numbers_batch(limit=3), 3)
+        self.assertEqual(
+            Task.objects.filter(status=StatusChoices.PENDING).count(), 2
+        )
+
+    @override_settings(
+        TASK_MANAGER_BATCHED_TASK_TYPES=[TaskTypeChoices.SUM_NUMBERS],
+        TASK_MANAGER_BATCH_SIZE=2,
+    )
+    def test_batch_task_drains_queue(self):
+        for i in range(5):
+            self.create_task({"a": i, "b": i})
+
+        self.assertEqual(sum_numbers_batch_task(), 5)
+        self.assertFalse(
+            Task.objects.filter(status=StatusChoices.PENDING).exists()
+        )
+
+    @override_settings(
+        TASK_MANAGER_BATCHED_TASK_TYPES=[TaskTypeChoices.SUM_NUMBERS]
+    )
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_batched_tasks_are_not_dispatched(self, mock_sum):
+        dispatch_task(self.create_task({"a": 1, "b": 2}))
+        mock_sum.assert_not_called()
+
 
 class CeleryTasksTests(TestCase):
     def setUp(self):
@@ -194,6 +839,7 @@ class CeleryTasksTests(TestCase):
         self.assertEqual(updated_task.status, StatusChoices.FAILED)
         self.assertIn("a", updated_task.result["error"])
 
+    @override_settings(TASK_MANAGER_COUNTDOWN_MODE="sleep")
     @patch("time.sleep")
     def test_countdown_task_success(self, mock_sleep):
         """Тест успешного выполнения задачи отсчета"""
@@ -235,3 +881,1595 @@ class CeleryTasksTests(TestCase):
         updated_task = Task.objects.get(id=invalid_task.id)
         self.assertEqual(updated_task.status, StatusChoices.FAILED)
         self.assertIn("seconds", updated_task.result["error"])
+
+    @patch("task_manager_api.tasks.finish_countdown_task.apply_async")
+    @patch("time.sleep")
+    def test_countdown_task_eta_schedules_completion(
+        self, mock_sleep, mock_apply_async
+    ):
+        """Тест отсчёта без блокировки воркера"""
+        countdown_task(self.countdown_task.id)
+
+        updated_task = Task.objects.get(id=self.countdown_task.id)
+        self.assertEqual(updated_task.status, StatusChoices.RUNNING)
+        mock_sleep.assert_not_called()
+        mock_apply_async.assert_called_once_with(
+            (self.countdown_task.id, self.user.id), countdown=2
+        )
+
+        finish_countdown_task(self.countdown_task.id, self.user.id)
+
+        updated_task = Task.objects.get(id=self.countdown_task.id)
+        self.assertEqual(updated_task.status, StatusChoices.COMPLETED)
+        self.assertEqual(
+            updated_task.result["message"], "Обратный отсчёт завершён"
+        )
+
+    @override_settings(TASK_MANAGER_COUNTDOWN_HOP_SECONDS=2)
+    @patch("task_manager_api.tasks.finish_countdown_task.apply_async")
+    def test_countdown_task_eta_schedules_hops(self, mock_apply_async):
+        task = Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.COUNTDOWN,
+            input_data={"seconds": 5},
+        )
+        args = (task.id, self.user.id)
+
+        countdown_task(task.id)
+        mock_apply_async.assert_called_once_with(
+            args, countdown=2, kwargs={"remaining": 3}
+        )
+
+        finish_countdown_task(*args, remaining=3)
+        mock_apply_async.assert_called_with(
+            args, countdown=2, kwargs={"remaining": 1}
+        )
+        finish_countdown_task(*args, remaining=1)
+        mock_apply_async.assert_called_with(args, countdown=1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, StatusChoices.RUNNING)
+
+        finish_countdown_task(*args)
+        task.refresh_from_db()
+        self.assertEqual(task.status, StatusChoices.COMPLETED)
+
+        # Завершённую задачу следующий шаг не планирует
+        finish_countdown_task(*args, remaining=3)
+        self.assertEqual(mock_apply_async.call_count, 3)
+
+    def test_finish_countdown_task_ignores_finished_task(self):
+        """Тест повторного завершения уже выполненной задачи"""
+        self.countdown_task.status = StatusChoices.FAILED
+        self.countdown_task.save()
+
+        finish_countdown_task(self.countdown_task.id, self.user.id)
+
+        updated_task = Task.objects.get(id=self.countdown_task.id)
+        self.assertEqual(updated_task.status, StatusChoices.FAILED)
+
+    def test_sum_numbers_task_updates_only_status_and_result(self):
+        """Тест записи только status и result условными UPDATE"""
+        with CaptureQueriesContext(connection) as queries:
+            sum_numbers_task(self.sum_task.id)
+
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)
+        for sql in updates:
+            self.assertNotIn("input_data", sql.split("WHERE")[0])
+            self.assertIn('"status"', sql.split("WHERE")[1])
+
+    def test_redelivered_task_keeps_result(self):
+        """Тест повторной доставки сообщения для завершённой задачи"""
+        sum_numbers_task(self.sum_task.id)
+        Task.objects.filter(id=self.sum_task.id).update(
+            input_data={"a": 1, "b": 1}
+        )
+
+        sum_numbers_task(self.sum_task.id)
+
+        updated_task = Task.objects.get(id=self.sum_task.id)
+        self.assertEqual(updated_task.status, StatusChoices.COMPLETED)
+        self.assertEqual(updated_task.result["result"], 30)
+
+    def test_sum_numbers_task_inline_payload(self):
+        """Тест задачи с входными данными из сообщения"""
+        with self.assertNumQueries(1):
+            sum_numbers_task(
+                self.sum_task.id,
+                user_id=self.user.id,
+                input_data={"a": 10, "b": 20},
+            )
+
+        updated_task = Task.objects.get(id=self.sum_task.id)
+        self.assertEqual(updated_task.status, StatusChoices.COMPLETED)
+        self.assertEqual(updated_task.result["result"], 30)
+
+
+class TaskRegistryTests(TestCase):
+    def test_builtin_task_types_registered(self):
+        sum_numbers = get_task_type(TaskTypeChoices.SUM_NUMBERS)
+        self.assertIs(sum_numbers.handler, sum_numbers_task)
+        self.assertIs(sum_numbers.batch_handler, sum_numbers_batch_task)
+        self.assertIs(
+            get_task_type(TaskTypeChoices.COUNTDOWN).handler, countdown_task
+        )
+        self.assertIsNone(get_task_type("unknown"))
+
+    def test_route_task(self):
+        self.assertEqual(
+            route_task(sum_numbers_task.name, (), {}, {}),
+            {"queue": get_task_type(TaskTypeChoices.SUM_NUMBERS).queue},
+        )
+        self.assertIsNone(route_task("other.task", (), {}, {}))
+
+    def test_countdown_input_validation(self):
+        for seconds in ("invalid", -1, True, 10**6):
+            serializer = CountdownInputSerializer(data={"seconds": seconds})
+            self.assertFalse(serializer.is_valid(), seconds)
+        serializer = CountdownInputSerializer(data={"seconds": 1.5})
+        self.assertTrue(serializer.is_valid())
+
+
+class WorkerProfilesTests(TestCase):
+    @patch("task_manager_api.management.commands.run_worker.app.worker_main")
+    def test_run_worker_profile(self, mock_worker_main):
+        call_command("run_worker", "countdown")
+
+        argv = mock_worker_main.call_args.args[0]
+        self.assertIn("--queues=countdown", argv)
+        self.assertIn("--concurrency=4", argv)
+        self.assertIn("--prefetch-multiplier=1", argv)
+
+    def test_run_worker_unknown_profile(self):
+        with self.assertRaises(CommandError):
+            call_command("run_worker", "unknown")
+
+    def test_routing_removes_head_of_line_blocking(self):
+        jobs = [(0.0, queue_routing.LONG, 10.0)] * 2 + [
+            (0.1, queue_routing.SHORT, 0.01)
+        ]
+        shared = queue_routing.simulate(
+            jobs, [({queue_routing.SHORT, queue_routing.LONG}, 2)]
+        )
+        dedicated = queue_routing.simulate(
+            jobs,
+            [({queue_routing.SHORT}, 1), ({queue_routing.LONG}, 1)],
+        )
+
+        self.assertGreater(shared[queue_routing.SHORT][0], 9)
+        self.assertLess(dedicated[queue_routing.SHORT][0], 0.1)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_report_contains_environment_and_parameters(self):
+        stdout = StringIO()
+        call_command(
+            "benchmark",
+            "queue_routing",
+            "--param",
+            "duration=5",
+            stdout=stdout,
+        )
+        report = json.loads(stdout.getvalue())
+
+        self.assertEqual(report["environment"]["database"], "sqlite")
+        self.assertEqual(
+            report["results"]["queue_routing"]["parameters"]["duration"], 5
+        )
+
+    def test_unknown_parameter(self):
+        with self.assertRaises(CommandError):
+            call_command("benchmark", "queue_routing", "--param", "tasks=5")
+
+    def test_replay_skips_lines_without_request(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as file:
+            file.write(
+                '{"method": "GET", "path": "/api/tasks/"}\n'
+                '{"request_id": "user-001", "title": "..."}\n'
+                "not json\n\n"
+            )
+            file.flush()
+            traffic, skipped = replay.load_traffic(file.name)
+
+        self.assertEqual(traffic, [{"method": "GET", "path": "/api/tasks/"}])
+        self.assertEqual(skipped, 2)
+
+    def test_sample_traffic_is_valid(self):
+        traffic, skipped = replay.load_traffic(replay.DEFAULT_TRAFFIC)
+        self.assertTrue(traffic)
+        self.assertEqual(skipped, 0)
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.closed = False
+
+    async def get_message(self, ignore_subscribe_messages, timeout):
+        if not self.messages:
+            return None
+        return {"data": json.dumps(self.messages.pop(0))}
+
+    async def subscribe(self, *channels):
+        self.channels = channels
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TaskEventsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.task = Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data={"a": 1, "b": 2},
+        )
+
+    def collect(self, stream):
+        async def consume():
+            return [chunk async for chunk in stream]
+
+        return async_to_sync(consume)()
+
+    def test_events_require_authentication(self):
+        response = self.client.get(reverse("tasks-events"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_events_without_redis(self):
+        token = AccessToken.for_user(self.user)
+        response = self.client.get(
+            reverse("tasks-detail-events", args=[self.task.id]),
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(
+            response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    def test_task_stream_ends_on_completion(self):
+        pubsub = FakePubSub(
+            [
+                {"id": 999, "status": StatusChoices.RUNNING},
+                {"id": self.task.id, "status": StatusChoices.RUNNING},
+                {
+                    "id": self.task.id,
+                    "status": StatusChoices.COMPLETED,
+                    "result": {"result": 3},
+                },
+                {"id": self.task.id, "status": StatusChoices.FAILED},
+            ]
+        )
+        snapshot = {"id": self.task.id, "status": StatusChoices.PENDING}
+        chunks = self.collect(
+            event_stream(AsyncMock(), pubsub, self.task.id, snapshot)
+        )
+
+        statuses = [
+            json.loads(chunk.split("data: ")[1])["status"] for chunk in chunks
+        ]
+        self.assertEqual(
+            statuses,
+            [
+                StatusChoices.PENDING,
+                StatusChoices.RUNNING,
+                StatusChoices.COMPLETED,
+            ],
+        )
+        self.assertTrue(pubsub.closed)
+
+    @override_settings(TASK_MANAGER_STREAM_MAX_SECONDS=0)
+    def test_user_stream_closes_after_max_duration(self):
+        pubsub = FakePubSub([])
+        self.assertEqual(self.collect(event_stream(AsyncMock(), pubsub)), [])
+        self.assertTrue(pubsub.closed)
+
+    @patch("task_manager_api.events.get_redis")
+    def test_transitions_publish_events(self, mock_get_redis):
+        pipe = mock_get_redis.return_value.pipeline.return_value
+
+        sum_numbers_task(self.task.id)
+
+        published = [
+            (call.args[0], json.loads(call.args[1]))
+            for call in pipe.publish.call_args_list
+        ]
+        self.assertEqual(
+            published,
+            [
+                (
+                    channel(self.user.id),
+                    {
+                        "id": self.task.id,
+                        "user_id": self.user.id,
+                        "status": StatusChoices.RUNNING,
+                        "result": None,
+                    },
+                ),
+                (
+                    channel(self.user.id),
+                    {
+                        "id": self.task.id,
+                        "user_id": self.user.id,
+                        "status": StatusChoices.COMPLETED,
+                        "result": {"result": 3},
+                    },
+                ),
+            ],
+        )
+
+
+@override_settings(TASK_MANAGER_REDIS_URL="redis://localhost:6379/0")
+class TaskLongPollTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.COUNTDOWN,
+            input_data={"seconds": 1},
+        )
+        self.url = reverse("tasks-detail", args=[self.task.id])
+
+    @patch("task_manager_api.streaming.wait_for_task")
+    def test_wait_returns_final_row(self, mock_wait):
+        async def complete(user_id, task_id, timeout):
+            await Task.objects.filter(id=task_id).aupdate(
+                status=StatusChoices.COMPLETED
+            )
+
+        mock_wait.side_effect = complete
+        response = self.client.get(self.url + "?wait=30")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], StatusChoices.COMPLETED)
+        mock_wait.assert_called_once_with(self.user.id, self.task.id, 30)
+
+    @patch("task_manager_api.streaming.wait_for_task")
+    def test_wait_skipped_for_finished_task(self, mock_wait):
+        self.task.status = StatusChoices.FAILED
+        self.task.save()
+
+        response = self.client.get(self.url + "?wait=30")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_wait.assert_not_called()
+
+    @patch("task_manager_api.streaming.wait_for_task")
+    def test_wait_is_capped(self, mock_wait):
+        self.client.get(self.url + "?wait=100000")
+        self.assertEqual(mock_wait.call_args.args[2], 60)
+
+    @patch("task_manager_api.streaming.wait_for_task")
+    def test_wait_for_other_user_task(self, mock_wait):
+        other = User.objects.create_user(username="other", password="pass")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(self.url + "?wait=30")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        mock_wait.assert_not_called()
+
+    @patch("redis.asyncio.Redis.from_url")
+    def test_wait_for_task_returns_on_terminal_event(self, mock_from_url):
+        pubsub = FakePubSub(
+            [
+                {"id": 999, "status": StatusChoices.COMPLETED},
+                {"id": self.task.id, "status": StatusChoices.RUNNING},
+                {"id": self.task.id, "status": StatusChoices.COMPLETED},
+            ]
+        )
+        mock_from_url.return_value = MagicMock(
+            pubsub=MagicMock(return_value=pubsub), aclose=AsyncMock()
+        )
+
+        async_to_sync(wait_for_task)(self.user.id, self.task.id, 5)
+
+        self.assertEqual(pubsub.channels, (channel(self.user.id),))
+        self.assertEqual(pubsub.messages, [])
+        self.assertTrue(pubsub.closed)
+
+
+class TaskConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data={"a": 1, "b": 2},
+        )
+        self.list_url = reverse("tasks-list")
+        self.detail_url = reverse("tasks-detail", args=[self.task.id])
+
+    def test_unchanged_list_returns_304_without_queries(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Last-Modified", response.headers)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.list_url, HTTP_IF_NONE_MATCH=response.headers["ETag"]
+            )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since_ignored(self):
+        # Изменение в ту же секунду не должно дать устаревший 304
+        response = self.client.get(
+            self.detail_url,
+            HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query(self):
+        etag = self.client.get(self.list_url).headers["ETag"]
+        response = self.client.get(
+            self.list_url + "?status=completed", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create_changes_etag(self, mock_delay):
+        etag = self.client.get(self.list_url).headers["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                self.list_url,
+                {"task_type": "sum_numbers", "input_data": {"a": 1, "b": 1}},
+                format="json",
+            )
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_transition_changes_detail_etag(self):
+        etag = self.client.get(self.detail_url).headers["ETag"]
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            finish_task(
+                self.task.id,
+                self.user.id,
+                StatusChoices.COMPLETED,
+                3,
+                self.task.task_type,
+            )
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["result"], 3)
+
+    def test_etag_is_per_user(self):
+        etag = self.client.get(self.list_url).headers["ETag"]
+        other = User.objects.create_user(username="other", password="pass")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class AsyncTaskAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.tasks = [
+            Task.objects.create(
+                user=self.user,
+                task_type=TaskTypeChoices.SUM_NUMBERS,
+                input_data={"a": i, "b": i},
+                status=StatusChoices.COMPLETED,
+                result=2 * i,
+            )
+            for i in range(3)
+        ]
+        self.url = reverse("async-tasks-list")
+
+    def test_list_matches_sync_api(self):
+        for query in ("", "?status=pending", "?fields=id,user,result"):
+            response = self.client.get(self.url + query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected = self.client.get(reverse("tasks-list") + query)
+            self.assertEqual(
+                json.loads(response.content), json.loads(expected.content)
+            )
+
+    def test_list_pagination(self):
+        response = self.client.get(self.url + "?limit=2&offset=1")
+        data = json.loads(response.content)
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(
+            [task["id"] for task in data["results"]],
+            [self.tasks[1].id, self.tasks[0].id],
+        )
+        self.assertIsNone(data["next"])
+        self.assertIn("/api/async/tasks/?limit=2", data["previous"])
+
+    def test_retrieve(self):
+        task = self.tasks[0]
+        response = self.client.get(
+            reverse("async-tasks-detail", args=[task.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = self.client.get(reverse("tasks-detail", args=[task.id]))
+        self.assertEqual(
+            json.loads(response.content), json.loads(expected.content)
+        )
+
+    def test_retrieve_other_user_task(self):
+        other = User.objects.create_user(username="other", password="pass")
+        task = Task.objects.create(user=other, input_data={"a": 1, "b": 1})
+        response = self.client.get(
+            reverse("async-tasks-detail", args=[task.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create(self, mock_delay):
+        response = self.client.post(
+            self.url,
+            {"task_type": "sum_numbers", "input_data": {"a": 4, "b": 5}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = json.loads(response.content)
+        self.assertEqual(data["user"], "testuser")
+        self.assertEqual(data["status"], StatusChoices.PENDING)
+        mock_delay.assert_called_once_with(
+            data["id"], user_id=self.user.id, input_data={"a": 4, "b": 5}
+        )
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create_respects_active_limit(self, mock_delay):
+        Task.objects.bulk_create(
+            Task(user=self.user, input_data={"a": 1, "b": 1}) for _ in range(5)
+        )
+        response = self.client.post(
+            self.url,
+            {"task_type": "sum_numbers", "input_data": {"a": 1, "b": 1}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(
+            "Достигнут лимит активных задач (5)",
+            json.loads(response.content)["detail"],
+        )
+        mock_delay.assert_not_called()
+
+    def test_create_invalid_input(self):
+        response = self.client.post(
+            self.url,
+            {"task_type": "sum_numbers", "input_data": {"a": "x"}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("input_data", json.loads(response.content))
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class FakeMetricsRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def hincrbyfloat(self, key, field, value):
+        values = self.hashes.setdefault(key, {})
+        values[field] = values.get(field, 0) + value
+
+    def execute(self):
+        pass
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        instrumentation.histograms.take()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def metrics(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.content.decode()
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_request_stages_and_queries(self, mock_delay):
+        self.client.post(
+            reverse("tasks-list"),
+            {"task_type": "sum_numbers", "input_data": {"a": 4, "b": 5}},
+            format="json",
+        )
+        metrics = self.metrics()
+
+        self.assertIn(
+            "task_manager_http_request_seconds_count{endpoint="
+            '"tasks-list",method="POST",status="201"} 1',
+            metrics,
+        )
+        for stage in ("result_cache", "quota", "insert", "dispatch"):
+            self.assertIn(
+                "task_manager_stage_seconds_count{"
+                f'scope="tasks-list",stage="{stage}"}} 1',
+                metrics,
+            )
+        # COUNT для лимита и INSERT
+        self.assertIn(
+            "task_manager_http_db_queries_bucket{endpoint="
+            '"tasks-list",method="POST",le="1"} 0',
+            metrics,
+        )
+
+    def test_task_duration_and_queries(self):
+        task = Task.objects.create(user=self.user, input_data={"a": 1, "b": 2})
+        sum_numbers_task.apply(args=(task.id,))
+        metrics = self.metrics()
+
+        labels = 'task_type="sum_numbers",task="sum_numbers_task"'
+        self.assertIn(
+            f"task_manager_task_seconds_count{{{labels}}} 1", metrics
+        )
+        self.assertIn(
+            f"task_manager_task_db_queries_count{{{labels}}} 1", metrics
+        )
+        self.assertIn(
+            'task_manager_stage_seconds_count{scope="sum_numbers",'
+            'stage="finish"} 1',
+            metrics,
+        )
+
+    def test_queue_wait_from_publish_header(self):
+        headers = {}
+        instrumentation.add_enqueued_at(headers=headers)
+        task = MagicMock(request=MagicMock(eta=None))
+        task.name = "task_manager_api.tasks.countdown_task"
+        task.request.enqueued_at = headers["enqueued_at"] - 3
+
+        instrumentation.task_started(task_id="1", task=task)
+        instrumentation.task_finished(task_id="1", task=task)
+
+        metrics = self.metrics()
+        labels = 'task_type="countdown",task="countdown_task"'
+        self.assertIn(
+            f'task_manager_task_queue_wait_seconds_bucket{{{labels},le="2.5"}}'
+            " 0",
+            metrics,
+        )
+        self.assertIn(
+            f'task_manager_task_queue_wait_seconds_bucket{{{labels},le="5"}}'
+            " 1",
+            metrics,
+        )
+
+    def test_flush_to_redis(self):
+        client = FakeMetricsRedis()
+        instrumentation.observe(
+            "task_manager_stage_seconds", 0.2, scope="a", stage="b"
+        )
+        instrumentation.histograms.flush(client)
+        instrumentation.observe(
+            "task_manager_stage_seconds", 0.3, scope="a", stage="b"
+        )
+
+        with patch(
+            "task_manager_api.instrumentation.get_redis", return_value=client
+        ):
+            totals = instrumentation.collect()
+
+        values = totals[("task_manager_stage_seconds", ("a", "b"))]
+        self.assertEqual(values[-1], 2)
+        self.assertAlmostEqual(values[-2], 0.5)
+
+
+class TaskArchiveTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        old = timezone.now() - timedelta(days=40)
+        self.old_tasks = Task.objects.bulk_create(
+            Task(
+                user=self.user,
+                input_data={"a": i, "b": i},
+                status=StatusChoices.COMPLETED,
+                result={"result": 2 * i},
+            )
+            for i in range(5)
+        )
+        self.old_active = Task.objects.create(
+            user=self.user, input_data={"a": 1, "b": 1}
+        )
+        Task.objects.update(created_at=old)
+        self.recent = Task.objects.create(
+            user=self.user,
+            input_data={"a": 1, "b": 1},
+            status=StatusChoices.FAILED,
+        )
+
+    def test_archive_moves_old_terminal_tasks_in_chunks(self):
+        with patch(
+            "task_manager_api.archive.archive_chunk",
+            wraps=archive.archive_chunk,
+        ) as chunk:
+            self.assertEqual(archive.archive_tasks(days=30, chunk_size=2), 5)
+        # 2 + 2 + 1
+        self.assertEqual(chunk.call_count, 3)
+
+        self.assertEqual(
+            set(Task.objects.values_list("id", flat=True)),
+            {self.old_active.id, self.recent.id},
+        )
+        archived = TaskArchive.objects.get(id=self.old_tasks[1].id)
+        self.assertEqual(archived.result, {"result": 2})
+        self.assertEqual(archived.user, self.user)
+
+    def test_archived_task_is_still_served(self):
+        call_command("archive_tasks", "--days", "30", stdout=StringIO())
+        task = self.old_tasks[0]
+
+        response = self.client.get(reverse("tasks-detail", args=[task.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], task.id)
+        self.assertEqual(response.data["user"], "testuser")
+        self.assertEqual(response.data["status"], StatusChoices.COMPLETED)
+
+        response = self.client.get(
+            reverse("async-tasks-detail", args=[task.id]),
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_archived_list(self):
+        archive.archive_tasks(days=30)
+
+        response = self.client.get(reverse("tasks-list") + "?archived=true")
+        self.assertEqual(
+            [task["id"] for task in response.data],
+            [task.id for task in reversed(self.old_tasks)],
+        )
+        response = self.client.get(reverse("tasks-list"))
+        self.assertEqual(len(response.data), 2)
+
+    def test_archived_task_of_other_user(self):
+        archive.archive_tasks(days=30)
+        other = User.objects.create_user(username="other", password="pass")
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(
+            reverse("tasks-detail", args=[self.old_tasks[0].id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+# Порт, на котором Redis заведомо не слушает
+DEAD_REDIS_URL = "redis://127.0.0.1:1/0"
+
+
+@override_settings(
+    TASK_MANAGER_DISPATCH_MODE="outbox", TASK_MANAGER_ACTIVE_TASKS_LIMIT=100
+)
+class TaskOutboxTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.data = {
+            "task_type": TaskTypeChoices.SUM_NUMBERS,
+            "input_data": {"a": 1, "b": 2},
+        }
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_create_writes_outbox_instead_of_broker(self, mock_delay):
+        response = self.client.post(
+            reverse("tasks-list"), self.data, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(
+            TaskOutbox.objects.filter(task_id=response.data["id"]).exists()
+        )
+        mock_delay.assert_not_called()
+
+    @patch("task_manager_api.dispatch.group")
+    def test_bulk_create_writes_outbox(self, mock_group):
+        response = self.client.post(
+            reverse("tasks-bulk"), [self.data] * 3, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            set(TaskOutbox.objects.values_list("task_id", flat=True)),
+            set(response.data["ids"]),
+        )
+        mock_group.assert_not_called()
+
+    @patch("task_manager_api.async_views.adispatch_task")
+    def test_async_create_writes_outbox(self, mock_dispatch):
+        token = AccessToken.for_user(self.user)
+        response = self.client.post(
+            reverse("async-tasks-list"),
+            self.data,
+            format="json",
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task_id = json.loads(response.content)["id"]
+        self.assertTrue(TaskOutbox.objects.filter(task_id=task_id).exists())
+        mock_dispatch.assert_not_called()
+
+    def create_entries(self, count):
+        tasks = Task.objects.bulk_create(
+            Task(user=self.user, input_data={"a": i, "b": i})
+            for i in range(count)
+        )
+        outbox.store(tasks)
+        return tasks
+
+    @patch("task_manager_api.outbox.dispatch_tasks")
+    def test_relay_batch_sends_oldest_entries(self, mock_dispatch):
+        tasks = self.create_entries(3)
+
+        self.assertEqual(outbox.relay_batch(2), 2)
+
+        sent = mock_dispatch.call_args.args[0]
+        self.assertEqual([task.id for task in sent], [t.id for t in tasks[:2]])
+        self.assertEqual(
+            list(TaskOutbox.objects.values_list("task_id", flat=True)),
+            [tasks[2].id],
+        )
+
+    @patch("task_manager_api.outbox.dispatch_tasks")
+    def test_relay_batch_keeps_entries_on_broker_error(self, mock_dispatch):
+        self.create_entries(2)
+        mock_dispatch.side_effect = ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            outbox.relay_batch(10)
+        self.assertEqual(TaskOutbox.objects.count(), 2)
+
+    @override_settings(
+        TASK_MANAGER_REDIS_URL=DEAD_REDIS_URL,
+        TASK_MANAGER_RESULT_CACHE_ENABLED=True,
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": DEAD_REDIS_URL,
+            }
+        },
+    )
+    def test_create_without_redis(self):
+        get_redis.cache_clear()
+        quota._script.cache_clear()
+        self.addCleanup(get_redis.cache_clear)
+        self.addCleanup(quota._script.cache_clear)
+        token = AccessToken.for_user(self.user)
+
+        for name in ("tasks-list", "async-tasks-list"):
+            with self.assertLogs("task_manager_api", "WARNING"):
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post(
+                        reverse(name),
+                        self.data,
+                        format="json",
+                        HTTP_AUTHORIZATION=f"Bearer {token}",
+                    )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(TaskOutbox.objects.count(), 2)
+
+    @override_settings(TASK_MANAGER_DISPATCH_MODE="direct")
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_direct_mode_skips_outbox(self, mock_delay):
+        response = self.client.post(
+            reverse("tasks-list"), self.data, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(TaskOutbox.objects.exists())
+        mock_delay.assert_called_once()
+
+
+@override_settings(TASK_MANAGER_MAX_ATTEMPTS=2)
+class TaskLeaseTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.task = Task.objects.create(
+            user=self.user, input_data={"a": 1, "b": 2}
+        )
+
+    def expire_lease(self, task):
+        Task.objects.filter(id=task.id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_start_sets_lease_and_counts_attempts(self):
+        start_task(self.task.id)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, StatusChoices.RUNNING)
+        self.assertEqual(self.task.attempts, 1)
+        self.assertGreater(self.task.lease_expires_at, timezone.now())
+
+    @patch("task_manager_api.reaper.dispatch_tasks")
+    def test_reaper_requeues_expired_task(self, mock_dispatch):
+        start_task(self.task.id)
+        self.expire_lease(self.task)
+
+        self.assertEqual(reaper.reap_expired_tasks(), 1)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, StatusChoices.PENDING)
+        self.assertIsNone(self.task.lease_expires_at)
+        sent = mock_dispatch.call_args.args[0]
+        self.assertEqual([task.id for task in sent], [self.task.id])
+
+    @patch("task_manager_api.reaper.dispatch_tasks")
+    def test_reaper_fails_task_after_max_attempts(self, mock_dispatch):
+        start_task(self.task.id)
+        start_task(self.task.id)
+        self.expire_lease(self.task)
+
+        reaper.reap_expired_tasks()
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, StatusChoices.FAILED)
+        self.assertEqual(
+            self.task.result, {"error": reaper.LEASE_EXPIRED_ERROR}
+        )
+        mock_dispatch.assert_not_called()
+
+    @patch("task_manager_api.reaper.dispatch_tasks")
+    def test_reaper_skips_live_leases(self, mock_dispatch):
+        start_task(self.task.id)
+
+        self.assertEqual(reaper.reap_expired_tasks(), 0)
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, StatusChoices.RUNNING)
+
+    @override_settings(TASK_MANAGER_LEASE_SECONDS=3)
+    @patch("task_manager_api.tasks.renew_lease")
+    @patch("time.sleep")
+    def test_sleep_renews_lease(self, mock_sleep, mock_renew):
+        sleep_with_heartbeat(self.task.id, 2.5)
+
+        self.assertEqual(
+            [call.args[0] for call in mock_sleep.call_args_list],
+            [1, 1, 0.5],
+        )
+        self.assertEqual(mock_renew.call_count, 2)
+
+    @patch("task_manager_api.tasks.finish_countdown_task.apply_async")
+    def test_eta_countdown_lease_covers_countdown(self, mock_apply_async):
+        task = Task.objects.create(
+            user=self.user,
+            task_type=TaskTypeChoices.COUNTDOWN,
+            input_data={"seconds": 600},
+        )
+
+        countdown_task(task.id)
+
+        task.refresh_from_db()
+        self.assertGreater(
+            task.lease_expires_at, timezone.now() + timedelta(seconds=600)
+        )
+
+
+class FairShareTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_round_robin_between_users(self):
+        scheduler = fair_share.DeficitRoundRobin()
+
+        self.assertEqual(
+            scheduler.plan({1: 100, 2: 1, 3: 2}, 4), {1: 2, 2: 1, 3: 1}
+        )
+        # Следующий вызов продолжает обход после пользователя 3
+        self.assertEqual(scheduler.plan({1: 98, 3: 1}, 2), {1: 1, 3: 1})
+
+    def test_weights(self):
+        scheduler = fair_share.DeficitRoundRobin(weights={1: 3})
+
+        self.assertEqual(scheduler.plan({1: 100, 2: 100}, 8), {1: 6, 2: 2})
+
+    def test_fractional_weight_accumulates_credit(self):
+        scheduler = fair_share.DeficitRoundRobin(weights={1: 0.5})
+
+        self.assertEqual(scheduler.plan({1: 10, 2: 10}, 3), {1: 1, 2: 2})
+
+    def test_non_positive_weights_rejected(self):
+        for options in ({"weights": {1: 0}}, {"weights": {1: -1}}):
+            with self.subTest(options=options):
+                with self.assertRaises(ValueError):
+                    fair_share.DeficitRoundRobin(**options)
+        with self.assertRaises(ValueError):
+            fair_share.DeficitRoundRobin(quantum=0)
+
+    @override_settings(TASK_MANAGER_FAIR_SHARE_WEIGHTS={1: 0})
+    @patch("task_manager_api.fair_share.is_enabled", return_value=True)
+    def test_schedule_tasks_rejects_bad_weights(self, mock_enabled):
+        with self.assertRaisesMessage(CommandError, "Вес пользователя 1"):
+            call_command("schedule_tasks")
+
+    @patch("task_manager_api.fair_share.enqueue")
+    @patch("task_manager_api.fair_share.is_enabled", return_value=True)
+    @patch("task_manager_api.dispatch.group")
+    def test_dispatch_goes_to_user_queues(
+        self, mock_group, mock_enabled, mock_enqueue
+    ):
+        tasks = Task.objects.bulk_create(
+            Task(user=self.user, input_data={"a": i, "b": i}) for i in range(3)
+        )
+
+        dispatch_tasks(tasks)
+
+        mock_enqueue.assert_called_once_with(tasks)
+        mock_group.assert_not_called()
+
+    @patch("task_manager_api.tasks.sum_numbers_task.apply_async")
+    def test_priority_maps_to_broker_priority(self, mock_apply_async):
+        response = self.client.post(
+            reverse("tasks-list"),
+            {
+                "task_type": TaskTypeChoices.SUM_NUMBERS,
+                "input_data": {"a": 1, "b": 2},
+                "priority": 7,
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["priority"], 7)
+        # В брокере Redis меньшее значение выдаётся первым
+        self.assertEqual(mock_apply_async.call_args.kwargs["priority"], 2)
+
+    def test_priority_out_of_range(self):
+        response = self.client.post(
+            reverse("tasks-list"),
+            {
+                "task_type": TaskTypeChoices.SUM_NUMBERS,
+                "input_data": {"a": 1, "b": 2},
+                "priority": 10,
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("priority", response.data)
+
+    def test_simulation_protects_light_users(self):
+        report = fair_share_benchmark.run(
+            duration=10, heavy_tasks=1000, flood_seconds=2, light_users=5
+        )
+        results = report["results"]
+
+        self.assertLess(
+            results["fair_share"]["light"]["p95"],
+            results["fifo"]["light"]["p95"] / 10,
+        )
+
+
+class TaskStatisticsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("tasks-stats")
+
+    def create_task(self, status, runtime=None, **kwargs):
+        now = timezone.now()
+        if runtime is not None:
+            kwargs["started_at"] = now - timedelta(seconds=runtime)
+            kwargs["finished_at"] = now
+        return Task.objects.create(
+            user=self.user,
+            input_data={"a": 1, "b": 2},
+            status=status,
+            **kwargs,
+        )
+
+    def mock_redis(self):
+        client = MagicMock()
+        client.pipeline.return_value = client
+        script = MagicMock()
+        client.register_script.return_value = script
+        patcher = patch(
+            "task_manager_api.stats.get_redis", return_value=client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        stats._script.cache_clear()
+        self.addCleanup(stats._script.cache_clear)
+        return client, script
+
+    def recorded(self, script):
+        return [
+            (args[1], args[2], args[3])
+            for args in (call.kwargs["args"] for call in script.call_args_list)
+        ]
+
+    def test_stats_from_database(self):
+        self.create_task(StatusChoices.PENDING)
+        self.create_task(StatusChoices.COMPLETED, runtime=2)
+        self.create_task(StatusChoices.COMPLETED, runtime=4)
+        self.create_task(
+            StatusChoices.FAILED, task_type=TaskTypeChoices.COUNTDOWN
+        )
+        TaskArchive.objects.create(
+            id=10**6,
+            user=self.user,
+            task_type=TaskTypeChoices.SUM_NUMBERS,
+            input_data={},
+            status=StatusChoices.COMPLETED,
+            created_at=timezone.now(),
+            started_at=timezone.now() - timedelta(seconds=6),
+            finished_at=timezone.now(),
+        )
+        other = User.objects.create_user(username="other", password="pass")
+        Task.objects.create(user=other, input_data={})
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 5)
+        self.assertEqual(
+            response.data["by_status"],
+            {"pending": 1, "running": 0, "completed": 3, "failed": 1},
+        )
+        sum_numbers = response.data["by_task_type"]["sum_numbers"]
+        self.assertEqual(sum_numbers["total"], 4)
+        self.assertAlmostEqual(sum_numbers["avg_runtime_seconds"], 4, 3)
+        self.assertIsNone(
+            response.data["by_task_type"]["countdown"]["avg_runtime_seconds"]
+        )
+
+    def test_stats_from_redis_without_queries(self):
+        client, _ = self.mock_redis()
+        client.hgetall.return_value = {
+            b"count:sum_numbers:completed": b"3",
+            b"count:sum_numbers:running": b"1",
+            b"runtime_sum:sum_numbers": b"1.5",
+            b"runtime_count:sum_numbers": b"3",
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        self.assertFalse(
+            [q for q in queries if "task_manager_api_task" in q["sql"]]
+        )
+        self.assertEqual(response.data["total"], 4)
+        self.assertEqual(
+            response.data["by_task_type"]["sum_numbers"][
+                "avg_runtime_seconds"
+            ],
+            0.5,
+        )
+
+    @patch("task_manager_api.tasks.sum_numbers_task.delay")
+    def test_transitions_update_counters(self, mock_delay):
+        _, script = self.mock_redis()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("tasks-list"),
+                {"task_type": "sum_numbers", "input_data": {"a": 1, "b": 2}},
+                format="json",
+            )
+        task_id = response.data["id"]
+        with self.captureOnCommitCallbacks(execute=True):
+            sum_numbers_task(task_id)
+
+        self.assertEqual(
+            self.recorded(script),
+            [
+                ("sum_numbers", "", "pending"),
+                ("sum_numbers", "pending", "running"),
+                ("sum_numbers", "running", "completed"),
+            ],
+        )
+
+    def test_inline_task_finishes_from_pending(self):
+        _, script = self.mock_redis()
+        task = self.create_task(StatusChoices.PENDING)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sum_numbers_task(
+                task.id, user_id=self.user.id, input_data={"a": 1, "b": 2}
+            )
+
+        self.assertEqual(
+            self.recorded(script), [("sum_numbers", "pending", "completed")]
+        )
+        task.refresh_from_db()
+        self.assertEqual(task.started_at, task.finished_at)
+
+    def test_rebuild(self):
+        client, _ = self.mock_redis()
+        client.scan_iter.return_value = []
+        self.create_task(StatusChoices.COMPLETED, runtime=3)
+        self.create_task(StatusChoices.RUNNING)
+
+        self.assertEqual(stats.rebuild(), 1)
+
+        client.hset.assert_called_once()
+        mapping = client.hset.call_args.kwargs["mapping"]
+        self.assertEqual(mapping["count:sum_numbers:completed"], 1)
+        self.assertEqual(mapping["count:sum_numbers:running"], 1)
+        self.assertAlmostEqual(mapping["runtime_sum:sum_numbers"], 3, 3)
+        self.assertEqual(mapping["runtime_count:sum_numbers"], 1)
+
+
+@patch("task_manager_api.dag.dispatch_tasks")
+@patch("task_manager_api.views.dispatch_tasks")
+class TaskGraphTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("tasks-graph")
+
+    def submit(self, nodes):
+        return self.client.post(self.url, {"nodes": nodes}, format="json")
+
+    def diamond(self):
+        """a, b -> c -> d"""
+        response = self.submit(
+            [
+                {
+                    "key": "d",
+                    "input_data": {"a": {"$parent": "c"}, "b": 1},
+                },
+                {
+                    "key": "c",
+                    "input_data": {
+                        "a": {"$parent": "a"},
+                        "b": {"$parent": "b"},
+                    },
+                },
+                {"key": "a", "input_data": {"a": 1, "b": 2}},
+                {"key": "b", "input_data": {"a": 3, "b": 4}},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return {
+            key: Task.objects.get(id=task_id)
+            for key, task_id in response.data["ids"].items()
+        }
+
+    def run_task(self, task):
+        with self.captureOnCommitCallbacks(execute=True):
+            sum_numbers_task(task.id)
+
+    def test_create_graph(self, mock_dispatch, mock_dag_dispatch):
+        tasks = self.diamond()
+
+        self.assertEqual(
+            {key: task.pending_parents for key, task in tasks.items()},
+            {"a": 0, "b": 0, "c": 2, "d": 1},
+        )
+        self.assertEqual(
+            {key: task.has_children for key, task in tasks.items()},
+            {"a": True, "b": True, "c": True, "d": False},
+        )
+        self.assertEqual(
+            set(tasks["c"].parents.all()), {tasks["a"], tasks["b"]}
+        )
+        self.assertEqual(
+            tasks["c"].input_data,
+            {
+                "a": {"$parent": tasks["a"].id},
+                "b": {"$parent": tasks["b"].id},
+            },
+        )
+        mock_dispatch.assert_called_once()
+        self.assertEqual(
+            {task.id for task in mock_dispatch.call_args.args[0]},
+            {tasks["a"].id, tasks["b"].id},
+        )
+
+    def test_children_run_with_parent_results(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+
+        self.run_task(tasks["a"])
+        mock_dag_dispatch.assert_not_called()
+        tasks["c"].refresh_from_db()
+        self.assertEqual(tasks["c"].pending_parents, 1)
+
+        self.run_task(tasks["b"])
+        mock_dag_dispatch.assert_called_once()
+        (ready,) = mock_dag_dispatch.call_args.args[0]
+        self.assertEqual(ready.id, tasks["c"].id)
+        self.assertEqual(ready.input_data, {"a": 3, "b": 7})
+        # Входные данные с подставленными результатами сохранены в БД
+        tasks["c"].refresh_from_db()
+        self.assertEqual(tasks["c"].input_data, {"a": 3, "b": 7})
+        self.assertEqual(tasks["c"].pending_parents, 0)
+
+        self.run_task(tasks["c"])
+        tasks["d"].refresh_from_db()
+        self.assertEqual(tasks["d"].input_data, {"a": 10, "b": 1})
+
+        self.run_task(tasks["d"])
+        tasks["d"].refresh_from_db()
+        self.assertEqual(tasks["d"].status, StatusChoices.COMPLETED)
+        self.assertEqual(tasks["d"].result, {"result": 11})
+
+    @patch("task_manager_api.quota.add")
+    def test_ready_children_counted_after_commit(
+        self, mock_add, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+        self.run_task(tasks["a"])
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            sum_numbers_task(tasks["b"].id)
+
+        mock_add.assert_not_called()
+        for callback in callbacks:
+            callback()
+        mock_add.assert_called_once_with(self.user.id, 1)
+
+    def test_failed_parent_fails_descendants(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+        Task.objects.filter(id=tasks["a"].id).update(input_data={"a": 1})
+
+        self.run_task(tasks["a"])
+        self.run_task(tasks["b"])
+
+        for key in ("c", "d"):
+            tasks[key].refresh_from_db()
+            self.assertEqual(tasks[key].status, StatusChoices.FAILED)
+            self.assertEqual(
+                tasks[key].result, {"error": dag.PARENT_FAILED_ERROR}
+            )
+        mock_dag_dispatch.assert_not_called()
+
+    def test_completed_task_as_parent(self, mock_dispatch, mock_dag_dispatch):
+        parent = Task.objects.create(
+            user=self.user,
+            input_data={"a": 1, "b": 1},
+            status=StatusChoices.COMPLETED,
+            result={"result": 2},
+        )
+
+        response = self.submit(
+            [{"key": "a", "input_data": {"a": {"$parent": parent.id}, "b": 5}}]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task = Task.objects.get(id=response.data["ids"]["a"])
+        self.assertEqual(task.input_data, {"a": 2, "b": 5})
+        self.assertEqual(list(task.parents.all()), [parent])
+        self.assertEqual(mock_dispatch.call_args.args[0], [task])
+
+    def test_invalid_parent_result_fails_node(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        parent = Task.objects.create(
+            user=self.user,
+            input_data={"a": 1, "b": 1},
+            status=StatusChoices.COMPLETED,
+            result={"value": "x"},
+        )
+
+        response = self.submit(
+            [
+                {
+                    "key": "a",
+                    "input_data": {"a": {"$parent": parent.id}, "b": 5},
+                },
+                {"key": "b", "input_data": {"a": {"$parent": "a"}, "b": 1}},
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        tasks = {
+            key: Task.objects.get(id=task_id)
+            for key, task_id in response.data["ids"].items()
+        }
+        self.assertEqual(tasks["a"].status, StatusChoices.FAILED)
+        self.assertEqual(tasks["a"].result["error"], dag.INVALID_INPUT_ERROR)
+        self.assertIn("a", tasks["a"].result["input_data"])
+        self.assertEqual(tasks["b"].status, StatusChoices.FAILED)
+        self.assertEqual(tasks["b"].result, {"error": dag.PARENT_FAILED_ERROR})
+        mock_dispatch.assert_not_called()
+
+    def test_invalid_resolved_input_fails_child(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sent = dag.release_children(
+                {tasks["a"].id: {"value": "x"}, tasks["b"].id: {"result": 1}}
+            )
+
+        self.assertEqual(sent, [])
+        tasks["c"].refresh_from_db()
+        self.assertEqual(tasks["c"].status, StatusChoices.FAILED)
+        self.assertEqual(tasks["c"].result["error"], dag.INVALID_INPUT_ERROR)
+        self.assertIn("a", tasks["c"].result["input_data"])
+        tasks["d"].refresh_from_db()
+        self.assertEqual(tasks["d"].status, StatusChoices.FAILED)
+        self.assertEqual(tasks["d"].result, {"error": dag.PARENT_FAILED_ERROR})
+        mock_dag_dispatch.assert_not_called()
+
+    def test_duplicate_parents(self, mock_dispatch, mock_dag_dispatch):
+        parent = Task.objects.create(
+            user=self.user,
+            input_data={"a": 1, "b": 1},
+            status=StatusChoices.COMPLETED,
+            result={"result": 2},
+        )
+
+        response = self.submit(
+            [
+                {"key": "a", "input_data": {"a": 1, "b": 2}},
+                {
+                    "key": "b",
+                    "input_data": {"a": 1, "b": 2},
+                    "parents": ["a", "a", parent.id, parent.id],
+                },
+            ]
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task = Task.objects.get(id=response.data["ids"]["b"])
+        self.assertEqual(task.pending_parents, 1)
+        self.assertEqual(task.parents.count(), 2)
+
+    def test_invalid_graphs(self, mock_dispatch, mock_dag_dispatch):
+        other = User.objects.create_user(username="other", password="pass")
+        foreign = Task.objects.create(
+            user=other, input_data={}, status=StatusChoices.COMPLETED
+        )
+        running = Task.objects.create(
+            user=self.user, input_data={}, status=StatusChoices.RUNNING
+        )
+        graphs = [
+            [
+                {"key": "a", "input_data": {"a": 1, "b": 2}, "parents": ["b"]},
+                {"key": "b", "input_data": {"a": 1, "b": 2}, "parents": ["a"]},
+            ],
+            [{"key": "a", "input_data": {"a": 1, "b": 2}, "parents": ["x"]}],
+            [
+                {"key": "a", "input_data": {"a": 1, "b": 2}},
+                {"key": "a", "input_data": {"a": 1, "b": 2}},
+            ],
+            [{"key": "a", "input_data": {"a": "1", "b": {"$parent": "a"}}}],
+            [{"key": "a", "input_data": {"a": {"$parent": 1.5}, "b": 2}}],
+            [
+                {"key": "a", "input_data": {"a": 1, "b": 2}},
+                {"key": "b", "input_data": {"a": {"$parent": "a"}}},
+            ],
+            [{"key": "a", "input_data": {"a": 1, "b": 2}, "parents": [True]}],
+            [
+                {
+                    "key": "a",
+                    "input_data": {"a": 1, "b": 2},
+                    "parents": [foreign.id],
+                }
+            ],
+            [
+                {
+                    "key": "a",
+                    "input_data": {"a": 1, "b": 2},
+                    "parents": [running.id],
+                }
+            ],
+        ]
+
+        for nodes in graphs:
+            with self.subTest(nodes=nodes):
+                response = self.submit(nodes)
+                self.assertEqual(
+                    response.status_code, status.HTTP_400_BAD_REQUEST
+                )
+        self.assertEqual(Task.objects.count(), 2)
+        mock_dispatch.assert_not_called()
+
+    @override_settings(TASK_MANAGER_ACTIVE_TASKS_LIMIT=2)
+    def test_active_tasks_limit_counts_ready_nodes(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+
+        # Ждущие родителей c и d не учитываются в лимите
+        self.assertFalse(quota.acquire(self.user.id))
+        self.run_task(tasks["a"])
+        self.assertTrue(quota.acquire(self.user.id))
+
+        response = self.submit(
+            [
+                {"key": "a", "input_data": {"a": 1, "b": 2}},
+                {"key": "b", "input_data": {"a": 1, "b": 2}},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_waiting_tasks_skipped_by_batch(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+
+        self.assertEqual(run_sum_numbers_batch(10), 2)
+        tasks["c"].refresh_from_db()
+        self.assertEqual(tasks["c"].status, StatusChoices.PENDING)
+        self.assertEqual(tasks["c"].input_data, {"a": 3, "b": 7})
+        self.assertEqual(run_sum_numbers_batch(10), 1)
+
+    def test_parent_messages_carry_only_id(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+
+        # Воркер должен прочитать has_children из строки задачи
+        self.assertEqual(task_kwargs(tasks["a"]), {})
+        self.assertNotEqual(task_kwargs(tasks["d"]), {})
+
+    @override_settings(TASK_MANAGER_MAX_ATTEMPTS=1)
+    @patch("task_manager_api.reaper.dispatch_tasks")
+    def test_reaped_parent_fails_descendants(
+        self, mock_reaper_dispatch, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+        start_task(tasks["a"].id)
+        Task.objects.filter(id=tasks["a"].id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        reaper.reap_expired_tasks()
+
+        self.assertEqual(
+            set(
+                Task.objects.filter(status=StatusChoices.FAILED).values_list(
+                    "id", flat=True
+                )
+            ),
+            {tasks["a"].id, tasks["c"].id, tasks["d"].id},
+        )
+
+    def test_waiting_parent_results_not_archived(
+        self, mock_dispatch, mock_dag_dispatch
+    ):
+        tasks = self.diamond()
+        self.run_task(tasks["a"])
+        Task.objects.filter(id=tasks["a"].id).update(
+            created_at=timezone.now() - timedelta(days=365)
+        )
+
+        self.assertEqual(archive.archive_tasks(days=30), 0)
@@ -0,0 +1,130 @@
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import dag, events, quota, stats, versions
+from .models import ACTIVE_STATUSES, StatusChoices, Task
+
+
+def lease_deadline(seconds=None):
+    if seconds is None:
+        seconds = settings.TASK_MANAGER_LEASE_SECONDS
+    return timezone.now() + timedelta(seconds=seconds)
+
+
+def start_task(task_id):
+    """
+    Переводит задачу в running и возвращает её user_id, task_type,
+    input_data и has_children.
+
+    Для уже завершённой задачи возвращает None: повторно доставленное
+    сообщение не должно перезапускать её.
+    """
+    task = (
+        Task.objects.filter(id=task_id, status__in=ACTIVE_STATUSES)
+        .values("user_id", "task_type", "input_data", "has_children")
+        .first()
+    )
+    if task is None or not mark_running(
+        task_id, task["user_id"], task["task_type"]
+    ):
+        return None
+    return task
+
+
+def _update_active(task_id, expected_status, **fields):
+    """
+    UPDATE активной задачи, возвращает её прежний статус или None.
+
+    Сначала проверяется ожидаемый статус, поэтому обычно это один запрос;
+    прежний статус нужен счётчикам статистики.
+    """
+    for status in sorted(
+        ACTIVE_STATUSES, key=lambda status: status != expected_status
+    ):
+        if Task.objects.filter(id=task_id, status=status).update(**fields):
+            return status
+    return None
+
+
+def mark_running(task_id, user_id, task_type):
+    """
+    Переводит задачу в running без чтения строки и выдаёт воркеру аренду
+    на TASK_MANAGER_LEASE_SECONDS.
+
+    Возвращает False, если задача уже завершена.
+    """
+    previous = _update_active(
+        task_id,
+        StatusChoices.PENDING,
+        status=StatusChoices.RUNNING,
+        started_at=timezone.now(),
+        lease_expires_at=lease_deadline(),
+        attempts=F("attempts") + 1,
+    )
+    if previous is None:
+        return False
+    stats.record(
+        [(task_id, user_id, task_type, previous, StatusChoices.RUNNING)]
+    )
+    events.publish(task_id, user_id, StatusChoices.RUNNING)
+    versions.touch(user_id)
+    return True
+
+
+def renew_lease(task_id, seconds=None):
+    """
+    Продлевает аренду выполняющейся задачи; без этого после истечения
+    аренды задачу заберёт reaper.
+    """
+    return bool(
+        Task.objects.filter(id=task_id, status=StatusChoices.RUNNING).update(
+            lease_expires_at=lease_deadline(seconds)
+        )
+    )
+
+
+def finish_task(
+    task_id,
+    user_id,
+    status,
+    result,
+    task_type,
+    expected_status=StatusChoices.RUNNING,
+    has_children=False,
+):
+    """
+    Записывает итоговые status и result, если задача ещё активна.
+
+    expected_status - статус, в котором задача скорее всего находится:
+    pending, если воркер выполнил её, не переводя в running. Для задачи
+    с has_children в той же транзакции обрабатываются её дети. Возвращает
+    False, если задачу уже завершило другое сообщение.
+    """
+    now = timezone.now()
+    # Упавший между итогом задачи и разблокировкой детей воркер оставил
+    # бы детей ждать навсегда
+    with transaction.atomic() if has_children else nullcontext():
+        previous = _update_active(
+            task_id,
+            expected_status,
+            status=status,
+            result=result,
+            # Задача, не переводившаяся в running, выполнилась мгновенно
+            started_at=Coalesce("started_at", Value(now)),
+            finished_at=now,
+        )
+        if previous is not None and has_children:
+            dag.on_finished([(task_id, status, result)])
+    if previous is None:
+        return False
+    quota.release(user_id)
+    stats.record([(task_id, user_id, task_type, previous, status)])
+    events.publish(task_id, user_id, status, result)
+    versions.touch(user_id)
+    return True
@@ -5,6 +5,8 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+from . import async_views
+from .streaming import task_detail, task_events
 from .views import TaskViewSet, UserRegistrationView
 
 router = DefaultRouter()
@@ -14,5 +16,15 @@ urlpatterns = [
     path("register/", UserRegistrationView.as_view(), name="register"),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("tasks/events/", task_events, name="tasks-events"),
+    # Перехватывает retrieve из роутера ради ?wait=
+    path("tasks/<int:pk>/", task_detail),
+    path("tasks/<int:pk>/events/", task_events, name="tasks-detail-events"),
+    path("async/tasks/", async_views.task_list, name="async-tasks-list"),
+    path(
+        "async/tasks/<int:pk>/",
+        async_views.task_detail,
+        name="async-tasks-detail",
+    ),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,80 @@
+import hashlib
+import logging
+import time
+
+import redis
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "task_manager:tasks_version:user:"
+# Без TTL ключи не вытесняются при volatile-lru; после истечения версия
+# создаётся заново, и клиенты один раз получают полный ответ
+VERSION_TTL = 7 * 24 * 60 * 60
+
+
+def _key(user_id):
+    return f"{KEY_PREFIX}{user_id}"
+
+
+def touch_many(user_ids):
+    """
+    Отмечает изменение задач пользователей.
+
+    Версия обновляется после коммита транзакции, иначе клиент мог бы
+    получить новую версию вместе со старыми данными.
+    """
+    keys = [_key(user_id) for user_id in set(user_ids)]
+    if not keys:
+        return
+
+    def bump():
+        try:
+            cache.set_many(dict.fromkeys(keys, time.time_ns()), VERSION_TTL)
+        except redis.RedisError:
+            # Данные уже сохранены, ошибка кеша не должна превращать
+            # ответ в 500: клиент повторил бы запрос и создал дубль
+            logger.warning("Не удалось обновить версию задач", exc_info=True)
+
+    transaction.on_commit(bump)
+
+
+def touch(user_id):
+    touch_many([user_id])
+
+
+def get_version(user_id):
+    """Версия задач пользователя - время последнего изменения в нс."""
+    key = _key(user_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(key, version, VERSION_TTL):
+                version = cache.get(key, version)
+    except redis.RedisError:
+        # Без кеша версия неизвестна: новая версия на каждый запрос,
+        # ответы 304 не выдаются
+        return time.time_ns()
+    return version
+
+
+def etag(request, *args, **kwargs):
+    """
+    ETag ответа: версия задач пользователя плюс адрес и Accept запроса,
+    так как от них зависят фильтры, страница и формат ответа.
+
+    Last-Modified не отдаётся: HTTP-дата с точностью до секунды не
+    различает изменения в одну секунду, и If-Modified-Since вернул бы
+    устаревший 304.
+    """
+    source = "|".join(
+        [
+            str(request.user.id),
+            str(get_version(request.user.id)),
+            request.get_full_path(),
+            request.META.get("HTTP_ACCEPT", ""),
+        ]
+    )
+    return hashlib.sha256(source.encode()).hexdigest()[:32]
@@ -1,11 +1,52 @@
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
-from rest_framework import generics, mixins, permissions, viewsets
+from django.http import Http404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework import generics, mixins, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.exceptions import ParseError
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
 
-from .models import StatusChoices, Task, TaskTypeChoices
-from .serializers import TaskSerializer, UserRegistrationSerializer
-from .tasks import countdown_task, sum_numbers_task
+from . import dag, outbox, quota, result_cache, stats, versions
+from .dispatch import dispatch_task, dispatch_tasks
+from .instrumentation import stage
+from .models import StatusChoices, Task, TaskArchive
+from .pagination import TaskPagination
+from .serializers import (
+    TaskGraphSerializer,
+    TaskListEncoder,
+    TaskSerializer,
+    UserRegistrationSerializer,
+)
+
+# 304 Not Modified по версии задач пользователя до запроса к БД
+conditional = method_decorator(condition(etag_func=versions.etag))
+
+
+def acquire_active_tasks(user_id, new_tasks=1):
+    if not quota.acquire(user_id, new_tasks):
+        limit = settings.TASK_MANAGER_ACTIVE_TASKS_LIMIT
+        raise ParseError(f"Достигнут лимит активных задач ({limit})")
+
+
+def is_archived_requested(request):
+    # ?archived=true - список задач из архива вместо текущих
+    return request.GET.get("archived") in ("1", "true")
+
+
+def filter_by_status(queryset, statuses):
+    """Фильтр по ?status=pending,running; неизвестные статусы игнорируются."""
+    if statuses:
+        valid_statuses = [
+            status
+            for status in statuses.split(",")
+            if status in StatusChoices.values
+        ]
+        if valid_statuses:
+            queryset = queryset.filter(status__in=valid_statuses)
+    return queryset
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -21,36 +62,183 @@ class TaskViewSet(
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
     queryset = Task.objects.all()
-    pagination_class = LimitOffsetPagination
+    pagination_class = TaskPagination
+
+    def acquire_active_tasks(self, new_tasks=1):
+        acquire_active_tasks(self.request.user.id, new_tasks)
 
     def perform_create(self, serializer):
-        active_statuses = [StatusChoices.PENDING, StatusChoices.RUNNING]
-        active_tasks = Task.objects.filter(
-            user=self.request.user, status__in=active_statuses
-        ).count()
+        data = serializer.validated_data
+        with stage("result_cache"):
+            cached = result_cache.get(data["task_type"], data["input_data"])
+        if cached is not None:
+            # Результат уже известен: задача сразу выполнена, без воркера
+            task = serializer.save(
+                user=self.request.user,
+                status=StatusChoices.COMPLETED,
+                result=cached,
+            )
+            stats.record_created([task])
+            versions.touch(self.request.user.id)
+            return
+
+        with stage("quota"):
+            self.acquire_active_tasks()
+
+        try:
+            with stage("insert"), outbox.atomic():
+                task = serializer.save(user=self.request.user)
+                unsent = outbox.store([task])
+        except Exception:
+            quota.release(self.request.user.id)
+            raise
+        stats.record_created([task])
+        versions.touch(self.request.user.id)
+        if unsent:
+            with stage("dispatch"):
+                dispatch_task(task)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data
+        if len(items) > settings.TASK_MANAGER_BULK_CREATE_MAX_SIZE:
+            raise ParseError(
+                "Слишком много задач в одном запросе "
+                f"({settings.TASK_MANAGER_BULK_CREATE_MAX_SIZE})"
+            )
 
-        if active_tasks >= 5:
-            raise ParseError("Достигнут лимит активных задач (5)")
+        with stage("result_cache"):
+            cached = result_cache.get_many(
+                [(item["task_type"], item["input_data"]) for item in items]
+            )
+        tasks = []
+        for item, result in zip(items, cached):
+            task = Task(user=request.user, **item)
+            if result is not None:
+                task.status, task.result = StatusChoices.COMPLETED, result
+            tasks.append(task)
 
-        task = serializer.save(user=self.request.user)
+        pending = sum(result is None for result in cached)
+        if pending:
+            with stage("quota"):
+                self.acquire_active_tasks(pending)
 
-        if task.task_type == TaskTypeChoices.SUM_NUMBERS:
-            sum_numbers_task.delay(task.id)
-        elif task.task_type == TaskTypeChoices.COUNTDOWN:
-            countdown_task.delay(task.id)
+        try:
+            with stage("insert"), outbox.atomic():
+                tasks = Task.objects.bulk_create(tasks)
+                unsent = outbox.store(
+                    task
+                    for task in tasks
+                    if task.status == StatusChoices.PENDING
+                )
+        except Exception:
+            quota.release(request.user.id, pending)
+            raise
+        stats.record_created(tasks)
+        versions.touch(request.user.id)
+        if unsent:
+            with stage("dispatch"):
+                dispatch_tasks(unsent)
+
+        return Response(
+            {"ids": [task.id for task in tasks]},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, methods=["post"])
+    def graph(self, request):
+        serializer = TaskGraphSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+
+        nodes = serializer.validated_data["nodes"]
+        # Остальные узлы учитываются в лимите, когда дождутся родителей
+        ready = sum(
+            not any(isinstance(parent, str) for parent in node["parents"])
+            for node in nodes
+        )
+        with stage("quota"):
+            self.acquire_active_tasks(ready)
+
+        try:
+            # Задачи и связи графа сохраняются вместе
+            with stage("insert"), transaction.atomic():
+                tasks = dag.create(
+                    request.user,
+                    nodes,
+                    serializer.validated_data["parent_results"],
+                )
+                # Узлы с некорректными входными данными уже завершены
+                queued = [
+                    task
+                    for task in tasks.values()
+                    if task.status == StatusChoices.PENDING
+                    and not task.pending_parents
+                ]
+                unsent = outbox.store(queued)
+        except Exception:
+            quota.release(request.user.id, ready)
+            raise
+        if len(queued) < ready:
+            quota.release(request.user.id, ready - len(queued))
+        stats.record_created(tasks.values())
+        versions.touch(request.user.id)
+        if unsent:
+            with stage("dispatch"):
+                dispatch_tasks(unsent)
+
+        return Response(
+            {"ids": {key: task.id for key, task in tasks.items()}},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=False, url_path="stats", url_name="stats")
+    def statistics(self, request):
+        # Счётчики обновляются переходами статусов, таблица задач не читается
+        return Response(stats.get(request.user.id))
+
+    @conditional
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional
+    def list(self, request, *args, **kwargs):
+        encoder = TaskListEncoder(
+            request.user.username, request.query_params.get("fields")
+        )
+        rows = self.filter_queryset(self.get_queryset()).values(
+            *encoder.columns
+        )
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(encoder.encode(page))
+        return Response(encoder.encode(rows))
+
+    def get_object(self):
+        try:
+            task = super().get_object()
+        except Http404:
+            # Старые завершённые задачи могли быть перенесены в архив
+            task = generics.get_object_or_404(
+                TaskArchive.objects.all(),
+                user_id=self.request.user.id,
+                id=self.kwargs["pk"],
+            ).as_task()
+        # Задача принадлежит текущему пользователю, JOIN не нужен
+        task.user = self.request.user
+        return task
 
     def get_queryset(self):
-        queryset = self.queryset.filter(user=self.request.user)
-
-        statuses = self.request.query_params.get("status")
-        if statuses:
-            status_list = statuses.split(",")
-            valid_statuses = [
-                status
-                for status in status_list
-                if status in StatusChoices.values
-            ]
-            if valid_statuses:
-                queryset = queryset.filter(status__in=valid_statuses)
-
-        return queryset
+        queryset = self.queryset
+        if self.action == "list" and is_archived_requested(self.request):
+            queryset = TaskArchive.objects.all()
+        queryset = queryset.filter(user_id=self.request.user.id)
+
+        return filter_by_status(
+            queryset, self.request.query_params.get("status")
+        )